@@ -0,0 +1,53 @@
+// SPDX-License-Identifier: agpl-3.0
+pragma solidity 0.6.12;
+
+import {IReserveInterestRateStrategy} from '../../interfaces/IReserveInterestRateStrategy.sol';
+
+/**
+ * @title MockReserveInterestRateStrategy
+ * @notice Returns the same rates whatever the utilization of the reserve
+ * @dev Lets tests fix the liquidity rate the index grows at, or stop interest with zero rates
+ **/
+contract MockReserveInterestRateStrategy is IReserveInterestRateStrategy {
+  uint256 public immutable liquidityRate;
+  uint256 public immutable stableBorrowRate;
+  uint256 public immutable variableBorrowRate;
+
+  constructor(
+    uint256 liquidityRate_,
+    uint256 stableBorrowRate_,
+    uint256 variableBorrowRate_
+  ) public {
+    liquidityRate = liquidityRate_;
+    stableBorrowRate = stableBorrowRate_;
+    variableBorrowRate = variableBorrowRate_;
+  }
+
+  function baseVariableBorrowRate() external view override returns (uint256) {
+    return variableBorrowRate;
+  }
+
+  function getMaxVariableBorrowRate() external view override returns (uint256) {
+    return variableBorrowRate;
+  }
+
+  function calculateInterestRates(
+    address,
+    uint256,
+    uint256,
+    uint256,
+    uint256,
+    uint256
+  )
+    external
+    view
+    override
+    returns (
+      uint256,
+      uint256,
+      uint256
+    )
+  {
+    return (liquidityRate, stableBorrowRate, variableBorrowRate);
+  }
+}
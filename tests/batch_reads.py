@@ -0,0 +1,119 @@
+from brownie import web3
+from contextlib import contextmanager
+
+import requests
+
+
+# Pooled HTTP session shared by all batches
+_session = requests.Session()
+
+
+# Queue contract view calls and resolve them together in a single JSON-RPC batch.
+#
+# Usage:
+#   with batch_reads() as r:
+#       r.expect(atoken.balanceOf, depositor, equals=deposit_amount)
+#       account_data = r.call(lending_pool.getUserAccountData, depositor)
+#   (total_collateral, total_debt, ...) = account_data.value
+#
+# All calls are executed against the same block, expectations are asserted when the block exits.
+@contextmanager
+def batch_reads(block_identifier='latest'):
+    reads = BatchReads(block_identifier)
+    yield reads
+    reads.resolve()
+    reads.check()
+
+
+# Placeholder for the result of a queued call, readable once the batch is resolved
+class BatchResult:
+    def __init__(self, method, args):
+        self.method = method
+        self.args = args
+        self._resolved = False
+        self._value = None
+
+    @property
+    def value(self):
+        if not self._resolved:
+            raise ValueError('Batched read of {} has not been resolved'.format(self.method._name))
+        return self._value
+
+    def _set(self, value):
+        self._value = value
+        self._resolved = True
+
+
+class BatchReads:
+    def __init__(self, block_identifier='latest'):
+        self.block_identifier = block_identifier
+        self._queue = []
+        self._expectations = []
+
+    # Queue `method(*args)` e.g. `r.call(atoken.balanceOf, depositor)`
+    def call(self, method, *args):
+        result = BatchResult(method, args)
+        self._queue.append(result)
+        return result
+
+    __call__ = call
+
+    # Queue `method(*args)` and assert the result `equals` the expected value when resolved
+    def expect(self, method, *args, equals):
+        result = self.call(method, *args)
+        self._expectations.append((result, equals))
+        return result
+
+    # Send all queued calls and decode their results
+    def resolve(self):
+        (queue, self._queue) = (self._queue, [])
+        if not queue:
+            return
+
+        block = self.block_identifier
+        if isinstance(block, int):
+            block = hex(block)
+        payload = [
+            {
+                'jsonrpc': '2.0',
+                'id': i,
+                'method': 'eth_call',
+                'params': [{'to': result.method._address, 'data': result.method.encode_input(*result.args)}, block],
+            }
+            for (i, result) in enumerate(queue)
+        ]
+
+        for response in _send_batch(payload):
+            result = queue[response['id']]
+            if 'error' in response:
+                raise ValueError('Batched call to {} failed: {}'.format(result.method._name, response['error']))
+            result._set(result.method.decode_output(response['result']))
+
+    # Assert every expectation queued with `expect()`
+    def check(self):
+        (expectations, self._expectations) = (self._expectations, [])
+        for (result, expected) in expectations:
+            assert result.value == expected, '{}{} returned {}, expected {}'.format(
+                result.method._name, tuple(result.args), result.value, expected
+            )
+
+
+# Send a JSON-RPC batch, falling back to individual requests for providers without an HTTP endpoint
+def _send_batch(payload):
+    endpoint = getattr(web3.provider, 'endpoint_uri', None)
+    if endpoint is None or not str(endpoint).startswith('http'):
+        responses = []
+        for request in payload:
+            response = web3.provider.make_request(request['method'], request['params'])
+            response['id'] = request['id']
+            responses.append(response)
+        return responses
+
+    # Batches bypass `make_request()`, provider wrappers may still observe them
+    observe = getattr(web3.provider, 'observe_batch', None)
+    if observe is not None:
+        observe(payload)
+
+    response = _session.post(endpoint, json=payload)
+    response.raise_for_status()
+    return response.json()
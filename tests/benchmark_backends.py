@@ -0,0 +1,50 @@
+# Benchmark the test suite against each `--evm-backend`.
+#
+# Runs `brownie test` once per backend for each of the given test files and writes a
+# markdown table of wall times to `reports/backend_benchmark.md`.
+#
+# Usage (from the project root):
+#   python tests/benchmark_backends.py tests/test_validation_logic.py tests/test_percentage_math.py
+
+from pathlib import Path
+
+import subprocess
+import sys
+import time
+
+
+BACKENDS = ['ganache', 'eth-tester']
+DEFAULT_TEST_FILES = ['tests/test_percentage_math.py', 'tests/test_validation_logic.py']
+REPORT_PATH = Path('reports') / 'backend_benchmark.md'
+
+
+# Run a single test file with `backend`, returns the wall time and whether the tests passed
+def run_tests(test_file, backend):
+    start = time.perf_counter()
+    result = subprocess.run(
+        ['brownie', 'test', test_file, '--evm-backend', backend],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return (time.perf_counter() - start, result.returncode == 0)
+
+
+def main(test_files):
+    lines = [
+        '| Test file | ' + ' | '.join(BACKENDS) + ' | Speedup |',
+        '|---|' + '---|' * len(BACKENDS) + '---|',
+    ]
+    for test_file in test_files:
+        timings = [run_tests(test_file, backend) for backend in BACKENDS]
+        cells = ['{:.1f}s{}'.format(seconds, '' if passed else ' (failed)') for (seconds, passed) in timings]
+        speedup = timings[0][0] / timings[-1][0]
+        lines.append('| {} | {} | {:.2f}x |'.format(test_file, ' | '.join(cells), speedup))
+        print(lines[-1])
+
+    REPORT_PATH.parent.mkdir(exist_ok=True)
+    REPORT_PATH.write_text('\n'.join(lines) + '\n')
+    print('Written to', REPORT_PATH)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or DEFAULT_TEST_FILES)
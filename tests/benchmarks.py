@@ -0,0 +1,49 @@
+from pathlib import Path
+
+
+# Benchmarks are opt-in with `brownie test --benchmark` and write their results here
+REPORTS_DIRECTORY = Path('reports')
+
+
+# Write a benchmark report to `reports/<name>.txt` and echo it for `-s` runs
+def write_report(name, lines):
+    REPORTS_DIRECTORY.mkdir(exist_ok=True)
+    path = REPORTS_DIRECTORY.joinpath(name + '.txt')
+    path.write_text('\n'.join(lines) + '\n')
+    print('\n'.join(lines))
+    return path
+
+
+# Least squares fit of `y = a + b * x`, returns (a, b)
+def fit_linear(xs, ys):
+    n = len(xs)
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    covariance = sum((x - mean_x) * (y - mean_y) for (x, y) in zip(xs, ys))
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    b = covariance / variance
+    return (mean_y - b * mean_x, b)
+
+
+# Least squares fit of `y = c0 + c1 * x1 + c2 * x2 + ...` where `rows` holds (x1, x2, ...) per
+# sample, returns (c0, c1, c2, ...)
+def fit_multilinear(rows, ys):
+    samples = [(1,) + tuple(row) for row in rows]
+    size = len(samples[0])
+
+    # Normal equations (X^T X) c = X^T y solved by Gaussian elimination with partial pivoting
+    matrix = [
+        [sum(row[i] * row[j] for row in samples) for j in range(size)]
+        + [sum(row[i] * y for (row, y) in zip(samples, ys))]
+        for i in range(size)
+    ]
+    for column in range(size):
+        pivot = max(range(column, size), key=lambda i: abs(matrix[i][column]))
+        if matrix[pivot][column] == 0:
+            raise ValueError('Samples do not determine every coefficient')
+        (matrix[column], matrix[pivot]) = (matrix[pivot], matrix[column])
+        for i in range(size):
+            if i != column:
+                factor = matrix[i][column] / matrix[column][column]
+                matrix[i] = [a - factor * b for (a, b) in zip(matrix[i], matrix[column])]
+    return tuple(matrix[i][size] / matrix[i][i] for i in range(size))
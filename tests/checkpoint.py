@@ -0,0 +1,271 @@
+# Checkpointed long running simulations.
+#
+# A simulation is a class constructed without arguments providing
+#
+#   setup() -> state        deploys and funds the market, run once for the base checkpoint
+#   step(state, i, rng)     runs iteration `i` (the scenario cursor), mutating `state`
+#   result(state) -> value  picklable summary returned when a chunk completes
+#
+# `state` is anything picklable e.g. a dict holding a `ShadowModel`, counters and the contracts
+# and accounts in use. Contracts are saved by address and ABI and accounts by address, local
+# accounts created with `accounts.add()` (the account pool) by private key.
+#
+# Each checkpoint holds a copy of the Ganache database with the pickled state and RNG state of
+# the cursor it was taken at. A checkpoint is only visible once its `manifest.json` is renamed
+# into place, so a crash during a save leaves the previous checkpoint as the latest.
+# Ganache is stopped while its database is copied which drops any `evm_snapshot`, take
+# checkpoints where no snapshot is held.
+#
+# The iterations are split into chunks which all start from the base checkpoint, each run by
+# its own worker process with its own Ganache. A single chunk is one continuous run, several
+# chunks suit runs whose iterations do not depend on each other's chain state.
+#
+# Usage (from the project root):
+#   python tests/checkpoint.py start <directory> <module:Simulation> --items N [--chunks K]
+#   python tests/checkpoint.py resume <directory>
+
+from brownie import accounts, Contract, web3
+from brownie.network.account import Account, LocalAccount
+from brownie.network.contract import _DeployedContractBase
+
+from ganache_node import project_root, worker_node
+
+from pathlib import Path
+
+import argparse
+import importlib
+import json
+import multiprocessing
+import pickle
+import random
+import shutil
+import sys
+import time
+
+
+# Seconds between checkpoints
+CHECKPOINT_INTERVAL = 600
+
+# Checkpoints kept per chunk
+KEEP_CHECKPOINTS = 2
+
+
+# Pickles contracts and accounts as references resolved again on load
+class _StatePickler(pickle.Pickler):
+    def persistent_id(self, obj):
+        if isinstance(obj, _DeployedContractBase):
+            # `_name` is the `ContractContainer` for contracts deployed by this project
+            return ('contract', getattr(obj._name, '_name', obj._name), obj.address, obj.abi)
+        if isinstance(obj, LocalAccount):
+            return ('local_account', obj.private_key)
+        if isinstance(obj, Account):
+            return ('account', obj.address)
+        return None
+
+
+class _StateUnpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        if pid[0] == 'contract':
+            (_, name, address, abi) = pid
+            return Contract.from_abi(name, address, abi)
+        if pid[0] == 'local_account':
+            return accounts.add(pid[1])
+        return accounts.at(pid[1])
+
+
+# Checkpoints of one chunk, `chain/` is the live Ganache database of the chunk's node and
+# `checkpoints/<cursor>/` the saved copies
+class CheckpointStore:
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.chain_path = self.directory / 'chain'
+        self.checkpoints_path = self.directory / 'checkpoints'
+
+    def _path(self, cursor):
+        return self.checkpoints_path / '{:010d}'.format(cursor)
+
+    # Cursors of the complete checkpoints in order
+    def cursors(self):
+        if not self.checkpoints_path.exists():
+            return []
+        return sorted(
+            int(path.name) for path in self.checkpoints_path.iterdir()
+            if path.name.isdigit() and (path / 'manifest.json').exists()
+        )
+
+    def latest(self):
+        cursors = self.cursors()
+        return cursors[-1] if cursors else None
+
+    # Save the chain, `state` and `rng` as the checkpoint at `cursor`, restarting `node`
+    def save(self, node, cursor, state, rng):
+        timestamp = web3.eth.getBlock('latest').timestamp
+        node.stop()
+        try:
+            self._write(cursor, state, rng.getstate(), timestamp)
+        finally:
+            node.start()
+            _set_time(timestamp)
+        for old in self.cursors()[:-KEEP_CHECKPOINTS]:
+            shutil.rmtree(self._path(old))
+
+    def _write(self, cursor, state, rng_state, timestamp):
+        target = self._path(cursor)
+        staging = target.with_name(target.name + '.tmp')
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.copytree(self.chain_path, staging / 'chain')
+        with (staging / 'state.pickle').open('wb') as f:
+            _StatePickler(f).dump(state)
+        (staging / 'rng.pickle').write_bytes(pickle.dumps(rng_state))
+        (staging / 'manifest.json').write_text(json.dumps({'cursor': cursor, 'timestamp': timestamp}))
+        shutil.rmtree(target, ignore_errors=True)
+        staging.rename(target)
+
+    # Start a chunk at `cursor` from the latest checkpoint of `base` with a new `rng`
+    def seed_from(self, base, cursor, rng):
+        source = base._path(base.latest())
+        manifest = json.loads((source / 'manifest.json').read_text())
+        target = self._path(cursor)
+        staging = target.with_name(target.name + '.tmp')
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.copytree(source, staging)
+        (staging / 'rng.pickle').write_bytes(pickle.dumps(rng.getstate()))
+        (staging / 'manifest.json').write_text(json.dumps(dict(manifest, cursor=cursor)))
+        staging.rename(target)
+
+    # Replace the chain of `node` with the checkpoint at `cursor` (the latest by default)
+    # Returns (cursor, state, rng)
+    def restore(self, node, cursor=None):
+        if cursor is None:
+            cursor = self.latest()
+        path = self._path(cursor)
+        manifest = json.loads((path / 'manifest.json').read_text())
+
+        node.stop()
+        shutil.rmtree(self.chain_path, ignore_errors=True)
+        shutil.copytree(path / 'chain', self.chain_path)
+        node.start()
+        _set_time(manifest['timestamp'])
+
+        with (path / 'state.pickle').open('rb') as f:
+            state = _StateUnpickler(f).load()
+        rng = random.Random()
+        rng.setstate(pickle.loads((path / 'rng.pickle').read_bytes()))
+        return (cursor, state, rng)
+
+
+# A restarted Ganache takes its clock from the wall clock, carry on from the saved block time
+def _set_time(timestamp):
+    web3.manager.request_blocking('evm_mine', [timestamp])
+
+
+# `module:Class` -> a new simulation
+def load_simulation(path):
+    (module, name) = path.split(':')
+    return getattr(importlib.import_module(module), name)()
+
+
+# Run iterations from the latest checkpoint of `store` up to `end`, checkpointing every
+# `interval` seconds and at the end. Returns the simulation's result.
+def run_segment(simulation, store, node, end, interval=CHECKPOINT_INTERVAL):
+    (cursor, state, rng) = store.restore(node)
+    last_save = time.monotonic()
+    for i in range(cursor, end):
+        simulation.step(state, i, rng)
+        if i + 1 < end and time.monotonic() - last_save >= interval:
+            store.save(node, i + 1, state, rng)
+            last_save = time.monotonic()
+    if cursor < end:
+        store.save(node, end, state, rng)
+    return simulation.result(state)
+
+
+# Worker entry points, each runs with its own Ganache persisting to the store's `chain/`
+def _setup_base(root, simulation_path, directory):
+    store = CheckpointStore(directory)
+    if store.latest() is not None:
+        return
+    with worker_node(root, store.chain_path) as node:
+        state = load_simulation(simulation_path).setup()
+        store.save(node, 0, state, random.Random(0))
+
+
+def _run_chunk(root, simulation_path, directory, end, interval):
+    store = CheckpointStore(directory)
+    with worker_node(root, store.chain_path) as node:
+        return run_segment(load_simulation(simulation_path), store, node, end, interval)
+
+
+# Run `items` iterations of the simulation at `simulation_path` ('module:Class') split into
+# `chunks` over `processes` worker processes (one per chunk by default), checkpointing into
+# `directory`. Chunk `k` starts at its first item with `Random((seed << 32) + start)`.
+# Calling again with the same `directory` resumes every unfinished chunk from its latest
+# checkpoint. Returns the result of each chunk.
+def run_chunks(simulation_path, directory, items, chunks=1, processes=None, seed=0,
+               interval=CHECKPOINT_INTERVAL, root=None):
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    root = root or project_root()
+    run = {'simulation': simulation_path, 'items': items, 'chunks': chunks, 'seed': seed, 'interval': interval}
+    run_path = directory / 'run.json'
+    if run_path.exists():
+        saved = json.loads(run_path.read_text())
+        if any(saved[key] != run[key] for key in ('simulation', 'items', 'chunks', 'seed')):
+            raise ValueError('{} holds a different run: {}'.format(directory, saved))
+    else:
+        run_path.write_text(json.dumps(run))
+
+    # Workers are spawned so the caller's brownie connection is left untouched
+    context = multiprocessing.get_context('spawn')
+    base = CheckpointStore(directory / 'base')
+    with context.Pool(1) as pool:
+        pool.apply(_setup_base, (root, simulation_path, base.directory))
+
+    tasks = []
+    for chunk in range(chunks):
+        (start, end) = (items * chunk // chunks, items * (chunk + 1) // chunks)
+        store = CheckpointStore(directory / 'chunk-{:03d}'.format(chunk))
+        if store.latest() is None:
+            store.seed_from(base, start, random.Random((seed << 32) + start))
+        tasks.append((root, simulation_path, store.directory, end, interval))
+
+    with context.Pool(processes or chunks) as pool:
+        return pool.starmap(_run_chunk, tasks)
+
+
+# Continue the run saved in `directory` from its last consistent checkpoints
+def resume(directory, processes=None, root=None):
+    run = json.loads((Path(directory) / 'run.json').read_text())
+    return run_chunks(
+        run['simulation'], directory, run['items'], run['chunks'], processes, run['seed'], run['interval'], root
+    )
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Checkpointed simulation runs')
+    commands = parser.add_subparsers(dest='command', required=True)
+    start = commands.add_parser('start', help='Start a new run')
+    start.add_argument('directory')
+    start.add_argument('simulation', help='module:Class')
+    start.add_argument('--items', type=int, required=True)
+    start.add_argument('--chunks', type=int, default=1)
+    start.add_argument('--processes', type=int, default=None)
+    start.add_argument('--seed', type=int, default=0)
+    start.add_argument('--interval', type=int, default=CHECKPOINT_INTERVAL, help='Seconds between checkpoints')
+    resume_parser = commands.add_parser('resume', help='Resume a run from its last checkpoints')
+    resume_parser.add_argument('directory')
+    resume_parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == 'start':
+        results = run_chunks(
+            args.simulation, args.directory, args.items, args.chunks, args.processes, args.seed, args.interval
+        )
+    else:
+        results = resume(args.directory, args.processes)
+    for (chunk, result) in enumerate(results):
+        print('Chunk {}: {}'.format(chunk, result))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
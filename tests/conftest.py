@@ -0,0 +1,272 @@
+from gas_profiler import GasProfiler
+from helpers import MAX_RESERVES, setup_max_reserves, setup_max_reserves_positions
+from impact_analysis import changed_files, ImpactRecorder, select_affected
+from pipeline import Pipeline
+from receipts import receipt_stream, ReceiptCollector
+from snapshots import ChainSnapshot
+from pathlib import Path
+from storage_profiler import StorageProfiler
+from telemetry import TelemetrySink
+from tiers import DEFAULT_TIER, scaled, set_tier, TIER_ENV, TIER_SCALES
+from view_cache import enable_view_cache
+
+from hypothesis import settings
+
+import pytest
+
+
+# Options needing the transaction receipts of the run -> fixture processing them
+RECEIPT_CONSUMERS = {
+    'gas_profile': 'gas_profiler',
+    'storage_profile': 'storage_profiler',
+    'record_impact': 'impact_recorder',
+    'telemetry': 'telemetry_sink',
+}
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--benchmark',
+        action='store_true',
+        default=False,
+        help='Run the tests marked as benchmarks, results are written to reports/',
+    )
+    parser.addoption(
+        '--tier',
+        choices=list(TIER_SCALES),
+        default=None,
+        help='Test intensity: scales fuzz iterations, hypothesis examples and reserve/user counts '
+        '(default: ${} or {})'.format(TIER_ENV, DEFAULT_TIER),
+    )
+    parser.addoption(
+        '--evm-backend',
+        choices=['ganache', 'eth-tester'],
+        default='ganache',
+        help='Node used to execute the tests: the ganache-cli process or an in-process py-evm chain',
+    )
+    parser.addoption(
+        '--gas-profile',
+        metavar='DIR',
+        default=None,
+        help='Profile the gas of every transaction per Solidity function, writing flamegraph input and a table to DIR',
+    )
+    parser.addoption(
+        '--storage-profile',
+        metavar='DIR',
+        default=None,
+        help='Count SLOAD/SSTORE per operation and storage field, writing a report to DIR',
+    )
+    parser.addoption(
+        '--telemetry',
+        metavar='DIR',
+        default=None,
+        help='Stream one JSON line per transaction to rotated telemetry-<n>.jsonl files in DIR',
+    )
+    parser.addoption(
+        '--view-cache',
+        action='store_true',
+        default=False,
+        help='Cache view call results until the next transaction, revert, sleep or mine',
+    )
+    parser.addoption(
+        '--record-impact',
+        action='store_true',
+        default=False,
+        help='Record the contracts used by each test to reports/test_impact.json for --affected-by',
+    )
+    parser.addoption(
+        '--affected-by',
+        metavar='DIFF_RANGE',
+        default=None,
+        help='Only run tests affected by the files changed in a git diff range e.g. main..HEAD',
+    )
+
+
+# Runs after brownie's plugin has loaded the hypothesis settings of `brownie-config.yaml` and
+# before collection, so every `@given` test uses the tier's profile
+@pytest.hookimpl(trylast=True)
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'benchmark: long running benchmark, only run with --benchmark')
+    if config.getoption('tier') is not None:
+        set_tier(config.getoption('tier'))
+
+    # Scale hypothesis' `max_examples` by the test tier
+    base = settings()
+    settings.register_profile('tier', parent=base, max_examples=scaled(base.max_examples))
+    settings.load_profile('tier')
+
+
+# Benchmarks are skipped unless `--benchmark` is given
+# With `--affected-by` only tests using changed contracts are kept
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('affected_by') is not None:
+        (selected, deselected) = select_affected(items, changed_files(config.getoption('affected_by')))
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+
+    if config.getoption('benchmark'):
+        return
+    skip = pytest.mark.skip(reason='Benchmark, run with --benchmark')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
+# Receipts sent while a test runs are owned by it, see `ReceiptStream`
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    stream = receipt_stream()
+    stream.test = item.nodeid
+    yield
+    stream.test = None
+
+
+# Receipts sent while a fixture is set up are owned by the fixture
+@pytest.hookimpl(hookwrapper=True)
+def pytest_fixture_setup(fixturedef, request):
+    with receipt_stream().fixture(fixturedef.argname):
+        yield
+
+
+# Swap in the selected EVM backend once brownie has connected to the development network
+@pytest.fixture(scope='session', autouse=True)
+def evm_backend(request):
+    backend = request.config.getoption('evm_backend')
+    if backend == 'eth-tester':
+        from in_process_evm import connect_in_process_evm
+        connect_in_process_evm()
+    return backend
+
+
+# Cache repeated view calls within a block when `--view-cache` is given
+@pytest.fixture(scope='session', autouse=True)
+def view_cache(request, evm_backend):
+    if request.config.getoption('view_cache'):
+        return enable_view_cache()
+    return None
+
+
+# Hands every receipt of the run to the consumers of the options given, see `ReceiptCollector`.
+# Set up before any other session fixture so their transactions are included.
+@pytest.fixture(scope='session', autouse=True)
+def receipt_collector(request, evm_backend):
+    consumers = [fixture for (option, fixture) in RECEIPT_CONSUMERS.items() if request.config.getoption(option)]
+    if not consumers:
+        yield None
+        return
+
+    collector = ReceiptCollector()
+    for fixture in consumers:
+        collector.processors.append(request.getfixturevalue(fixture).add_receipt)
+    yield collector
+    collector.close()
+
+
+# Process the receipts of each test as it ends
+@pytest.fixture(autouse=True)
+def _flush_receipts(receipt_collector):
+    yield
+    if receipt_collector is not None:
+        receipt_collector.flush()
+
+
+# Aggregated gas profile of the run, written when the session ends
+@pytest.fixture(scope='session')
+def gas_profiler(request):
+    profiler = GasProfiler()
+    yield profiler
+    profiler.write(request.config.getoption('gas_profile'))
+
+
+# Aggregated storage access profile of the run, written when the session ends
+@pytest.fixture(scope='session')
+def storage_profiler(request):
+    profiler = StorageProfiler()
+    yield profiler
+    directory = Path(request.config.getoption('storage_profile'))
+    directory.mkdir(parents=True, exist_ok=True)
+    directory.joinpath('storage_profile.txt').write_text(profiler.report() + '\n')
+
+
+# Telemetry sink of the run, flushed when the session ends
+@pytest.fixture(scope='session')
+def telemetry_sink(request):
+    sink = TelemetrySink(request.config.getoption('telemetry'))
+    yield sink
+    sink.close()
+
+
+# Map of test -> contracts, written when the session ends
+@pytest.fixture(scope='session')
+def impact_recorder():
+    recorder = ImpactRecorder()
+    yield recorder
+    recorder.save()
+
+
+# Record the contracts used by each test when `--record-impact` is given
+@pytest.fixture(autouse=True)
+def _record_impact(request):
+    if not request.config.getoption('record_impact'):
+        yield
+        return
+
+    (recorder, collector) = (request.getfixturevalue('impact_recorder'), request.getfixturevalue('receipt_collector'))
+    fixtures = [
+        name for (name, definitions) in request.node._fixtureinfo.name2fixturedefs.items()
+        if definitions[-1].scope != 'function'
+    ]
+    collector.flush()
+    recorder.start(request.node.nodeid, fixtures)
+    yield
+    collector.flush()
+    recorder.record(request.node.nodeid)
+
+
+# Holds the max reserves market and snapshots of it with and without positions.
+# The tERC20 reserve count is scaled by the test tier up to the protocol's limit.
+class MaxReservesMarket:
+    def __init__(self):
+        self.market = setup_max_reserves(Pipeline(), max_reserves=scaled(MAX_RESERVES, minimum=3, maximum=MAX_RESERVES))
+        self.snapshot = ChainSnapshot()
+        self.positions = None
+        self.positions_snapshot = None
+
+    # Revert to the market without positions, this drops the snapshot with positions
+    def revert(self):
+        self.snapshot.revert()
+        self.positions_snapshot = None
+        return self.market
+
+    # Revert to the market with positions, building them on the first use after a `revert()`
+    def revert_with_positions(self):
+        if self.positions_snapshot is None:
+            self.snapshot.revert()
+            (addresses_provider, lending_pool, configurator, collateral_manager,
+            pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+            weth_stable_debt, weth_variable_debt, strategy, assets, atokens, stable_tokens,
+            variable_tokens) = self.market
+            self.positions = setup_max_reserves_positions(lending_pool, assets, Pipeline())
+            self.positions_snapshot = ChainSnapshot()
+        else:
+            self.positions_snapshot.revert()
+        return self.market + self.positions
+
+
+# Built once per session when first used
+@pytest.fixture(scope='session')
+def _max_reserves_market():
+    return MaxReservesMarket()
+
+
+# A fresh copy of the 128 reserve market (WETH and 127 tERC20 in the full tier), see `setup_max_reserves()`
+@pytest.fixture
+def max_reserves_market(_max_reserves_market):
+    return _max_reserves_market.revert()
+
+
+# As `max_reserves_market` followed by the alice and bob positions of `setup_max_reserves_positions()`
+@pytest.fixture
+def max_reserves_market_with_positions(_max_reserves_market):
+    return _max_reserves_market.revert_with_positions()
@@ -0,0 +1,110 @@
+from brownie import (
+    AToken, Contract, StableDebtToken, VariableDebtToken, web3
+)
+
+from snapshots import ChainSnapshot
+
+
+# Seconds between the pinned block timestamps of consecutive scenario steps
+STEP_SECONDS = 60
+
+
+# Outcome of one scenario run: per step (label, gas used, events) and the final state
+class ScenarioRun:
+    def __init__(self):
+        self.steps = []
+        self.state = {}
+
+
+# Differences between two `ScenarioRun`s of the same scenario
+class DifferentialResult:
+    def __init__(self, original, variant):
+        self.original = original
+        self.variant = variant
+
+        self.state_diffs = [
+            (key, original.state.get(key), variant.state.get(key))
+            for key in sorted(set(original.state) | set(variant.state))
+            if original.state.get(key) != variant.state.get(key)
+        ]
+        self.event_diffs = [
+            (label, original_events, variant_events)
+            for ((label, _, original_events), (_, _, variant_events)) in zip(original.steps, variant.steps)
+            if original_events != variant_events
+        ]
+        self.gas = [
+            (label, original_gas, variant_gas)
+            for ((label, original_gas, _), (_, variant_gas, _)) in zip(original.steps, variant.steps)
+        ]
+
+    # Report lines with the gas of each step and every state and event difference
+    def report(self):
+        lines = ['{:<32} {:>10} {:>10} {:>8}'.format('Step', 'Original', 'Variant', 'Delta')]
+        for (label, original_gas, variant_gas) in self.gas:
+            lines.append('{:<32} {:>10,} {:>10,} {:>+8,}'.format(
+                label, original_gas, variant_gas, variant_gas - original_gas
+            ))
+        lines.append('')
+        lines.append('State differences: {}'.format(len(self.state_diffs)))
+        for (key, original_value, variant_value) in self.state_diffs:
+            lines.append('  {}: {} -> {}'.format(key, original_value, variant_value))
+        lines.append('Event differences: {}'.format(len(self.event_diffs)))
+        for (label, original_events, variant_events) in self.event_diffs:
+            lines.append('  {}: {} -> {}'.format(label, original_events, variant_events))
+        return lines
+
+
+# Runs a scripted scenario against two implementation sets from the same snapshot.
+#
+# A scenario is a list of (label, step) where `step(market)` sends the transactions of that step
+# and returns the last one. Each step starts from a pinned block timestamp so interest accrues
+# identically in both runs. `upgrade(market)` switches the market to the variant implementations
+# (e.g. `upgrade_to_sigp_implementations()`) and `users` are the accounts whose balances are diffed.
+def run_differential(market, lending_pool, scenario, upgrade, users):
+    snapshot = ChainSnapshot()
+    start_time = web3.eth.getBlock('latest').timestamp + STEP_SECONDS
+
+    original = run_scenario(market, lending_pool, scenario, users, start_time)
+    snapshot.revert()
+    upgrade(market)
+    variant = run_scenario(market, lending_pool, scenario, users, start_time)
+    snapshot.revert()
+
+    return DifferentialResult(original, variant)
+
+
+def run_scenario(market, lending_pool, scenario, users, start_time):
+    run = ScenarioRun()
+    for (i, (label, step)) in enumerate(scenario):
+        # Ganache's `evm_mine` with a timestamp also sets the clock for the following blocks
+        web3.manager.request_blocking('evm_mine', [start_time + i * STEP_SECONDS])
+        tx = step(market)
+        events = [(event.name, dict(event)) for event in tx.events]
+        run.steps.append((label, tx.gas_used, events))
+
+    run.state = market_state(lending_pool, users)
+    return run
+
+
+# Flat map of reserve data, user account data and token balances
+def market_state(lending_pool, users):
+    state = {}
+    for asset in lending_pool.getReservesList():
+        reserve = lending_pool.getReserveData(asset)
+        state[('reserve', asset)] = tuple(reserve)
+
+        tokens = [
+            ('aToken', Contract.from_abi(AToken, reserve[7], AToken.abi)),
+            ('stableDebt', Contract.from_abi(StableDebtToken, reserve[8], StableDebtToken.abi)),
+            ('variableDebt', Contract.from_abi(VariableDebtToken, reserve[9], VariableDebtToken.abi)),
+        ]
+        for (name, token) in tokens:
+            state[(name + 'TotalSupply', asset)] = token.totalSupply()
+            for user in users:
+                state[(name, asset, user.address)] = token.balanceOf(user)
+
+    for user in users:
+        state[('account', user.address)] = tuple(lending_pool.getUserAccountData(user))
+        state[('configuration', user.address)] = tuple(lending_pool.getUserConfiguration(user))
+
+    return state
@@ -0,0 +1,208 @@
+from brownie import (
+    AToken, LendingPool, LendingPoolConfigurator, StableDebtToken, VariableDebtToken, web3
+)
+from eth_utils import event_abi_to_log_topic
+from web3._utils.events import get_event_data
+
+from helpers import ray_div
+
+import json
+import sqlite3
+
+
+# Blocks fetched per `eth_getLogs` request and committed per SQLite transaction
+BATCH_SIZE = 1_000
+
+# Contracts whose events are indexed
+INDEXED_CONTAINERS = [LendingPool, LendingPoolConfigurator, AToken, StableDebtToken, VariableDebtToken]
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS blocks (
+    number INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    address TEXT NOT NULL,
+    name TEXT NOT NULL,
+    user TEXT,
+    reserve TEXT,
+    args TEXT NOT NULL,
+    PRIMARY KEY (block_number, log_index)
+);
+CREATE INDEX IF NOT EXISTS events_name ON events (name, block_number);
+CREATE INDEX IF NOT EXISTS events_user ON events (user);
+CREATE INDEX IF NOT EXISTS events_reserve ON events (reserve, name);
+'''
+
+
+# Map of topic -> event ABI for every event of `containers`
+def _event_abis(containers):
+    abis = {}
+    for container in containers:
+        for abi in container.abi:
+            if abi['type'] == 'event':
+                abis[event_abi_to_log_topic(abi)] = abi
+    return abis
+
+
+def _json_value(value):
+    if isinstance(value, bytes):
+        return '0x' + value.hex()
+    if isinstance(value, (list, tuple)):
+        return [_json_value(v) for v in value]
+    return value
+
+
+# Incremental SQLite index of the `LendingPool`, `LendingPoolConfigurator` and reserve token
+# events on the connected node.
+#
+# `sync()` ingests new blocks in batches. Each synced batch records the hash of its last block
+# (and of every block with events) so a `chain.revert()` or snapshot revert is detected on the
+# next `sync()` and the rolled back blocks are truncated before ingesting again.
+#
+# Usage:
+#   index = EventIndex(lending_pool, configurator)
+#   index.sync()
+#   index.borrowers(weth)
+#   index.events('LiquidationCall', from_block=a, to_block=b)
+class EventIndex:
+    def __init__(self, lending_pool, configurator, path=':memory:'):
+        self.lending_pool = lending_pool
+        self.configurator = configurator
+        self.db = sqlite3.connect(str(path))
+        self.db.executescript(SCHEMA)
+        self._abis = _event_abis(INDEXED_CONTAINERS)
+
+    # Highest indexed block, -1 when empty
+    def height(self):
+        (height,) = self.db.execute('SELECT MAX(number) FROM blocks').fetchone()
+        return -1 if height is None else height
+
+    # Addresses of the pool, configurator and every reserve's tokens
+    def addresses(self):
+        addresses = [self.lending_pool.address, self.configurator.address]
+        for asset in self.lending_pool.getReservesList():
+            data = self.lending_pool.getReserveData(asset)
+            addresses.extend([data[7], data[8], data[9]])
+        return addresses
+
+    # Index all blocks up to the chain head, returns the number of events added
+    def sync(self, batch_size=BATCH_SIZE):
+        self._truncate_reverted()
+        head = web3.eth.blockNumber
+        addresses = self.addresses()
+        added = 0
+        start = self.height() + 1
+        while start <= head:
+            end = min(start + batch_size - 1, head)
+            logs = web3.eth.getLogs({'fromBlock': start, 'toBlock': end, 'address': addresses})
+            with self.db:
+                added += self._ingest(logs)
+                self.db.execute(
+                    'INSERT OR REPLACE INTO blocks VALUES (?, ?)', (end, web3.eth.getBlock(end).hash.hex())
+                )
+            start = end + 1
+        return added
+
+    def _ingest(self, logs):
+        rows = []
+        for log in logs:
+            abi = self._abis.get(bytes(log['topics'][0])) if log['topics'] else None
+            if abi is None:
+                continue
+            event = get_event_data(web3.codec, abi, log)
+            args = {name: _json_value(value) for (name, value) in event['args'].items()}
+            user = args.get('onBehalfOf', args.get('user', args.get('from')))
+            reserve = args.get('reserve', args.get('asset'))
+            rows.append((
+                log['blockNumber'], log['logIndex'], log['transactionHash'].hex(), log['address'],
+                event['event'], user, reserve, json.dumps(args),
+            ))
+            self.db.execute(
+                'INSERT OR REPLACE INTO blocks VALUES (?, ?)', (log['blockNumber'], log['blockHash'].hex())
+            )
+        self.db.executemany('INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    # Drop indexed blocks which are no longer part of the chain
+    def _truncate_reverted(self):
+        head = web3.eth.blockNumber
+        for (number, block_hash) in self.db.execute('SELECT number, hash FROM blocks ORDER BY number DESC').fetchall():
+            if number <= head and web3.eth.getBlock(number).hash.hex() == block_hash:
+                self.truncate(number)
+                return
+        self.truncate(-1)
+
+    # Remove everything after `block`
+    def truncate(self, block):
+        with self.db:
+            self.db.execute('DELETE FROM events WHERE block_number > ?', (block,))
+            self.db.execute('DELETE FROM blocks WHERE number > ?', (block,))
+
+    # Indexed events as dicts, optionally filtered by name, emitting address and block range
+    def events(self, name=None, from_block=None, to_block=None, address=None):
+        clauses = []
+        params = []
+        for (clause, value) in [
+            ('name = ?', name),
+            ('block_number >= ?', from_block),
+            ('block_number <= ?', to_block),
+            ('address = ?', address),
+        ]:
+            if value is not None:
+                clauses.append(clause)
+                params.append(str(value))
+        sql = 'SELECT block_number, log_index, tx_hash, address, name, args FROM events'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY block_number, log_index'
+        return [
+            {
+                'block_number': block_number, 'log_index': log_index, 'tx_hash': tx_hash,
+                'address': address, 'name': name, 'args': json.loads(args),
+            }
+            for (block_number, log_index, tx_hash, address, name, args) in self.db.execute(sql, params)
+        ]
+
+    # Every user who ever borrowed `asset`
+    def borrowers(self, asset):
+        rows = self.db.execute(
+            "SELECT DISTINCT user FROM events WHERE name = 'Borrow' AND reserve = ? ORDER BY user",
+            (str(asset),),
+        )
+        return [user for (user,) in rows]
+
+    # Scaled balances of an aToken or variable debt token rebuilt from its Mint, Burn and
+    # BalanceTransfer events, compare with `scaledBalanceOf()`
+    def scaled_balances(self, token):
+        balances = {}
+        for event in self.events(address=token):
+            (name, args) = (event['name'], event['args'])
+            if name == 'Mint':
+                user = args.get('onBehalfOf', args.get('from'))
+                balances[user] = balances.get(user, 0) + ray_div(args['value'], args['index'])
+            elif name == 'Burn':
+                user = args.get('user', args.get('from'))
+                balances[user] = balances.get(user, 0) - ray_div(args.get('value', args.get('amount')), args['index'])
+            elif name == 'BalanceTransfer':
+                amount = ray_div(args['value'], args['index'])
+                balances[args['from']] = balances.get(args['from'], 0) - amount
+                balances[args['to']] = balances.get(args['to'], 0) + amount
+        return balances
+
+    # Principal balances of a stable debt token rebuilt from its Mint and Burn events,
+    # compare with `principalBalanceOf()`
+    def stable_principal_balances(self, token):
+        balances = {}
+        for event in self.events(address=token):
+            (name, args) = (event['name'], event['args'])
+            if name == 'Mint':
+                user = args['onBehalfOf']
+                balances[user] = balances.get(user, 0) + args['amount'] + args['balanceIncrease']
+            elif name == 'Burn':
+                user = args['user']
+                balances[user] = balances.get(user, 0) + args['balanceIncrease'] - args['amount']
+        return balances
@@ -0,0 +1,129 @@
+from brownie import network, project
+from brownie._config import CONFIG
+
+from contextlib import contextmanager
+from pathlib import Path
+
+import json
+import socket
+import subprocess
+import time
+import urllib.request
+
+
+# `cmd_settings` of the `development` network and the matching ganache-cli flags
+GANACHE_FLAGS = {
+    'accounts': '--accounts',
+    'default_balance': '--defaultBalanceEther',
+    'gas_limit': '--gasLimit',
+    'mnemonic': '--mnemonic',
+    'evm_version': '--hardfork',
+    'chain_id': '--chainId',
+    'network_id': '--networkId',
+}
+
+# Seconds to wait for a node to answer after launching
+STARTUP_TIMEOUT = 60
+
+
+# An unused local TCP port
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+# A ganache-cli process launched with the `development` network settings of
+# `brownie-config.yaml` on its own port, optionally persisting the chain to `db_path`.
+#
+# Several nodes can run side by side, e.g. one per worker process. `connect()` points brownie at
+# the node, brownie attaches to it rather than launching its own.
+class GanacheNode:
+    def __init__(self, db_path=None, port=None):
+        self.db_path = None if db_path is None else Path(db_path)
+        self.port = port or free_port()
+        self.url = 'http://127.0.0.1:{}'.format(self.port)
+        self.process = None
+
+    def command(self):
+        development = CONFIG.networks['development']
+        command = [development.get('cmd', 'ganache-cli'), '--port', str(self.port)]
+        for (key, value) in development.get('cmd_settings', {}).items():
+            if key in GANACHE_FLAGS and value is not None:
+                command += [GANACHE_FLAGS[key], str(value)]
+        if self.db_path is not None:
+            self.db_path.mkdir(parents=True, exist_ok=True)
+            command += ['--db', str(self.db_path)]
+        return command
+
+    def start(self):
+        self.process = subprocess.Popen(self.command(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while not self.is_ready():
+            if self.process.poll() is not None:
+                raise RuntimeError('ganache-cli exited with {} on port {}'.format(self.process.returncode, self.port))
+            if time.monotonic() > deadline:
+                self.stop()
+                raise RuntimeError('ganache-cli did not start on port {}'.format(self.port))
+            time.sleep(0.1)
+
+    def is_ready(self):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({'jsonrpc': '2.0', 'id': 0, 'method': 'web3_clientVersion', 'params': []}).encode(),
+            headers={'Content-Type': 'application/json'},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=1):
+                return True
+        except OSError:
+            return False
+
+    # Terminate the node, with `db_path` its database is flushed and can be copied once stopped
+    def stop(self):
+        if self.process is None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=STARTUP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    # Connect brownie's `development` network to this node
+    def connect(self):
+        if network.is_connected():
+            network.disconnect(kill_rpc=False)
+        CONFIG.networks['development']['host'] = self.url
+        network.connect('development')
+
+    def disconnect(self):
+        if network.is_connected():
+            network.disconnect(kill_rpc=False)
+
+
+# Root of the loaded brownie project, passed to worker processes
+def project_root():
+    loaded = project.get_loaded_projects()
+    return str(loaded[0]._path) if loaded else '.'
+
+
+# Worker process set up: load the brownie project at `root` (once per process) and connect to a
+# new `GanacheNode`, stopped on exit
+@contextmanager
+def worker_node(root, db_path=None):
+    if not project.get_loaded_projects():
+        project.load(root)
+    node = GanacheNode(db_path)
+    node.start()
+    try:
+        node.connect()
+        yield node
+    finally:
+        node.disconnect()
+        node.stop()
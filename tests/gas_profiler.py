@@ -0,0 +1,118 @@
+from collections import defaultdict
+from pathlib import Path
+
+
+# Opcodes which execute code in a new external call frame
+CALL_OPS = {'CALL', 'CALLCODE', 'DELEGATECALL', 'STATICCALL', 'CREATE', 'CREATE2'}
+
+# Frame used for gas which is not spent executing a function (intrinsic gas, calldata, refunds)
+INTRINSIC_FRAME = '[intrinsic]'
+
+
+# Attributes the gas of a transaction to the Solidity functions on its call stack.
+#
+# Uses brownie's `tx.trace`, which is fetched from the node with `debug_traceTransaction` and
+# labels every step with the internal or external function (`fn`) using the compiled source maps.
+# Returns a dictionary mapping a call stack (a tuple of function names, outermost first) to the
+# gas spent in the innermost function of that stack.
+#
+# Usage:
+#   tx = lending_pool.borrow(...)
+#   stacks = profile_transaction(tx)
+def profile_transaction(tx):
+    trace = tx.trace
+    stacks = defaultdict(int)
+    stack = [] # entries of (depth, jumpDepth, fn)
+    pending_calls = [] # entries of (call stack, gas before the call, gas attributed before the call)
+    attributed = 0
+
+    for (i, step) in enumerate(trace):
+        level = (step['depth'], step['jumpDepth'])
+
+        # Returned from an external call: attribute the call overhead to the caller
+        while pending_calls and step['depth'] <= pending_calls[-1][0][-1][0]:
+            (call_stack, gas_before, attributed_before) = pending_calls.pop()
+            overhead = gas_before - step['gas'] - (attributed - attributed_before)
+            stacks[_names(call_stack)] += overhead
+            attributed += overhead
+
+        # Leave functions which have returned and enter the current one
+        while stack and stack[-1][:2] > level:
+            stack.pop()
+        fn = _function_name(step)
+        if stack and stack[-1][:2] == level:
+            stack[-1] = (level[0], level[1], fn)
+        else:
+            stack.append((level[0], level[1], fn))
+
+        following = trace[i + 1] if i + 1 < len(trace) else None
+        if step['op'] in CALL_OPS and following is not None and following['depth'] > step['depth']:
+            pending_calls.append((list(stack), step['gas'], attributed))
+            continue
+
+        if step['op'] in CALL_OPS and following is not None and following['depth'] == step['depth']:
+            cost = step['gas'] - following['gas'] # call to an account without code
+        else:
+            cost = step['gasCost']
+        stacks[_names(stack)] += cost
+        attributed += cost
+
+    stacks[(INTRINSIC_FRAME,)] += tx.gas_used - attributed
+    return dict(stacks)
+
+
+# Aggregates `profile_transaction()` over many transactions, e.g. a whole test run
+class GasProfiler:
+    def __init__(self):
+        self.stacks = defaultdict(int)
+        self.transactions = 0
+
+    def add(self, tx):
+        for (stack, gas) in profile_transaction(tx).items():
+            self.stacks[stack] += gas
+        self.transactions += 1
+
+    # Processor of a `ReceiptCollector`
+    def add_receipt(self, tx, owner):
+        self.add(tx)
+
+    # Per function gas: `self` is spent in the function itself, `inclusive` includes its callees
+    def functions(self):
+        functions = defaultdict(lambda: {'self': 0, 'inclusive': 0})
+        for (stack, gas) in self.stacks.items():
+            functions[stack[-1]]['self'] += gas
+            for fn in set(stack):
+                functions[fn]['inclusive'] += gas
+        return dict(functions)
+
+    # Collapsed stack lines as consumed by `flamegraph.pl` / speedscope
+    def collapsed(self):
+        return ['{} {}'.format(';'.join(stack), gas) for (stack, gas) in sorted(self.stacks.items()) if gas > 0]
+
+    def table(self):
+        rows = sorted(self.functions().items(), key=lambda item: item[1]['inclusive'], reverse=True)
+        width = max([len(fn) for (fn, _) in rows] + [len('Function')])
+        lines = ['{} {:>14} {:>14}'.format('Function'.ljust(width), 'Self gas', 'Inclusive gas')]
+        for (fn, gas) in rows:
+            lines.append('{} {:>14,} {:>14,}'.format(fn.ljust(width), gas['self'], gas['inclusive']))
+        return '\n'.join(lines)
+
+    def write(self, directory):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        directory.joinpath('gas_profile.folded').write_text('\n'.join(self.collapsed()) + '\n')
+        directory.joinpath('gas_profile.txt').write_text(
+            '{} transactions\n\n{}\n'.format(self.transactions, self.table())
+        )
+
+
+def _function_name(step):
+    if step['fn']:
+        return step['fn']
+    if step['contractName']:
+        return step['contractName']
+    return step['address']
+
+
+def _names(stack):
+    return tuple(fn for (_, _, fn) in stack)
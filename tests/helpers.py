@@ -1,12 +1,14 @@
 from brownie import (
-    accounts, AToken, Contract, DefaultReserveInterestRateStrategy,
+    accounts, AToken, AToken2, Contract, DefaultReserveInterestRateStrategy,
     GenericLogic, LendingPool, LendingPool2,
     LendingPoolAddressesProvider, LendingPoolConfigurator,
     LendingPoolCollateralManager, LendingRateOracle, MintableDelegationERC20, PriceOracle, ReserveLogic,
-    reverts, StableDebtToken, VariableDebtToken, ValidationLogic, WETH9, ZERO_ADDRESS
+    reverts, StableDebtToken, StableDebtToken2, VariableDebtToken, VariableDebtToken2, ValidationLogic,
+    WETH9, ZERO_ADDRESS
 )
 
 from Crypto.Hash import keccak
+from pipeline import Pipeline
 import pytest
 
 # Wei (10^18)
@@ -60,6 +62,12 @@ LTV = 3_000 # 30%
 THRESHOLD = 5_000 # 50%
 BONUS = 11_000 # 110%
 
+# `LendingPoolCollateralManager.LIQUIDATION_CLOSE_FACTOR_PERCENT`
+LIQUIDATION_CLOSE_FACTOR_PERCENT = 5_000 # 50%
+
+# `GenericLogic.HEALTH_FACTOR_LIQUIDATION_THRESHOLD`
+HEALTH_FACTOR_LIQUIDATION_THRESHOLD = WAD
+
 
 #################################
 # Setup and Deployment functions
@@ -68,30 +76,38 @@ BONUS = 11_000 # 110%
 
 # Deploy and initialize contracts required for `LendingPool`.
 # Additionally, set `LendingPool` and `LendingPoolConfiguration` to the proxy contracts.
-def setup_and_deploy():
-    # Dependent contracts
-    accounts[0].deploy(ReserveLogic)
-    accounts[0].deploy(GenericLogic)
-    accounts[0].deploy(ValidationLogic)
+# Pass a `Pipeline()` to submit independent transactions without waiting for each receipt.
+def setup_and_deploy(pipeline=None):
+    if pipeline is None:
+        pipeline = Pipeline(enabled=False)
+    owner = {'from': accounts[0]}
+
+    # Dependent contracts (must be deployed before linking `LendingPool`)
+    pipeline.deploy(ReserveLogic, owner)
+    pipeline.deploy(GenericLogic, owner)
+    pipeline.deploy(ValidationLogic, owner)
+    pipeline.join()
 
     # Deployed contracts
-    provider = accounts[0].deploy(LendingPoolAddressesProvider)
-    pool = accounts[0].deploy(LendingPool)
-    configurator = accounts[0].deploy(LendingPoolConfigurator)
-    collateral_manager = accounts[0].deploy(LendingPoolCollateralManager)
+    pipeline.deploy(LendingPoolAddressesProvider, owner)
+    pipeline.deploy(LendingPool, owner)
+    pipeline.deploy(LendingPoolConfigurator, owner)
+    pipeline.deploy(LendingPoolCollateralManager, owner)
+    pipeline.deploy(PriceOracle, owner)
+    pipeline.deploy(LendingRateOracle, owner)
+    (provider, pool, configurator, collateral_manager, price_oracle, lending_rate_oracle) = pipeline.join()[-6:]
     pool_admin = accounts[1]
     emergency_admin = accounts[2]
-    price_oracle = accounts[0].deploy(PriceOracle)
-    lending_rate_oracle = accounts[0].deploy(LendingRateOracle)
 
     # Setups & Initialization
-    provider.setLendingPoolImpl(pool.address)
-    provider.setLendingPoolConfiguratorImpl(configurator.address)
-    provider.setLendingPoolCollateralManager(collateral_manager.address)
-    provider.setPoolAdmin(pool_admin)
-    provider.setEmergencyAdmin(emergency_admin)
-    provider.setPriceOracle(price_oracle)
-    provider.setLendingRateOracle(lending_rate_oracle)
+    pipeline.transact(provider.setLendingPoolImpl, pool.address, owner)
+    pipeline.transact(provider.setLendingPoolConfiguratorImpl, configurator.address, owner)
+    pipeline.transact(provider.setLendingPoolCollateralManager, collateral_manager.address, owner)
+    pipeline.transact(provider.setPoolAdmin, pool_admin, owner)
+    pipeline.transact(provider.setEmergencyAdmin, emergency_admin, owner)
+    pipeline.transact(provider.setPriceOracle, price_oracle, owner)
+    pipeline.transact(provider.setLendingRateOracle, lending_rate_oracle, owner)
+    pipeline.join()
 
     # Proxy the required contracts
     pool_proxy = Contract.from_abi(LendingPool, provider.getLendingPool(), pool.abi)
@@ -103,41 +119,50 @@ def setup_and_deploy():
 
 
 # Deploys and setup require contracts for `LendingPoolConfiguration`
-def setup_and_deploy_configuration():
+def setup_and_deploy_configuration(pipeline=None):
+    if pipeline is None:
+        pipeline = Pipeline(enabled=False)
+    owner = {'from': accounts[0]}
+
     # Deploy and initialize contracts
     (addresses_provider, lending_pool, configurator, collateral_manager,
-    pool_admin, emergency_admin, price_oracle, lending_rate_oracle) = setup_and_deploy()
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle) = setup_and_deploy(pipeline)
 
     # Deploy contracts required for a Reserve
     incentivesController = ZERO_ADDRESS
     reserveTreasuryAddress = ZERO_ADDRESS
-    weth = accounts[0].deploy(WETH9)
-    atoken = accounts[0].deploy(
+    pipeline.deploy(WETH9, owner)
+    weth = pipeline.join()[-1]
+    pipeline.deploy(
         AToken,
         lending_pool.address,
         weth.address,
         reserveTreasuryAddress,
         'Aave interest bearing WETH',
         'aWETH',
-        incentivesController
+        incentivesController,
+        owner,
     )
-    stable_debt = accounts[0].deploy(
+    pipeline.deploy(
         StableDebtToken,
         lending_pool.address,
         weth.address,
         "Aave stable debt bearing WETH",
         "stableDebtWETH",
         incentivesController,
+        owner,
     )
-    variable_debt = accounts[0].deploy(
+    pipeline.deploy(
         VariableDebtToken,
         lending_pool.address,
         weth.address,
         "Aave variable debt bearing WETH",
         "variableDebtWETH",
         incentivesController,
+        owner,
     )
-    strategy = deploy_default_strategy(addresses_provider.address)
+    deploy_default_strategy(addresses_provider.address, pipeline)
+    (atoken, stable_debt, variable_debt, strategy) = pipeline.join()[-4:]
 
     return (addresses_provider, lending_pool, configurator, collateral_manager,
         pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, atoken,
@@ -145,17 +170,21 @@ def setup_and_deploy_configuration():
 
 
 # Deploys and setup require contracts for `LendingPoolConfiguration`
-def setup_and_deploy_configuration_with_reserve():
+def setup_and_deploy_configuration_with_reserve(pipeline=None):
+    if pipeline is None:
+        pipeline = Pipeline(enabled=False)
+
     (addresses_provider, lending_pool, configurator, collateral_manager,
     pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, atoken,
-    stable_debt, variable_debt, strategy) = setup_and_deploy_configuration()
+    stable_debt, variable_debt, strategy) = setup_and_deploy_configuration(pipeline)
 
     # initReserve()
-    (atoken_proxy, stable_proxy, variable_proxy) = setup_new_reserve(configurator, weth, lending_pool, pool_admin)
+    (atoken_proxy, stable_proxy, variable_proxy) = setup_new_reserve(configurator, weth, lending_pool, pool_admin, pipeline)
 
     # Set price oracle, weth and usd prices
-    price_oracle.setAssetPrice(weth.address, WEI, {'from': accounts[0]})
-    price_oracle.setEthUsdPrice(500)
+    pipeline.transact(price_oracle.setAssetPrice, weth.address, WEI, {'from': accounts[0]})
+    pipeline.transact(price_oracle.setEthUsdPrice, 500, {'from': accounts[0]})
+    pipeline.join()
 
     return (addresses_provider, lending_pool, configurator, collateral_manager,
     pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, atoken_proxy,
@@ -163,36 +192,45 @@ def setup_and_deploy_configuration_with_reserve():
 
 
 # Add and initialise an additional reserve, creating require tokens
-def setup_new_reserve(configurator, asset, lending_pool, pool_admin):
+def setup_new_reserve(configurator, asset, lending_pool, pool_admin, pipeline=None):
+    if pipeline is None:
+        pipeline = Pipeline(enabled=False)
+    owner = {'from': accounts[0]}
+
     # Deploy contracts required for a Reserve
     incentivesController = ZERO_ADDRESS
     reserveTreasuryAddress = ZERO_ADDRESS
-    atoken = accounts[0].deploy(
+    symbol = asset.symbol()
+    pipeline.deploy(
         AToken,
         lending_pool.address,
         asset.address,
         reserveTreasuryAddress,
-        'Aave interest bearing ' + asset.symbol(),
-        'a' +  asset.symbol(),
-        incentivesController
+        'Aave interest bearing ' + symbol,
+        'a' +  symbol,
+        incentivesController,
+        owner,
     )
-    stable_debt = accounts[0].deploy(
+    pipeline.deploy(
         StableDebtToken,
         lending_pool.address,
         asset.address,
-        "Aave stable debt bearing " + asset.symbol(),
-        "stableDebt" + asset.symbol(),
+        "Aave stable debt bearing " + symbol,
+        "stableDebt" + symbol,
         incentivesController,
+        owner,
     )
-    variable_debt = accounts[0].deploy(
+    pipeline.deploy(
         VariableDebtToken,
         lending_pool.address,
         asset.address,
-        "Aave variable debt bearing " + asset.symbol(),
-        "variableDebt" + asset.symbol(),
+        "Aave variable debt bearing " + symbol,
+        "variableDebt" + symbol,
         incentivesController,
+        owner,
     )
-    strategy = deploy_default_strategy(lending_pool.getAddressesProvider())
+    deploy_default_strategy(lending_pool.getAddressesProvider(), pipeline)
+    (atoken, stable_debt, variable_debt, strategy) = pipeline.join()[-4:]
 
     (atoken_proxy, stable_proxy, variable_proxy) = init_reserve_and_set_proxies(configurator, atoken, stable_debt, variable_debt, asset, strategy, pool_admin)
 
@@ -224,81 +262,161 @@ def init_reserve_and_set_proxies(configurator, atoken, stable_debt, variable_deb
     return (atoken_proxy, stable_proxy, variable_proxy)
 
 
+# Upgrade `LendingPool` and every reserve's tokens to the `sigp-contracts` implementations
+# (`LendingPool2`, `AToken2`, `StableDebtToken2` and `VariableDebtToken2`)
+def upgrade_to_sigp_implementations(addresses_provider, lending_pool, configurator, pool_admin):
+    lending_pool_2 = accounts[0].deploy(LendingPool2)
+    addresses_provider.setLendingPoolImpl(lending_pool_2.address, {'from': accounts[0]})
+
+    incentivesController = ZERO_ADDRESS
+    reserveTreasuryAddress = ZERO_ADDRESS
+    for asset_address in lending_pool.getReservesList():
+        asset = Contract.from_abi(MintableDelegationERC20, asset_address, MintableDelegationERC20.abi)
+        symbol = asset.symbol()
+        atoken = accounts[0].deploy(
+            AToken2,
+            lending_pool.address,
+            asset_address,
+            reserveTreasuryAddress,
+            'Aave interest bearing ' + symbol,
+            'a' + symbol,
+            incentivesController,
+        )
+        stable_debt = accounts[0].deploy(
+            StableDebtToken2,
+            lending_pool.address,
+            asset_address,
+            "Aave stable debt bearing " + symbol,
+            "stableDebt" + symbol,
+            incentivesController,
+        )
+        variable_debt = accounts[0].deploy(
+            VariableDebtToken2,
+            lending_pool.address,
+            asset_address,
+            "Aave variable debt bearing " + symbol,
+            "variableDebt" + symbol,
+            incentivesController,
+        )
+        configurator.updateAToken(asset_address, atoken.address, {'from': pool_admin})
+        configurator.updateStableDebtToken(asset_address, stable_debt.address, {'from': pool_admin})
+        configurator.updateVariableDebtToken(asset_address, variable_debt.address, {'from': pool_admin})
+
+
+# Upgrade the aToken of `asset` to `AToken2` minting to `treasury` and set the reserve factor.
+# Note: the aToken proxy only initializes a higher revision, so the reserve must still be at the
+# original `AToken`. Call this once per reserve, it fails on a reserve already upgraded to `AToken2`.
+def set_reserve_treasury(configurator, asset, lending_pool, treasury, reserve_factor, pool_admin):
+    symbol = asset.symbol()
+    atoken = accounts[0].deploy(
+        AToken2,
+        lending_pool.address,
+        asset.address,
+        treasury,
+        'Aave interest bearing ' + symbol,
+        'a' + symbol,
+        ZERO_ADDRESS,
+    )
+    configurator.updateAToken(asset.address, atoken.address, {'from': pool_admin})
+    configurator.setReserveFactor(asset.address, reserve_factor, {'from': pool_admin})
+
+
 # Turn on reserve borrowing and collateral at default rates
-def allow_reserve_collateral_and_borrowing(configurator, asset, pool_admin, params=None):
-    configurator.enableBorrowingOnReserve(asset.address, True, {'from': pool_admin})
+# Note: when a `pipeline` is given the transactions are only submitted, the caller must `join()` it
+def allow_reserve_collateral_and_borrowing(configurator, asset, pool_admin, params=None, pipeline=None):
+    if pipeline is None:
+        pipeline = Pipeline(enabled=False)
+
+    pipeline.transact(configurator.enableBorrowingOnReserve, asset.address, True, {'from': pool_admin})
     if (params != None):
         (ltv, threshold, bonus) = params
-        configurator.configureReserveAsCollateral(asset.address, ltv, threshold, bonus, {'from': pool_admin})
+        pipeline.transact(configurator.configureReserveAsCollateral, asset.address, ltv, threshold, bonus, {'from': pool_admin})
         return (ltv, threshold, bonus)
     else:
-        configurator.configureReserveAsCollateral(asset.address, LTV, THRESHOLD, BONUS, {'from': pool_admin})
+        pipeline.transact(configurator.configureReserveAsCollateral, asset.address, LTV, THRESHOLD, BONUS, {'from': pool_admin})
         return (LTV, THRESHOLD, BONUS)
 
 
 
-# Deploys a `DefaultReserveInterestRateStrategy` with the default configuration.
-def deploy_default_strategy(addresses_provider):
-    return accounts[0].deploy(
+# Deploys a `DefaultReserveInterestRateStrategy` with the default configuration, or with `params`
+# (optimal utilization rate, base variable borrow rate, variable slope 1 & 2, stable slope 1 & 2).
+# Note: when a `pipeline` is given the deployment is only submitted, the caller must `join()` it
+def deploy_default_strategy(addresses_provider, pipeline=None, params=None):
+    if pipeline is None:
+        pipeline = Pipeline(enabled=False)
+    if params is None:
+        params = (
+            OPTIMAL_UTILIZATION_RATE,
+            BASE_VARIABLE_BORROW_RATE,
+            VARIABLE_RATE_SLOPE_1,
+            VARIABLE_RATE_SLOPE_2,
+            STABLE_RATE_SLOPE_1,
+            STABLE_RATE_SLOPE_2,
+        )
+
+    return pipeline.deploy(
         DefaultReserveInterestRateStrategy,
         addresses_provider,
-        OPTIMAL_UTILIZATION_RATE,
-        BASE_VARIABLE_BORROW_RATE,
-        VARIABLE_RATE_SLOPE_1,
-        VARIABLE_RATE_SLOPE_2,
-        STABLE_RATE_SLOPE_1,
-        STABLE_RATE_SLOPE_2,
+        *params,
+        {'from': accounts[0]},
     )
 
 
 # Helper for testing `borrow()` functionality
 # Makes a `depositer` deposit WETH
 # Creates a `borrower` with a tERC20 allowance to the `LendingPool`
-def setup_borrow():
+# Pass a `Pipeline()` to submit independent transactions without waiting for each receipt.
+def setup_borrow(pipeline=None):
+    if pipeline is None:
+        pipeline = Pipeline(enabled=False)
+
     # Deploy and initialize contracts (initializes a weth reserve)
     (addresses_provider, lending_pool, configurator, collateral_manager,
     pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
-    weth_stable_debt, weth_variable_debt, strategy) = setup_and_deploy_configuration_with_reserve()
+    weth_stable_debt, weth_variable_debt, strategy) = setup_and_deploy_configuration_with_reserve(pipeline)
 
     # Create asset and give allowance to lending pool
     depositer = accounts[4]
     deposit_amount = 10_000_000_000_000_000_000
-    weth.deposit({'from': depositer, 'value': deposit_amount})
-    weth.approve(lending_pool.address, deposit_amount, {'from': depositer})
+    pipeline.transact(weth.deposit, {'from': depositer, 'value': deposit_amount})
+    pipeline.transact(weth.approve, lending_pool.address, deposit_amount, {'from': depositer})
 
     # Turn on collateral and borrowing
-    (weth_ltv, weth_threhold, weth_bonus) = allow_reserve_collateral_and_borrowing(configurator, weth, pool_admin)
+    (weth_ltv, weth_threhold, weth_bonus) = allow_reserve_collateral_and_borrowing(configurator, weth, pool_admin, pipeline=pipeline)
 
     # Set market lending rate
-    lending_rate_oracle.setMarketBorrowRate(weth.address, MARKET_BORROW_RATE)
+    pipeline.transact(lending_rate_oracle.setMarketBorrowRate, weth.address, MARKET_BORROW_RATE, {'from': accounts[0]})
 
     # `deposit()` weth
-    lending_pool.deposit(weth.address, deposit_amount, depositer, 0, {'from': depositer})
+    pipeline.transact(lending_pool.deposit, weth.address, deposit_amount, depositer, 0, {'from': depositer})
 
     # Add additional reserve
-    terc20 = accounts[0].deploy(
+    pipeline.deploy(
         MintableDelegationERC20,
         "Test ERC20",
         "tERC20",
         18,
+        {'from': accounts[0]},
     )
+    terc20 = pipeline.join()[-1]
 
     # Initialise reserve tERC20
-    (terc20_atoken, terc20_stable_debt, terc20_variable_debt) = setup_new_reserve(configurator, terc20, lending_pool, pool_admin)
+    (terc20_atoken, terc20_stable_debt, terc20_variable_debt) = setup_new_reserve(configurator, terc20, lending_pool, pool_admin, pipeline)
 
     # Turn on collateral and borrowing
-    (tecr20_ltv, tecr20_threshold, tecr20_bonus) = allow_reserve_collateral_and_borrowing(configurator, terc20, pool_admin)
+    (tecr20_ltv, tecr20_threshold, tecr20_bonus) = allow_reserve_collateral_and_borrowing(configurator, terc20, pool_admin, pipeline=pipeline)
 
     # Setup price for tERC20
     price = WEI // 10 # 1 tERC20 : 0.1 ETH
-    price_oracle.setAssetPrice(terc20.address, price, {'from': accounts[0]})
+    pipeline.transact(price_oracle.setAssetPrice, terc20.address, price, {'from': accounts[0]})
 
     # Create tERC20 tokens for `borrower` and deposit them into `LendingPool`
     borrower = accounts[5]
     terc20_deposit_amount = deposit_amount // 10
-    terc20.mint(terc20_deposit_amount, {'from': borrower})
-    terc20.approve(lending_pool.address, terc20_deposit_amount, {'from': borrower})
-    lending_pool.deposit(terc20.address, terc20_deposit_amount, borrower, 0, {'from': borrower})
+    pipeline.transact(terc20.mint, terc20_deposit_amount, {'from': borrower})
+    pipeline.transact(terc20.approve, lending_pool.address, terc20_deposit_amount, {'from': borrower})
+    pipeline.transact(lending_pool.deposit, terc20.address, terc20_deposit_amount, borrower, 0, {'from': borrower})
+    pipeline.join()
 
     return (addresses_provider, lending_pool, configurator, collateral_manager,
     pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
@@ -307,6 +425,109 @@ def setup_borrow():
     terc20_deposit_amount, price)
 
 
+# Additional reserves to reach `LendingPool.MAX_NUMBER_RESERVES` (128) alongside WETH
+MAX_RESERVES = 127
+
+
+# Builds a market with WETH and `max_reserves` tERC20 reserves, all with collateral and borrowing on
+# The first tERC20 is priced at 1,000 ETH and the others at 1 ETH.
+# Pass a `Pipeline()` to submit independent transactions without waiting for each receipt.
+def setup_max_reserves(pipeline=None, max_reserves=MAX_RESERVES):
+    if pipeline is None:
+        pipeline = Pipeline(enabled=False)
+
+    # Deploy and initialize contracts (initializes a weth reserve)
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy) = setup_and_deploy_configuration_with_reserve(pipeline)
+
+    (assets, atokens, stable_tokens, variable_tokens) = add_test_reserves(
+        configurator, lending_pool, price_oracle, pool_admin, 0, max_reserves, pipeline
+    )
+
+    return (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, assets, atokens, stable_tokens, variable_tokens)
+
+
+# Adds `count` tERC20 reserves numbered from `start`, all with collateral and borrowing on.
+# tERC20 number 0 is priced at 1,000 ETH and the others at 1 ETH.
+# Returns the lists (assets, atokens, stable_tokens, variable_tokens).
+def add_test_reserves(configurator, lending_pool, price_oracle, pool_admin, start, count, pipeline=None):
+    if pipeline is None:
+        pipeline = Pipeline(enabled=False)
+
+    price = WEI # 1 tERC20 : 1 ETH
+    assets = []
+    atokens = []
+    stable_tokens = []
+    variable_tokens = []
+    for i in range(start, start + count):
+        # Add additional reserve
+        pipeline.deploy(
+            MintableDelegationERC20,
+            str(i) + " Test ERC20",
+            str(i) + "ERC20",
+            18,
+            {'from': accounts[0]},
+        )
+        asset = pipeline.join()[-1]
+        assets.append(asset)
+
+        # Initialise reserve ERC20
+        (terc20_atoken, terc20_stable_debt, terc20_variable_debt) = setup_new_reserve(configurator, asset, lending_pool, pool_admin, pipeline)
+
+        atokens.append(terc20_atoken)
+        stable_tokens.append(terc20_stable_debt)
+        variable_tokens.append(terc20_variable_debt)
+
+        # Turn on collateral and borrowing
+        allow_reserve_collateral_and_borrowing(configurator, asset, pool_admin, pipeline=pipeline)
+
+        # Setup price for tERC20
+        if (i == 0):
+            pipeline.transact(price_oracle.setAssetPrice, asset, price * 1_000, {'from': accounts[0]})
+        else:
+            pipeline.transact(price_oracle.setAssetPrice, asset, price, {'from': accounts[0]})
+    pipeline.join()
+
+    return (assets, atokens, stable_tokens, variable_tokens)
+
+
+# Opens positions on a `setup_max_reserves()` market
+# `alice` deposits in all tERC20 reserves
+# `bob` deposits in the first reserve then borrows stable and variable from every other reserve
+def setup_max_reserves_positions(lending_pool, assets, pipeline=None):
+    if pipeline is None:
+        pipeline = Pipeline(enabled=False)
+
+    # Users
+    alice = accounts[6]
+    bob = accounts[7]
+
+    # Deposit in every reserve for Alice
+    alice_deposit_amount = WEI
+    for asset in assets:
+        pipeline.transact(asset.mint, alice_deposit_amount, {'from': alice})
+        pipeline.transact(asset.approve, lending_pool, alice_deposit_amount, {'from': alice})
+        pipeline.transact(lending_pool.deposit, asset, alice_deposit_amount, alice, 0, {'from': alice})
+
+    # Deposit in first reserve for Bob
+    bob_deposit_amount = WEI
+    pipeline.transact(assets[0].mint, bob_deposit_amount, {'from': bob})
+    pipeline.transact(assets[0].approve, lending_pool, bob_deposit_amount, {'from': bob})
+    pipeline.transact(lending_pool.deposit, assets[0], bob_deposit_amount, bob, 0, {'from': bob})
+
+    # Bob borrows stable and variable from every other reserve
+    bob_borrow_amount = bob_deposit_amount // 10_000
+    for asset in assets[1:]:
+        pipeline.transact(lending_pool.borrow, asset, bob_borrow_amount, INTEREST_RATE_MODE_STABLE, 0, bob, {'from': bob})
+        pipeline.transact(lending_pool.borrow, asset, bob_borrow_amount, INTEREST_RATE_MODE_VARIABLE, 0, bob, {'from': bob})
+    pipeline.join()
+
+    return (alice, alice_deposit_amount, bob, bob_deposit_amount, bob_borrow_amount)
+
+
 #######################
 # Calculation functions
 #######################
@@ -435,3 +656,74 @@ def calculate_overall_borrow_rate(total_stable_debt, total_variable_debt, overal
     weighted_variable_rate = ray_mul(wad_to_ray(total_variable_debt), variable_rate)
 
     return ray_div(weighted_stable_rate + weighted_variable_rate, wad_to_ray(total_debt))
+
+
+# Unpacks a `ReserveConfiguration` map into (ltv, liquidation threshold, liquidation bonus, decimals)
+def decode_reserve_configuration(data):
+    return (
+        data & 0xFFFF,
+        (data >> LIQUIDATION_THRESHOLD_START_BIT_POSITION) & 0xFFFF,
+        (data >> LIQUIDATION_BONUS_START_BIT_POSITION) & 0xFFFF,
+        (data >> RESERVE_DECIMALS_START_BIT_POSITION) & 0xFF,
+    )
+
+
+# `GenericLogic.calculateHealthFactorFromBalances()`
+def calculate_health_factor_from_balances(collateral_eth, debt_eth, liquidation_threshold):
+    if debt_eth == 0:
+        return MAX_UINT256
+    return wad_div(percent_mul(collateral_eth, liquidation_threshold), debt_eth)
+
+
+# `GenericLogic.calculateUserAccountData()`
+# `positions` holds (price, decimals, ltv, liquidation threshold, collateral balance, debt balance)
+# for each reserve the user uses, with a zero collateral balance when not used as collateral.
+# Returns (total collateral ETH, total debt ETH, average ltv, average liquidation threshold, health factor)
+def calculate_user_account_data(positions):
+    if not positions:
+        return (0, 0, 0, 0, MAX_UINT256)
+
+    total_collateral = 0
+    total_debt = 0
+    avg_ltv = 0
+    avg_threshold = 0
+    for (price, decimals, ltv, threshold, collateral, debt) in positions:
+        unit = 10 ** decimals
+        if threshold != 0 and collateral != 0:
+            collateral_eth = price * collateral // unit
+            total_collateral += collateral_eth
+            avg_ltv += collateral_eth * ltv
+            avg_threshold += collateral_eth * threshold
+        total_debt += price * debt // unit
+
+    if total_collateral > 0:
+        avg_ltv //= total_collateral
+        avg_threshold //= total_collateral
+
+    health_factor = calculate_health_factor_from_balances(total_collateral, total_debt, avg_threshold)
+    return (total_collateral, total_debt, avg_ltv, avg_threshold, health_factor)
+
+
+# Maximum debt repaid in one `liquidationCall()`
+def calculate_max_liquidatable_debt(stable_debt, variable_debt):
+    return percent_mul(stable_debt + variable_debt, LIQUIDATION_CLOSE_FACTOR_PERCENT)
+
+
+# `LendingPoolCollateralManager._calculateAvailableCollateralToLiquidate()`
+# Returns (collateral amount, debt amount needed)
+def calculate_available_collateral_to_liquidate(
+    collateral_price, collateral_decimals, liquidation_bonus,
+    debt_price, debt_decimals, debt_to_cover, user_collateral_balance,
+):
+    max_collateral = percent_mul(
+        debt_price * debt_to_cover * 10 ** collateral_decimals, liquidation_bonus
+    ) // (collateral_price * 10 ** debt_decimals)
+
+    if max_collateral > user_collateral_balance:
+        debt_needed = percent_div(
+            collateral_price * user_collateral_balance * 10 ** debt_decimals
+            // (debt_price * 10 ** collateral_decimals),
+            liquidation_bonus,
+        )
+        return (user_collateral_balance, debt_needed)
+    return (max_collateral, debt_to_cover)
@@ -0,0 +1,162 @@
+from brownie import project, web3
+from brownie.network.state import _find_contract
+from pathlib import Path
+
+import json
+import subprocess
+
+
+# Dependency map from each test to the contracts it deploys or calls, see `--record-impact`
+IMPACT_MAP_PATH = Path('reports') / 'test_impact.json'
+
+
+# Requests whose `to` is a contract used without sending a transaction
+CALL_METHODS = {'eth_call', 'eth_estimateGas'}
+
+
+# Provider wrapper collecting the addresses targeted by view calls and gas estimates,
+# including those sent in JSON-RPC batches by `batch_reads()`
+class CallTargetProvider:
+    def __init__(self, provider):
+        self.provider = provider
+        self.targets = set()
+
+    def make_request(self, method, params):
+        if method in CALL_METHODS and params and params[0].get('to'):
+            self.targets.add(params[0]['to'])
+        return self.provider.make_request(method, params)
+
+    def observe_batch(self, payload):
+        for request in payload:
+            if request['method'] in CALL_METHODS and request['params'][0].get('to'):
+                self.targets.add(request['params'][0]['to'])
+        observe = getattr(self.provider, 'observe_batch', None)
+        if observe is not None:
+            observe(payload)
+
+    # Targets collected since the last call
+    def drain(self):
+        (targets, self.targets) = (self.targets, set())
+        return targets
+
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
+
+
+# Contract name as a string, proxies created with `Contract.from_abi(LendingPool, ...)` are named
+# by their container
+def _contract_name(name):
+    name = getattr(name, '_name', name)
+    return str(name) if name else None
+
+
+# Records the contracts used by each test from its transactions and view calls.
+#
+# Transactions are added as they are sent by a `ReceiptCollector`, so those a test sends before
+# reverting a snapshot still count. Contracts used while setting up module or session scoped
+# fixtures (e.g. the max reserves market) are recorded against those fixtures and added to every
+# test requesting them.
+class ImpactRecorder:
+    def __init__(self, provider=None):
+        self.tests = {}
+        self.fixtures = {}
+        self.sent = {} # owning fixture (None for the test itself) -> contracts since `start()`/`record()`
+        self.provider = provider or _call_target_provider()
+
+    # Processor of a `ReceiptCollector`
+    def add_receipt(self, tx, owner):
+        (test, fixture) = owner
+        name = _contract_name(tx.contract_name)
+        if name:
+            self.sent.setdefault(fixture, set()).add(name)
+
+    # Called as test `nodeid` starts, once the receipts of its fixtures were added. The higher scoped
+    # `fixtures` first set up for this test keep what they sent and the view calls since the
+    # previous test, the rest was sent by function scoped fixtures for the test.
+    def start(self, nodeid, fixtures):
+        targets = self._targets()
+        contracts = set()
+        for fixture in fixtures:
+            if fixture not in self.fixtures:
+                self.fixtures[fixture] = self.sent.pop(fixture, set()) | targets
+            contracts |= self.fixtures[fixture]
+        self.tests[nodeid] = contracts.union(*self.sent.values())
+        self.sent = {}
+
+    # Called as test `nodeid` ends, once its receipts were added. Stores the contracts its
+    # transactions deployed or called and the targets of its view calls.
+    def record(self, nodeid):
+        contracts = self.tests.setdefault(nodeid, set())
+        contracts.update(self._targets(), *self.sent.values())
+        self.sent = {}
+
+    # Names of the contracts targeted by view calls since the last call
+    def _targets(self):
+        contracts = set()
+        for address in self.provider.drain():
+            contract = _find_contract(address)
+            if contract is not None:
+                contracts.add(_contract_name(contract._name))
+        return contracts
+
+    # Write the map of test -> contracts and contract -> source files (including imported libraries)
+    def save(self, path=IMPACT_MAP_PATH):
+        containers = project.get_loaded_projects()[0].dict()
+        used = set().union(*self.tests.values()) if self.tests else set()
+        sources = {
+            name: sorted(set(containers[name]._build['allSourcePaths'].values()))
+            for name in used if name in containers
+        }
+
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(json.dumps({
+            'tests': {nodeid: sorted(contracts) for (nodeid, contracts) in self.tests.items()},
+            'sources': sources,
+        }, indent=2, sort_keys=True))
+
+
+# Record view call targets on the current web3 provider, returns the `CallTargetProvider`
+def _call_target_provider():
+    if not isinstance(web3.provider, CallTargetProvider):
+        web3.provider = CallTargetProvider(web3.provider)
+    return web3.provider
+
+
+# Files changed in a git diff range e.g. `main..HEAD` or `HEAD~1`
+def changed_files(diff_range):
+    output = subprocess.check_output(['git', 'diff', '--name-only', diff_range], universal_newlines=True)
+    return [line.strip() for line in output.splitlines() if line.strip()]
+
+
+# Split pytest `items` into (selected, deselected) for the `changed` files.
+#
+# A test is selected when a source file of a contract it uses changed, when its own test file
+# changed, or when it is missing from the map. Any other change outside `contracts/` (helpers,
+# fixtures, tooling, `brownie-config.yaml`, ...) or a missing map selects every test.
+def select_affected(items, changed, path=IMPACT_MAP_PATH, root=None):
+    if not path.exists():
+        return (items, [])
+    impact_map = json.loads(path.read_text())
+    tests = impact_map['tests']
+    sources = impact_map['sources']
+
+    changed = set(changed)
+    changed_contracts = {name for (name, paths) in sources.items() if changed.intersection(paths)}
+    changed_tests = {name for name in changed if name.startswith('tests/test_') and name.endswith('.py')}
+    if {name for name in changed if not name.startswith('contracts/')} - changed_tests:
+        return (items, [])
+
+    selected = []
+    deselected = []
+    for item in items:
+        test_file = Path(str(item.fspath)).relative_to(root or Path.cwd()).as_posix()
+        if (
+            item.nodeid not in tests
+            or test_file in changed_tests
+            or changed_contracts.intersection(tests[item.nodeid])
+        ):
+            selected.append(item)
+        else:
+            deselected.append(item)
+
+    return (selected, deselected)
@@ -0,0 +1,123 @@
+from brownie import accounts, web3
+from eth_abi import decode_single
+
+# Optional dependencies, only required when running with `--evm-backend eth-tester`
+try:
+    from eth_tester import EthereumTester, PyEVMBackend
+    from eth_tester.exceptions import TransactionFailed, TransactionNotFound
+    from web3.providers.eth_tester import EthereumTesterProvider
+except ImportError:
+    EthereumTester = None
+    EthereumTesterProvider = object
+
+
+# Matches the `development` network `cmd_settings` in `brownie-config.yaml`
+NUM_ACCOUNTS = 20
+DEFAULT_BALANCE = 1_000_000 * 10**18
+BLOCK_GAS_LIMIT = 12_000_000
+
+# `Error(string)` selector
+ERROR_SELECTOR = '0x08c379a0'
+
+
+# Replace the Ganache connection with an in-process py-evm chain.
+#
+# brownie's Ganache RPC backend drives snapshots and time travel through `evm_snapshot`,
+# `evm_revert`, `evm_increaseTime` and `evm_mine`, so those methods are served in-process by
+# `InProcessEVMProvider` and `chain.snapshot()`, `chain.revert()`, `chain.sleep()` and the tests'
+# raw `evm_increaseTime` requests keep working unchanged. The Ganache process started by brownie
+# is left idle for the remainder of the session.
+def connect_in_process_evm():
+    if EthereumTester is None:
+        raise ImportError("The in-process EVM backend requires `eth-tester[py-evm]` to be installed")
+
+    backend = PyEVMBackend(
+        genesis_parameters=PyEVMBackend._generate_genesis_params(overrides={'gas_limit': BLOCK_GAS_LIMIT}),
+        genesis_state=PyEVMBackend._generate_genesis_state(
+            overrides={'balance': DEFAULT_BALANCE},
+            num_accounts=NUM_ACCOUNTS,
+        ),
+    )
+    web3.provider = InProcessEVMProvider(EthereumTester(backend))
+
+    # Reload the unlocked accounts from the new provider
+    accounts._reset()
+
+
+# `EthereumTesterProvider` with the Ganache RPC extensions and Ganache formatted reverts
+class InProcessEVMProvider(EthereumTesterProvider):
+    def __init__(self, ethereum_tester):
+        super().__init__(ethereum_tester)
+        self._time_offset = 0
+
+    def make_request(self, method, params):
+        if method == 'evm_snapshot':
+            return {'result': self.ethereum_tester.take_snapshot()}
+        if method == 'evm_revert':
+            self.ethereum_tester.revert_to_snapshot(params[0])
+            return {'result': True}
+        if method == 'evm_increaseTime':
+            # brownie sends `[seconds]`, the tests send `seconds`
+            seconds = params[0] if isinstance(params, (list, tuple)) else params
+            self._time_offset += seconds
+            self.ethereum_tester.time_travel(self._pending_timestamp() + seconds)
+            return {'result': self._time_offset}
+        if method == 'evm_mine':
+            if params and params[0] is not None and params[0] > self._pending_timestamp():
+                self.ethereum_tester.time_travel(params[0])
+            self.ethereum_tester.mine_blocks(1)
+            return {'result': '0x0'}
+        if method == 'eth_sendTransaction':
+            return self._send_transaction(params)
+        if method == 'eth_call':
+            try:
+                return super().make_request(method, params)
+            except TransactionFailed as e:
+                return _revert_error('0x' + '00' * 32, e)
+
+        return super().make_request(method, params)
+
+    # Ganache mines reverting transactions and reports the revert reason keyed by the tx hash.
+    #
+    # py-evm mines the failed transaction but eth-tester drops its output, so only a failed send
+    # is replayed as an `eth_call` on the block before it for the reason. Automining puts every
+    # transaction in its own block, with the miner stopped the transaction is still pending and
+    # sent as is.
+    def _send_transaction(self, params):
+        response = super().make_request('eth_sendTransaction', params)
+        try:
+            receipt = self.ethereum_tester.get_transaction_receipt(response['result'])
+        except TransactionNotFound:
+            return response
+        if receipt['status'] != 0:
+            return response
+
+        try:
+            super().make_request('eth_call', [params[0], receipt['block_number'] - 1])
+        except TransactionFailed as e:
+            return _revert_error(response['result'], e)
+        return _revert_error(response['result'], TransactionFailed())
+
+    def _pending_timestamp(self):
+        return self.ethereum_tester.get_block_by_number('pending')['timestamp']
+
+
+# Format a revert in the same way as Ganache so brownie's `reverts()` can match the reason
+def _revert_error(txid, exc):
+    reason = exc.args[0] if exc.args else None
+    if isinstance(reason, bytes):
+        reason = _decode_revert_reason(reason)
+
+    return {
+        'error': {
+            'message': 'VM Exception while processing transaction: revert {}'.format(reason or ''),
+            'code': -32000,
+            'data': {txid: {'error': 'revert', 'program_counter': None, 'return': '0x', 'reason': reason}},
+        }
+    }
+
+
+def _decode_revert_reason(data):
+    if data.hex().startswith(ERROR_SELECTOR[2:]):
+        return decode_single('string', data[4:])
+    return None
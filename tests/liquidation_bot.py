@@ -0,0 +1,218 @@
+from brownie import (
+    AToken, Contract, LendingPoolAddressesProvider, MintableDelegationERC20, PriceOracle, StableDebtToken,
+    VariableDebtToken,
+)
+
+from helpers import (
+    calculate_available_collateral_to_liquidate, calculate_max_liquidatable_debt, calculate_user_account_data,
+    decode_reserve_configuration, HEALTH_FACTOR_LIQUIDATION_THRESHOLD, MAX_UINT256,
+)
+from batch_reads import batch_reads
+from pipeline import Pipeline
+
+import time
+
+
+# Users refreshed per JSON-RPC batch
+REFRESH_BATCH_SIZE = 200
+
+
+# Reference liquidator.
+#
+# Keeps every watched borrower's collateral and debt per reserve and an index of the users
+# exposed to each asset. On a price update only the users exposed to the changed assets have
+# their health factor recomputed (with `calculate_user_account_data()`), each underwater user is
+# liquidated on the most profitable collateral/debt pair under the close factor and all
+# liquidations are sent without waiting for each receipt.
+#
+# Usage:
+#   bot = LiquidationBot(lending_pool, liquidator)
+#   bot.approve()
+#   bot.watch(borrowers)
+#   price_oracle.setAssetPrice(asset, price, {'from': accounts[0]})
+#   receipts = bot.on_price_update([asset])
+class LiquidationBot:
+    def __init__(self, lending_pool, liquidator, receive_atoken=False):
+        self.lending_pool = lending_pool
+        self.liquidator = liquidator
+        self.receive_atoken = receive_atoken
+        self.reserves = {}
+        self.positions = {}
+        self.exposure = {}
+        self.timings = {}
+        self.load_reserves()
+
+    # Reserve parameters, tokens and prices
+    def load_reserves(self):
+        provider = Contract.from_abi(
+            LendingPoolAddressesProvider,
+            self.lending_pool.getAddressesProvider(),
+            LendingPoolAddressesProvider.abi,
+        )
+        # Any `IPriceOracleGetter` e.g. `PriceOracle` or `AaveOracle`
+        self.price_oracle = Contract.from_abi(PriceOracle, provider.getPriceOracle(), PriceOracle.abi)
+        for (index, asset) in enumerate(self.lending_pool.getReservesList()):
+            data = self.lending_pool.getReserveData(asset)
+            (ltv, threshold, bonus, decimals) = decode_reserve_configuration(data[0][0])
+            self.reserves[asset] = {
+                'index': index,
+                'ltv': ltv,
+                'threshold': threshold,
+                'bonus': bonus,
+                'decimals': decimals,
+                'price': self.price_oracle.getAssetPrice(asset),
+                'atoken': Contract.from_abi(AToken, data[7], AToken.abi),
+                'stable_debt': Contract.from_abi(StableDebtToken, data[8], StableDebtToken.abi),
+                'variable_debt': Contract.from_abi(VariableDebtToken, data[9], VariableDebtToken.abi),
+            }
+            self.exposure.setdefault(asset, set())
+
+    # Approve the pool to pull every reserve asset from the liquidator
+    def approve(self):
+        for asset in self.reserves:
+            token = Contract.from_abi(MintableDelegationERC20, asset, MintableDelegationERC20.abi)
+            token.approve(self.lending_pool, MAX_UINT256, {'from': self.liquidator})
+
+    # Start watching `users`, reading their positions from the chain
+    def watch(self, users):
+        self.refresh(users)
+
+    # Re-read the positions of `users`
+    def refresh(self, users):
+        users = [str(user) for user in users]
+        for start in range(0, len(users), REFRESH_BATCH_SIZE):
+            batch = users[start:start + REFRESH_BATCH_SIZE]
+            with batch_reads() as r:
+                reads = [
+                    (
+                        user,
+                        r.call(self.lending_pool.getUserConfiguration, user),
+                        {
+                            asset: (
+                                r.call(reserve['atoken'].balanceOf, user),
+                                r.call(reserve['stable_debt'].balanceOf, user),
+                                r.call(reserve['variable_debt'].balanceOf, user),
+                            )
+                            for (asset, reserve) in self.reserves.items()
+                        },
+                    )
+                    for user in batch
+                ]
+            for (user, configuration, balances) in reads:
+                self._set_position(user, configuration.value[0], {
+                    asset: (collateral.value, stable.value, variable.value)
+                    for (asset, (collateral, stable, variable)) in balances.items()
+                })
+
+    def _set_position(self, user, configuration, balances):
+        position = {}
+        for (asset, (collateral, stable, variable)) in balances.items():
+            index = self.reserves[asset]['index']
+            using_as_collateral = (configuration >> (2 * index + 1)) & 1
+            collateral = collateral if using_as_collateral else 0
+            if collateral or stable or variable:
+                position[asset] = (collateral, stable, variable)
+                self.exposure[asset].add(user)
+            else:
+                self.exposure[asset].discard(user)
+        self.positions[user] = position
+
+    # `getUserAccountData()` of `user` from the cached positions and prices
+    def account_data(self, user):
+        return position_account_data(self.positions.get(user, {}), self.reserves)
+
+    def health_factor(self, user):
+        return self.account_data(user)[4]
+
+    # Most profitable liquidation of `user`, see `plan_liquidation()`
+    def plan(self, user):
+        return plan_liquidation(self.positions.get(user, {}), self.reserves)
+
+    # Users exposed to `assets` with a health factor below 1
+    def underwater(self, assets):
+        candidates = set()
+        for asset in assets:
+            candidates |= self.exposure.get(asset, set())
+        return sorted(
+            user for user in candidates if self.health_factor(user) < HEALTH_FACTOR_LIQUIDATION_THRESHOLD
+        )
+
+    # Re-read the prices of `assets`, liquidate every underwater user and wait for the receipts.
+    # Timings of each stage are kept in `timings`.
+    def on_price_update(self, assets):
+        start = time.perf_counter()
+        with batch_reads() as r:
+            prices = {asset: r.call(self.price_oracle.getAssetPrice, asset) for asset in assets}
+        for (asset, price) in prices.items():
+            self.reserves[asset]['price'] = price.value
+
+        users = self.underwater(assets)
+        detected = time.perf_counter()
+
+        pipeline = Pipeline()
+        for user in users:
+            plan = self.plan(user)
+            if plan is None:
+                continue
+            (collateral_asset, debt_asset, debt_to_cover, _, _) = plan
+            pipeline.transact(
+                self.lending_pool.liquidationCall,
+                collateral_asset,
+                debt_asset,
+                user,
+                debt_to_cover,
+                self.receive_atoken,
+                {'from': self.liquidator},
+            )
+        submitted = time.perf_counter()
+        receipts = pipeline.join()
+        landed = time.perf_counter()
+
+        self.refresh(users)
+        self.timings = {
+            'detect': detected - start,
+            'submit': submitted - detected,
+            'land': landed - submitted,
+            'total': landed - start,
+        }
+        return receipts
+
+
+# `calculate_user_account_data()` of a position {asset: (collateral, stable debt, variable debt)}
+# where `reserves` holds each asset's price, decimals, ltv and threshold
+def position_account_data(position, reserves):
+    positions = []
+    for (asset, (collateral, stable, variable)) in position.items():
+        reserve = reserves[asset]
+        positions.append((
+            reserve['price'], reserve['decimals'], reserve['ltv'], reserve['threshold'],
+            collateral, stable + variable,
+        ))
+    return calculate_user_account_data(positions)
+
+
+# Most profitable liquidation of a position {asset: (collateral, stable debt, variable debt)}
+# repaying up to the close factor of one debt asset.
+# Returns (collateral asset, debt asset, debt to cover, profit in ETH, collateral received) or None.
+def plan_liquidation(position, reserves):
+    best = None
+    for (debt_asset, (_, stable, variable)) in position.items():
+        if stable + variable == 0:
+            continue
+        debt_reserve = reserves[debt_asset]
+        max_debt = calculate_max_liquidatable_debt(stable, variable)
+        for (collateral_asset, (collateral, _, _)) in position.items():
+            collateral_reserve = reserves[collateral_asset]
+            if collateral == 0 or collateral_reserve['threshold'] == 0:
+                continue
+            (collateral_amount, debt_needed) = calculate_available_collateral_to_liquidate(
+                collateral_reserve['price'], collateral_reserve['decimals'], collateral_reserve['bonus'],
+                debt_reserve['price'], debt_reserve['decimals'], max_debt, collateral,
+            )
+            profit = (
+                collateral_reserve['price'] * collateral_amount // 10 ** collateral_reserve['decimals']
+                - debt_reserve['price'] * debt_needed // 10 ** debt_reserve['decimals']
+            )
+            if best is None or profit > best[3]:
+                best = (collateral_asset, debt_asset, debt_needed, profit, collateral_amount)
+    return best
@@ -0,0 +1,108 @@
+from brownie import accounts, MockReserveInterestRateStrategy
+
+from helpers import (
+    calculate_available_collateral_to_liquidate, calculate_max_liquidatable_debt,
+    HEALTH_FACTOR_LIQUIDATION_THRESHOLD,
+)
+from liquidation_bot import LiquidationBot, position_account_data
+
+
+# Highest price searched, in ETH wei per whole token
+MAX_PRICE = 2 ** 128
+
+
+# `reserves` with the price of `asset` replaced
+def reserves_with_price(reserves, asset, price):
+    reserves = dict(reserves)
+    reserves[asset] = dict(reserves[asset], price=price)
+    return reserves
+
+
+# Binary search over prices [1, MAX_PRICE] for the boundary of a monotonic `predicate`.
+# Returns (price where `predicate` holds, neighbouring price where it does not) or None if it
+# holds at neither or both ends.
+def _boundary(predicate):
+    (low, high) = (1, MAX_PRICE)
+    low_holds = predicate(low)
+    if low_holds == predicate(high):
+        return None
+    while high - low > 1:
+        middle = (low + high) // 2
+        if predicate(middle) == low_holds:
+            low = middle
+        else:
+            high = middle
+    return (low, high) if low_holds else (high, low)
+
+
+# Price of `asset` at which the health factor of a position {asset: (collateral, stable debt,
+# variable debt)} crosses 1e18, other prices unchanged.
+# Returns (liquidatable price, safe price) 1 wei apart or None if no price of `asset` does.
+# Collateral assets are liquidatable below the boundary, debt assets above it.
+def liquidation_price(position, reserves, asset):
+    return _boundary(lambda price: position_account_data(
+        position, reserves_with_price(reserves, asset, price)
+    )[4] < HEALTH_FACTOR_LIQUIDATION_THRESHOLD)
+
+
+# `liquidation_price()` of every asset in each position of {user: position}.
+# Returns {user: {asset: (liquidatable price, safe price)}} leaving out assets without one.
+def liquidation_prices(positions, reserves):
+    prices = {}
+    for (user, position) in positions.items():
+        prices[user] = {}
+        for asset in position:
+            boundary = liquidation_price(position, reserves, asset)
+            if boundary is not None:
+                prices[user][asset] = boundary
+    return prices
+
+
+# Price of `collateral_asset` below which a liquidation repaying `debt_asset` is capped by the
+# user's collateral rather than by the close factor.
+# Returns (capped price, full close factor price) 1 wei apart or None if there is no debt or collateral.
+def close_factor_price(position, reserves, collateral_asset, debt_asset):
+    (collateral, _, _) = position.get(collateral_asset, (0, 0, 0))
+    (_, stable, variable) = position.get(debt_asset, (0, 0, 0))
+    if collateral == 0 or stable + variable == 0:
+        return None
+    max_debt = calculate_max_liquidatable_debt(stable, variable)
+    collateral_reserve = reserves[collateral_asset]
+    debt_reserve = reserves[debt_asset]
+
+    def capped(price):
+        (_, debt_needed) = calculate_available_collateral_to_liquidate(
+            price, collateral_reserve['decimals'], collateral_reserve['bonus'],
+            debt_reserve['price'], debt_reserve['decimals'], max_debt, collateral,
+        )
+        return debt_needed < max_debt
+
+    return _boundary(capped)
+
+
+# Switch the reserves of `assets` to zero interest rates so positions stay the same over time and
+# prices found from them remain exact while the checks run. Each reserve's rates change on its
+# next deposit, borrow, repay or withdrawal.
+def stop_interest(configurator, assets, pool_admin):
+    strategy = accounts[0].deploy(MockReserveInterestRateStrategy, 0, 0, 0)
+    for asset in assets:
+        configurator.setReserveInterestRateStrategyAddress(asset, strategy, {'from': pool_admin})
+
+
+# Positions of `users` as read by `LiquidationBot`, with the reserves' prices and parameters.
+# Returns ({user: position}, reserves).
+def read_positions(lending_pool, users):
+    bot = LiquidationBot(lending_pool, None)
+    bot.watch(users)
+    return (bot.positions, bot.reserves)
+
+
+# Check a (liquidatable price, safe price) boundary of `asset` with one `getUserAccountData()` on
+# each side. Leaves the price of `asset` at `liquidatable`.
+# Returns the health factors (at the safe price, at the liquidatable price).
+def verify_liquidation_price(lending_pool, price_oracle, user, asset, liquidatable, safe, sender):
+    health_factors = []
+    for price in (safe, liquidatable):
+        price_oracle.setAssetPrice(asset, price, {'from': sender})
+        health_factors.append(lending_pool.getUserAccountData(user)[5])
+    return tuple(health_factors)
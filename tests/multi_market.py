@@ -0,0 +1,155 @@
+from brownie import accounts, LendingPoolAddressesProviderRegistry, web3
+
+from helpers import INTEREST_RATE_MODE_VARIABLE, MAX_UINT256, setup_borrow, WEI
+from pipeline import Pipeline
+from tiers import scaled
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Traffic users per market in the full tier, each used by a single worker thread
+MARKET_USERS = 2
+
+# ETH given to each traffic user, reused by every round as `drive_market()` unwraps its WETH again
+USER_FUNDING = WEI
+
+# WETH deposited and tERC20 borrowed by each user per round, the borrow being a third of the
+# deposit's borrowing power
+USER_DEPOSIT = WEI // 10
+USER_BORROW = WEI // 10 # 0.01 ETH
+
+# Operations of each traffic round in order, their gas is recorded per market
+MARKET_OPERATIONS = ['deposit', 'borrow', 'repay', 'withdraw']
+
+# Registry sizes at which `getAddressesProvidersList()` is measured,
+# see `test_registry_register_max()` for where it stops fitting in a call
+PROVIDER_LIST_COUNTS = [1, 10, 100, 455, 1_000, 2_000, 5_000]
+
+
+# Deterministic local accounts for the traffic of market `market_id`
+def market_users(market_id, count=MARKET_USERS):
+    return [
+        accounts.add(web3.keccak(text='market {} user {}'.format(market_id, i)).hex())
+        for i in range(count)
+    ]
+
+
+# Stand up `count` independent markets, each a `setup_borrow()` market with its own addresses
+# provider, pool, configurator and reserves, and register them in one
+# `LendingPoolAddressesProviderRegistry` with ids 1 to `count`. Each market has `MARKET_USERS`
+# traffic users scaled by the test tier.
+# Returns (registry, markets) where each market is a dict of its contracts and traffic users.
+def setup_markets(count, pipeline=None):
+    if pipeline is None:
+        pipeline = Pipeline(enabled=False)
+    owner = {'from': accounts[0]}
+    registry = accounts[0].deploy(LendingPoolAddressesProviderRegistry)
+
+    markets = []
+    for market_id in range(1, count + 1):
+        (addresses_provider, lending_pool, configurator, collateral_manager,
+        pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+        weth_stable_debt, weth_variable_debt, strategy, depositer, deposit_amount, borrower,
+        terc20, terc20_atoken, terc20_stable_debt, terc20_variable_debt, tecr20_ltv, tecr20_threshold, tecr20_bonus,
+        terc20_deposit_amount, price) = setup_borrow(pipeline)
+
+        pipeline.transact(registry.registerAddressesProvider, addresses_provider, market_id, owner)
+        pipeline.join()
+
+        markets.append({
+            'id': market_id,
+            'addresses_provider': addresses_provider,
+            'lending_pool': lending_pool,
+            'price_oracle': price_oracle,
+            'weth': weth,
+            'weth_atoken': weth_atoken,
+            'terc20': terc20,
+            'terc20_variable_debt': terc20_variable_debt,
+            'users': market_users(market_id, scaled(MARKET_USERS)),
+        })
+
+    for market in markets:
+        for user in market['users']:
+            accounts[0].transfer(user, USER_FUNDING)
+    return (registry, markets)
+
+
+# Run `rounds` rounds of deposit WETH, borrow tERC20, repay and withdraw for each of the
+# market's users, waiting for each receipt. The withdrawn WETH is unwrapped so users spend no ETH
+# however many rounds are run.
+# Returns {operation: [gas used]}.
+def drive_market(market, rounds):
+    (lending_pool, weth, terc20) = (market['lending_pool'], market['weth'], market['terc20'])
+    gas = {operation: [] for operation in MARKET_OPERATIONS}
+    for _ in range(rounds):
+        for user in market['users']:
+            tx = {'from': user}
+            weth.deposit({'from': user, 'value': USER_DEPOSIT})
+            weth.approve(lending_pool, USER_DEPOSIT, tx)
+            gas['deposit'].append(lending_pool.deposit(weth, USER_DEPOSIT, user, 0, tx).gas_used)
+            gas['borrow'].append(
+                lending_pool.borrow(terc20, USER_BORROW, INTEREST_RATE_MODE_VARIABLE, 0, user, tx).gas_used
+            )
+
+            # Mint the interest owed
+            terc20.mint(USER_BORROW, tx)
+            terc20.approve(lending_pool, MAX_UINT256, tx)
+            gas['repay'].append(
+                lending_pool.repay(terc20, MAX_UINT256, INTEREST_RATE_MODE_VARIABLE, user, tx).gas_used
+            )
+            gas['withdraw'].append(lending_pool.withdraw(weth, MAX_UINT256, user, tx).gas_used)
+            weth.withdraw(USER_DEPOSIT, tx)
+    return gas
+
+
+# `drive_market()` on every market at once, one worker thread per market (at most `threads`).
+# The markets share one Ganache and registry, so the threads overlap their requests while
+# Ganache mines the transactions one at a time.
+# Returns the gas of each market in `markets` order.
+def run_concurrent(markets, rounds, threads=None):
+    with ThreadPoolExecutor(threads or len(markets)) as executor:
+        return list(executor.map(drive_market, markets, [rounds] * len(markets)))
+
+
+# Reserve data (indexes, rates and last update time) of every reserve of `market`, which only
+# changes when a transaction touches the market
+def market_state(market):
+    lending_pool = market['lending_pool']
+    return {asset: tuple(lending_pool.getReserveData(asset)) for asset in lending_pool.getReservesList()}
+
+
+# Placeholder address filling position `index` of a registry's provider list
+def placeholder_provider(index):
+    return web3.toChecksumAddress(web3.keccak(text='placeholder provider {}'.format(index))[-20:])
+
+
+# Grow `registry` with placeholder providers to each size of `counts` (ascending) and measure
+# `getAddressesProvidersList()` and the registration reaching that size. Both loop over the whole
+# list, measuring stops at the first size where the list no longer fits in a block.
+# Returns [(size, list gas, register gas)].
+def provider_list_gas(registry, counts):
+    owner = {'from': accounts[0]}
+    block_gas_limit = web3.eth.getBlock('latest').gasLimit
+    size = len(registry.getAddressesProvidersList())
+    results = []
+    for count in counts:
+        if count <= size:
+            continue
+        pipeline = Pipeline()
+        for index in range(size, count - 1):
+            pipeline.transact(registry.registerAddressesProvider, placeholder_provider(index), index + 1, owner)
+        pipeline.join()
+        register_gas = registry.registerAddressesProvider(placeholder_provider(count - 1), count, owner).gas_used
+        size = count
+
+        try:
+            list_gas = web3.eth.estimateGas({
+                'to': registry.address,
+                'data': registry.getAddressesProvidersList.encode_input(),
+            })
+        except ValueError:
+            break
+        if list_gas > block_gas_limit:
+            break
+        results.append((count, list_gas, register_gas))
+    return results
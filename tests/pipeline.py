@@ -0,0 +1,98 @@
+from brownie import web3
+
+
+# Submits transactions and deployments, optionally without waiting for each receipt.
+#
+# When `enabled` is set transactions are sent with `required_confs = 0` and an explicitly
+# tracked nonce per sender, so independent transactions are fired back to back.
+# `join()` is a dependency barrier: it waits for every pending receipt, raises if any
+# reverted and returns the results (contracts for deployments, receipts otherwise) in
+# submission order. Transactions are still sent in submission order, so a barrier is only
+# needed where a later step requires a result (e.g. a deployed address or library link).
+# Nonces are read again from the node after each `join()`, so a sender may also send
+# transactions directly between barriers (e.g. `initReserve()` from the pool admin).
+#
+# When `enabled` is not set every transaction is sent and confirmed as normal, which keeps
+# the serial behaviour of the setup helpers while sharing the same code path.
+#
+# Usage:
+#   pipeline = Pipeline()
+#   pipeline.deploy(AToken, ..., {'from': accounts[0]})
+#   pipeline.deploy(StableDebtToken, ..., {'from': accounts[0]})
+#   (atoken, stable_debt) = pipeline.join()
+class Pipeline:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._nonces = {}
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.join()
+
+    # Send a transaction e.g. `pipeline.transact(weth.approve, pool, amount, {'from': user})`
+    def transact(self, method, *args):
+        (args, tx) = _split_tx(args)
+        receipt = method(*args, self._tx_params(tx))
+        self._pending.append((receipt, None))
+        return receipt
+
+    # Deploy a contract e.g. `pipeline.deploy(WETH9, {'from': accounts[0]})`
+    def deploy(self, container, *args):
+        (args, tx) = _split_tx(args)
+        receipt = container.deploy(*args, self._tx_params(tx))
+        self._pending.append((receipt, container))
+        return receipt
+
+    # Wait for all pending transactions and return their results in submission order
+    def join(self):
+        (pending, self._pending) = (self._pending, [])
+        # Direct transactions may follow the barrier, the next pipelined ones use fresh nonces
+        self._nonces = {}
+        results = []
+        for (receipt, container) in pending:
+            if not self.enabled:
+                results.append(receipt)
+                continue
+
+            receipt.wait(1)
+            if receipt.status != 1:
+                raise RuntimeError(
+                    'Pipelined transaction {} reverted: {}'.format(receipt.txid, receipt.revert_msg)
+                )
+            if container is not None:
+                # Registers the deployment so later deployments can link against it
+                results.append(container.at(receipt.contract_address, receipt.sender, receipt))
+            else:
+                results.append(receipt)
+
+        return results
+
+    def _tx_params(self, tx):
+        if not self.enabled:
+            return tx
+
+        if 'from' not in tx:
+            raise ValueError("Pipelined transactions require an explicit 'from'")
+
+        params = dict(tx)
+        params['nonce'] = self._next_nonce(str(tx['from']))
+        params['required_confs'] = 0
+        return params
+
+    def _next_nonce(self, sender):
+        if sender not in self._nonces:
+            self._nonces[sender] = web3.eth.getTransactionCount(sender, 'pending')
+        nonce = self._nonces[sender]
+        self._nonces[sender] += 1
+        return nonce
+
+
+# Separate the trailing brownie transaction dictionary from the call arguments
+def _split_tx(args):
+    if args and isinstance(args[-1], dict):
+        return (args[:-1], args[-1])
+    return (args, {})
@@ -0,0 +1,125 @@
+from brownie import MockAggregator, web3
+
+from helpers import MAX_UINT256
+from pipeline import Pipeline
+
+from decimal import Decimal
+from pathlib import Path
+
+import csv
+
+
+# A price series is a list of (block, {asset name: price in wei}) in block order.
+#
+# Files are wide tables with a `block` column and one column per asset holding the asset's
+# price in ETH e.g.
+#
+#     block,tERC20,DAI
+#     0,0.1,0.0005
+#     1,0.095,0.0005
+#
+# Empty cells carry the previous price. Only changed prices are kept for each block.
+def load_price_series(path):
+    path = Path(path)
+    if path.suffix == '.parquet':
+        rows = _read_parquet(path)
+    else:
+        with path.open(newline='') as f:
+            rows = list(csv.DictReader(f))
+
+    series = []
+    current = {}
+    for row in sorted(rows, key=lambda row: int(row['block'])):
+        updates = {}
+        for (name, value) in row.items():
+            if name == 'block' or value in (None, ''):
+                continue
+            price = int(Decimal(str(value)) * 10 ** 18)
+            if current.get(name) != price:
+                updates[name] = current[name] = price
+        series.append((int(row['block']), updates))
+    return series
+
+
+# Parquet is read with pandas when it is installed
+def _read_parquet(path):
+    try:
+        import pandas
+    except ImportError:
+        raise ImportError('Reading {} requires pandas and pyarrow'.format(path))
+    return pandas.read_parquet(path).astype(str).to_dict('records')
+
+
+# Pushes prices into the `PriceOracle` mock, one `setAssetPrice()` per asset sent without
+# waiting for each receipt
+class PriceOracleFeed:
+    def __init__(self, price_oracle, assets, sender):
+        self.price_oracle = price_oracle
+        self.assets = assets
+        self.sender = sender
+
+    def push(self, prices):
+        pipeline = Pipeline()
+        for (name, price) in prices.items():
+            pipeline.transact(self.price_oracle.setAssetPrice, self.assets[name], price, {'from': self.sender})
+        return pipeline.join()
+
+
+# Pushes prices into `AaveOracle` by deploying a `MockAggregator` answering each new price and
+# replacing all of the block's sources in a single `setAssetSources()`
+class AaveOracleFeed:
+    def __init__(self, aave_oracle, assets, sender):
+        self.aave_oracle = aave_oracle
+        self.assets = assets
+        self.sender = sender
+
+    def push(self, prices):
+        if not prices:
+            return []
+        pipeline = Pipeline()
+        for price in prices.values():
+            pipeline.deploy(MockAggregator, price, {'from': self.sender})
+        aggregators = pipeline.join()
+
+        tx = self.aave_oracle.setAssetSources(
+            [self.assets[name] for name in prices],
+            aggregators,
+            {'from': self.sender},
+        )
+        return aggregators + [tx]
+
+
+# Replay `series` through `feed`. After each block's prices are pushed every action is called
+# as `action(block, prices)` so users and liquidators can react, their return values are kept.
+# When `seconds_per_block` is set time is advanced between blocks.
+#
+# Returns a list of (block, feed results, action results) per block.
+def replay_prices(series, feed, actions=(), seconds_per_block=0):
+    steps = []
+    for (block, prices) in series:
+        if seconds_per_block:
+            web3.manager.request_blocking("evm_increaseTime", seconds_per_block)
+        updates = feed.push(prices)
+        results = [action(block, prices) for action in actions]
+        steps.append((block, updates, results))
+    return steps
+
+
+# Action liquidating any of `users` whose health factor fell below 1, repaying up to the close
+# factor of `debt_asset` for `collateral_asset`. The liquidator must have approved the debt asset.
+def liquidator_action(lending_pool, liquidator, collateral_asset, debt_asset, users, receive_atoken=False):
+    def liquidate(block, prices):
+        txs = []
+        for user in users:
+            health_factor = lending_pool.getUserAccountData(user)[5]
+            if health_factor < 10 ** 18:
+                txs.append(lending_pool.liquidationCall(
+                    collateral_asset,
+                    debt_asset,
+                    user,
+                    MAX_UINT256, # capped at the close factor
+                    receive_atoken,
+                    {'from': liquidator},
+                ))
+        return txs
+    return liquidate
@@ -0,0 +1,198 @@
+from brownie import accounts, web3
+
+from helpers import (
+    BASE_VARIABLE_BORROW_RATE, deploy_default_strategy, INTEREST_RATE_MODE_VARIABLE, MAX_UINT256,
+    OPTIMAL_UTILIZATION_RATE, RAY, ray_div, ray_mul, set_reserve_treasury, setup_borrow, STABLE_RATE_SLOPE_1,
+    STABLE_RATE_SLOPE_2, VARIABLE_RATE_SLOPE_1, VARIABLE_RATE_SLOPE_2, WEI,
+)
+from ganache_node import project_root, worker_node
+from pipeline import Pipeline
+from snapshots import ChainSnapshot
+
+import itertools
+import multiprocessing
+
+
+# `DefaultReserveInterestRateStrategy` constructor parameters in order
+STRATEGY_PARAMETERS = (
+    'optimal_utilization_rate',
+    'base_variable_borrow_rate',
+    'variable_rate_slope_1',
+    'variable_rate_slope_2',
+    'stable_rate_slope_1',
+    'stable_rate_slope_2',
+)
+
+DEFAULT_STRATEGY = dict(zip(STRATEGY_PARAMETERS, (
+    OPTIMAL_UTILIZATION_RATE,
+    BASE_VARIABLE_BORROW_RATE,
+    VARIABLE_RATE_SLOPE_1,
+    VARIABLE_RATE_SLOPE_2,
+    STABLE_RATE_SLOPE_1,
+    STABLE_RATE_SLOPE_2,
+)))
+
+# Standard workload: WETH utilization targets in basis points, each reached by a variable borrow
+# or repay and held for `WORKLOAD_STEP_SECONDS`
+WORKLOAD_UTILIZATIONS = [1_000, 3_000, 5_000, 8_000, 9_500, 6_000, 2_000]
+WORKLOAD_STEP_SECONDS = 24 * 60 * 60
+
+# WETH reserve factor so the treasury earns a share of the interest
+RESERVE_FACTOR = 1_000 # 10%
+
+# tERC20 deposited by the borrower, enough collateral to borrow 95% of the WETH liquidity
+BORROWER_COLLATERAL = 1_000 * WEI
+
+
+# Every combination of the given parameter values, unspecified parameters keep their defaults
+# e.g. strategy_grid(variable_rate_slope_2=[RAY // 10, RAY // 2], optimal_utilization_rate=[...])
+def strategy_grid(**values):
+    for name in values:
+        if name not in STRATEGY_PARAMETERS:
+            raise ValueError('Unknown strategy parameter {}'.format(name))
+    names = list(values)
+    return [
+        dict(DEFAULT_STRATEGY, **dict(zip(names, combination)))
+        for combination in itertools.product(*(values[name] for name in names))
+    ]
+
+
+# `setup_borrow()` with a treasury on the WETH reserve and a borrower able to drive utilization
+def setup_sweep_market():
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, depositer, deposit_amount, borrower,
+    terc20, terc20_atoken, terc20_stable_debt, terc20_variable_debt, tecr20_ltv, tecr20_threshold, tecr20_bonus,
+    terc20_deposit_amount, price) = setup_borrow(Pipeline())
+
+    treasury = accounts[3]
+    set_reserve_treasury(configurator, weth, lending_pool, treasury, RESERVE_FACTOR, pool_admin)
+
+    # Collateral for the borrows and WETH to repay the interest
+    pipeline = Pipeline()
+    pipeline.transact(terc20.mint, BORROWER_COLLATERAL, {'from': borrower})
+    pipeline.transact(terc20.approve, lending_pool, BORROWER_COLLATERAL, {'from': borrower})
+    pipeline.transact(lending_pool.deposit, terc20, BORROWER_COLLATERAL, borrower, 0, {'from': borrower})
+    pipeline.transact(weth.deposit, {'from': borrower, 'value': deposit_amount})
+    pipeline.transact(weth.approve, lending_pool, MAX_UINT256, {'from': borrower})
+    pipeline.join()
+
+    return {
+        'addresses_provider': addresses_provider,
+        'lending_pool': lending_pool,
+        'configurator': configurator,
+        'pool_admin': pool_admin,
+        'weth': weth,
+        'weth_atoken': weth_atoken,
+        'weth_stable_debt': weth_stable_debt,
+        'weth_variable_debt': weth_variable_debt,
+        'depositer': depositer,
+        'deposit_amount': deposit_amount,
+        'borrower': borrower,
+        'treasury': treasury,
+    }
+
+
+# WETH utilization as computed by the last `updateInterestRates()`, in ray
+def weth_utilization(market):
+    data = market['lending_pool'].getReserveData(market['weth'])
+    variable_debt = ray_mul(market['weth_variable_debt'].scaledTotalSupply(), data[2])
+    total_debt = market['weth_stable_debt'].totalSupply() + variable_debt
+    available = market['weth'].balanceOf(market['weth_atoken'])
+    return 0 if total_debt == 0 else ray_div(total_debt, available + total_debt)
+
+
+# Borrow or repay WETH at the variable rate to bring utilization to `target` basis points
+def _move_utilization(market, target):
+    (lending_pool, weth, borrower) = (market['lending_pool'], market['weth'], market['borrower'])
+    debt = market['weth_stable_debt'].totalSupply() + market['weth_variable_debt'].totalSupply()
+    total = weth.balanceOf(market['weth_atoken']) + debt
+    change = total * target // 10_000 - debt
+    if change > 0:
+        lending_pool.borrow(weth, change, INTEREST_RATE_MODE_VARIABLE, 0, borrower, {'from': borrower})
+    elif change < 0:
+        lending_pool.repay(weth, -change, INTEREST_RATE_MODE_VARIABLE, borrower, {'from': borrower})
+
+
+# Run the standard workload on `market` with a strategy deployed from `params`.
+# Returns the rates after each step and the treasury's and depositor's income.
+def run_workload(market, params):
+    (lending_pool, weth) = (market['lending_pool'], market['weth'])
+    strategy = deploy_default_strategy(
+        market['addresses_provider'], params=tuple(params[name] for name in STRATEGY_PARAMETERS)
+    )
+    market['configurator'].setReserveInterestRateStrategyAddress(weth, strategy, {'from': market['pool_admin']})
+
+    # Each step starts a fixed time after the first so every configuration accrues the same
+    start = web3.eth.getBlock('latest').timestamp
+    steps = []
+    for (i, target) in enumerate(WORKLOAD_UTILIZATIONS):
+        web3.manager.request_blocking('evm_mine', [start + i * WORKLOAD_STEP_SECONDS])
+        _move_utilization(market, target)
+        data = lending_pool.getReserveData(weth)
+        steps.append({
+            'target': target,
+            'utilization': weth_utilization(market),
+            'liquidity_rate': data[3],
+            'variable_rate': data[4],
+            'stable_rate': data[5],
+        })
+
+    web3.manager.request_blocking('evm_mine', [start + len(WORKLOAD_UTILIZATIONS) * WORKLOAD_STEP_SECONDS])
+    borrower = market['borrower']
+    lending_pool.repay(weth, MAX_UINT256, INTEREST_RATE_MODE_VARIABLE, borrower, {'from': borrower})
+
+    return {
+        'params': params,
+        'steps': steps,
+        'treasury_income': market['weth_atoken'].balanceOf(market['treasury']),
+        'depositor_income': market['weth_atoken'].balanceOf(market['depositer']) - market['deposit_amount'],
+    }
+
+
+# Worker entry point, runs `configs` [(index, params)] on its own Ganache from one market snapshot
+def _sweep_worker(root, configs):
+    with worker_node(root):
+        market = setup_sweep_market()
+        snapshot = ChainSnapshot()
+        results = []
+        for (index, params) in configs:
+            results.append((index, run_workload(market, params)))
+            snapshot.revert()
+        return results
+
+
+# Run the workload for every strategy configuration in `grid` spread over `processes` worker
+# processes (up to one per core), each with its own Ganache. Results are in `grid` order.
+def run_sweep(grid, processes=None, root=None):
+    processes = min(processes or multiprocessing.cpu_count(), len(grid))
+    indexed = list(enumerate(grid))
+    tasks = [(root or project_root(), indexed[worker::processes]) for worker in range(processes)]
+
+    # Workers are spawned so the caller's brownie connection is left untouched
+    with multiprocessing.get_context('spawn').Pool(processes) as pool:
+        results = [result for chunk in pool.starmap(_sweep_worker, tasks) for result in chunk]
+    return [result for (_, result) in sorted(results, key=lambda result: result[0])]
+
+
+def _percent(rate):
+    return '{:.2f}%'.format(rate * 100 / RAY)
+
+
+# Table of each configuration's parameters, peak rates and income
+def sweep_report(results):
+    lines = ['{:>8} {:>8} {:>8} {:>8} {:>8} {:>8} | {:>9} {:>9} {:>9} {:>22} {:>22}'.format(
+        'Optimal', 'Base', 'VSlope1', 'VSlope2', 'SSlope1', 'SSlope2',
+        'Max var', 'Max stab', 'Max liq', 'Treasury income', 'Depositor income',
+    )]
+    for result in results:
+        params = result['params']
+        lines.append('{:>8} {:>8} {:>8} {:>8} {:>8} {:>8} | {:>9} {:>9} {:>9} {:>22} {:>22}'.format(
+            *(_percent(params[name]) for name in STRATEGY_PARAMETERS),
+            _percent(max(step['variable_rate'] for step in result['steps'])),
+            _percent(max(step['stable_rate'] for step in result['steps'])),
+            _percent(max(step['liquidity_rate'] for step in result['steps'])),
+            result['treasury_income'],
+            result['depositor_income'],
+        ))
+    return lines
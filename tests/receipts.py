@@ -0,0 +1,118 @@
+from brownie import history, web3
+
+from contextlib import contextmanager
+
+
+# Passes each transaction receipt to its listeners as brownie adds it to `history`, with the owner
+# (test, fixture) sending it, and has them `flush()` before the chain is reverted.
+#
+# Reading `history` as a test ends misses whatever the test sent before a `ChainSnapshot.revert()`:
+# brownie drops the reverted receipts from `history` and the node forgets their transactions, so
+# they can no longer be traced either. Receipts are added when sent and may still be pending.
+#
+# Owners are set by `conftest.py`: `test` is the id of the running test and `fixture` the name of
+# the fixture being set up, if any.
+class ReceiptStream:
+    def __init__(self):
+        self.listeners = []
+        self.test = None
+        self.fixtures = []
+        self._provider = None
+        add_tx = history._add_tx
+
+        def _add_tx(tx):
+            add_tx(tx)
+            owner = (self.test, self.fixtures[-1] if self.fixtures else None)
+            for listener in list(self.listeners):
+                listener.add(tx, owner)
+
+        history._add_tx = _add_tx
+
+    # `listener` has `add(tx, owner)` and `flush()`
+    def listen(self, listener):
+        if self._provider is None:
+            self._provider = web3.provider = RevertWatchProvider(web3.provider, self)
+        self.listeners.append(listener)
+
+    def unlisten(self, listener):
+        self.listeners.remove(listener)
+
+    def flush(self):
+        for listener in list(self.listeners):
+            listener.flush()
+
+    # Receipts sent inside the block are owned by fixture `name`
+    @contextmanager
+    def fixture(self, name):
+        self.fixtures.append(name)
+        try:
+            yield
+        finally:
+            self.fixtures.pop()
+
+
+# Provider wrapper flushing the listeners of a `ReceiptStream` before each `evm_revert`
+class RevertWatchProvider:
+    def __init__(self, provider, stream):
+        self.provider = provider
+        self.stream = stream
+
+    def make_request(self, method, params):
+        if method == 'evm_revert':
+            self.stream.flush()
+        return self.provider.make_request(method, params)
+
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
+
+
+# Collects receipts from the `ReceiptStream` and hands each mined one to every processor as
+# `process(tx, owner)` on `flush()`, which also runs before every revert.
+#
+# Usage:
+#   collector = ReceiptCollector()
+#   collector.processors.append(lambda tx, owner: profiler.add(tx))
+#   ...
+#   collector.close()
+class ReceiptCollector:
+    def __init__(self):
+        self.stream = receipt_stream()
+        self.processors = []
+        self.pending = []
+        self.stream.listen(self)
+
+    def add(self, tx, owner):
+        self.pending.append((tx, owner))
+
+    def flush(self):
+        (pending, self.pending) = (self.pending, [])
+        for (tx, owner) in pending:
+            if tx.status == -1:
+                tx.wait(1)
+            if tx.status < 0:
+                continue # dropped
+            for process in self.processors:
+                process(tx, owner)
+
+    def close(self):
+        self.flush()
+        self.stream.unlisten(self)
+
+
+# Drop `tx` from brownie's `history`, which otherwise holds every receipt of the session
+def forget_receipt(tx):
+    try:
+        history._list.remove(tx)
+    except ValueError:
+        pass
+
+
+_stream = None
+
+
+# The `ReceiptStream` of the session
+def receipt_stream():
+    global _stream
+    if _stream is None:
+        _stream = ReceiptStream()
+    return _stream
@@ -0,0 +1,152 @@
+from helpers import BONUS, HEALTH_FACTOR_LIQUIDATION_THRESHOLD, LTV, THRESHOLD
+from liquidation_bot import plan_liquidation, position_account_data
+
+from functools import partial
+
+import math
+import multiprocessing
+import random
+
+
+# Reserve fields used by the Python `GenericLogic` and collateral manager math
+RESERVE_FIELDS = ('ltv', 'threshold', 'bonus', 'decimals', 'price')
+
+
+# Parameters of one reserve, defaulting to the configuration used throughout `helpers`
+def reserve_parameters(price, ltv=LTV, threshold=THRESHOLD, bonus=BONUS, decimals=18):
+    return {'ltv': ltv, 'threshold': threshold, 'bonus': bonus, 'decimals': decimals, 'price': price}
+
+
+# Synthetic book of `users` positions {asset: (collateral, stable debt, variable debt)}.
+# Each user deposits 1 to `max_units` whole units of `collateral_asset` and borrows
+# `debt_asset` at the variable rate for a uniform fraction of their LTV between
+# `min_utilisation` and `max_utilisation`.
+def synthetic_book(users, collateral_asset, debt_asset, reserves, seed=0, max_units=10,
+                   min_utilisation=0.5, max_utilisation=0.99):
+    rng = random.Random(seed)
+    collateral_reserve = reserves[collateral_asset]
+    debt_reserve = reserves[debt_asset]
+
+    book = []
+    for _ in range(users):
+        collateral = rng.randint(1, max_units) * 10 ** collateral_reserve['decimals']
+        collateral_eth = collateral_reserve['price'] * collateral // 10 ** collateral_reserve['decimals']
+        utilisation = rng.uniform(min_utilisation, max_utilisation)
+        borrow_eth = int(collateral_eth * collateral_reserve['ltv'] * utilisation) // 10_000
+        debt = borrow_eth * 10 ** debt_reserve['decimals'] // debt_reserve['price']
+        book.append({collateral_asset: (collateral, 0, 0), debt_asset: (0, 0, debt)})
+    return book
+
+
+# Geometric Brownian motion price path, a list of {asset: price} per step.
+# `volatilities` maps each shocked asset to its per step volatility, other prices stay fixed.
+def price_path(reserves, volatilities, steps, seed):
+    rng = random.Random(seed)
+    prices = {asset: reserves[asset]['price'] for asset in volatilities}
+    path = []
+    for _ in range(steps):
+        for (asset, volatility) in volatilities.items():
+            shock = math.exp(volatility * rng.gauss(0, 1) - volatility ** 2 / 2)
+            prices[asset] = max(1, int(prices[asset] * shock))
+        path.append(dict(prices))
+    return path
+
+
+# Apply `price_path` to a copy of `book`. At each step every user with a health factor below 1
+# is liquidated once on their most profitable pair, as `LiquidationBot.on_price_update()` would.
+#
+# Returns (bad debt in ETH, liquidations, final positions) where the bad debt is the debt not
+# covered by collateral summed over users at the end of the path.
+def simulate_path(book, reserves, path):
+    reserves = {asset: dict(reserve) for (asset, reserve) in reserves.items()}
+    positions = [dict(position) for position in book]
+    liquidations = 0
+
+    for prices in path:
+        for (asset, price) in prices.items():
+            reserves[asset]['price'] = price
+        for position in positions:
+            if position_account_data(position, reserves)[4] >= HEALTH_FACTOR_LIQUIDATION_THRESHOLD:
+                continue
+            plan = plan_liquidation(position, reserves)
+            if plan is None:
+                continue
+            (collateral_asset, debt_asset, debt_to_cover, _, collateral_amount) = plan
+            apply_liquidation(position, collateral_asset, debt_asset, debt_to_cover, collateral_amount)
+            liquidations += 1
+
+    bad_debt = 0
+    for position in positions:
+        (collateral_eth, debt_eth) = position_account_data(position, reserves)[:2]
+        bad_debt += max(0, debt_eth - collateral_eth)
+    return (bad_debt, liquidations, positions)
+
+
+# `LendingPoolCollateralManager.liquidationCall()` on a position, variable debt is repaid first
+def apply_liquidation(position, collateral_asset, debt_asset, debt_to_cover, collateral_amount):
+    (collateral, stable, variable) = position[collateral_asset]
+    position[collateral_asset] = (collateral - collateral_amount, stable, variable)
+
+    (collateral, stable, variable) = position[debt_asset]
+    repaid_variable = min(variable, debt_to_cover)
+    position[debt_asset] = (collateral, stable - (debt_to_cover - repaid_variable), variable - repaid_variable)
+
+
+# Worker entry point, simulates the path of one seed
+def _simulate_seed(book, reserves, volatilities, steps, seed):
+    path = price_path(reserves, volatilities, steps, seed)
+    (bad_debt, liquidations, _) = simulate_path(book, reserves, path)
+    return (seed, bad_debt, liquidations)
+
+
+# Loss distribution of a Monte Carlo run, losses are bad debt in ETH (wei)
+class RiskReport:
+    def __init__(self, results):
+        self.results = sorted(results)
+        self.losses = sorted(loss for (_, loss, _) in self.results)
+
+    def mean(self):
+        return sum(self.losses) // len(self.losses)
+
+    # Loss not exceeded with probability `q`
+    def quantile(self, q):
+        return self.losses[max(0, math.ceil(q * len(self.losses)) - 1)]
+
+    def max(self):
+        return self.losses[-1]
+
+    def probability_of_loss(self):
+        return sum(1 for loss in self.losses if loss > 0) / len(self.losses)
+
+    def liquidations(self):
+        return sum(liquidations for (_, _, liquidations) in self.results)
+
+    # Seeds of the paths with the largest losses
+    def worst(self, count=1):
+        return [seed for (seed, _, _) in sorted(self.results, key=lambda result: -result[1])[:count]]
+
+    def lines(self):
+        return [
+            '{:,} paths, {:,} liquidations'.format(len(self.losses), self.liquidations()),
+            '',
+            '{:<16} {:>24}'.format('Mean loss', self.mean()),
+            '{:<16} {:>24}'.format('VaR 95%', self.quantile(0.95)),
+            '{:<16} {:>24}'.format('VaR 99%', self.quantile(0.99)),
+            '{:<16} {:>24}'.format('Max loss', self.max()),
+            '{:<16} {:>24.4f}'.format('P(loss > 0)', self.probability_of_loss()),
+        ]
+
+
+# Simulate `paths` independent price paths of `steps` steps over `book`, seeded `seed`,
+# `seed + 1`, ... so any path can be regenerated with `price_path()`.
+# Paths are spread over `processes` worker processes (all cores by default, inline when 1).
+def run_monte_carlo(book, reserves, volatilities, paths, steps, seed=0, processes=None):
+    reserves = {asset: {field: reserve[field] for field in RESERVE_FIELDS} for (asset, reserve) in reserves.items()}
+    simulate = partial(_simulate_seed, book, reserves, volatilities, steps)
+    seeds = range(seed, seed + paths)
+
+    if processes == 1:
+        return RiskReport(map(simulate, seeds))
+    with multiprocessing.Pool(processes) as pool:
+        chunksize = max(1, paths // (4 * (processes or multiprocessing.cpu_count())))
+        return RiskReport(pool.map(simulate, seeds, chunksize))
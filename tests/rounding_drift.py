@@ -0,0 +1,237 @@
+from brownie import web3
+
+from helpers import calculate_linear_interest, RAY, ray_div, ray_mul
+from batch_reads import batch_reads
+
+import heapq
+import random
+
+
+# Liquidity rate used to grow the index between operations of the random sequences
+DRIFT_LIQUIDITY_RATE = RAY // 20 # 5.00%
+MAX_ACCRUE_SECONDS = 60 * 60 * 24 * 30
+
+
+# Scaled balances as stored by `AToken` (and `VariableDebtToken` for mint/burn).
+#
+# Balances are stored divided by the index and multiplied back when read so the sum of the
+# user balances and the total supply are rounded separately and drift apart.
+# The index follows `ReserveLogic`: reads use the normalized income at `time`, deposits and
+# withdrawals first store it as the index, then set the liquidity rate (zero until the first one).
+# Operations which revert on chain raise `ValueError` and leave the model unchanged.
+class ScaledBalanceModel:
+    def __init__(self, index=RAY):
+        self.index = index
+        self.rate = 0
+        self.time = 0
+        self.last_update = 0
+        self.scaled = {}
+        self.scaled_total = 0
+
+    # See `ReserveLogic.getNormalizedIncome()`
+    def normalized_income(self):
+        if self.time == self.last_update:
+            return self.index
+        return ray_mul(calculate_linear_interest(self.rate, self.time - self.last_update), self.index)
+
+    def balance_of(self, user):
+        return ray_mul(self.scaled.get(user, 0), self.normalized_income())
+
+    def total_supply(self):
+        return ray_mul(self.scaled_total, self.normalized_income())
+
+    # `totalSupply()` minus the sum of every `balanceOf()`
+    def drift(self):
+        index = self.normalized_income()
+        return ray_mul(self.scaled_total, index) - sum(ray_mul(scaled, index) for scaled in self.scaled.values())
+
+    def mint(self, user, amount):
+        amount_scaled = ray_div(amount, self.normalized_income())
+        if amount_scaled == 0:
+            raise ValueError('invalid mint amount')
+        self.scaled[user] = self.scaled.get(user, 0) + amount_scaled
+        self.scaled_total += amount_scaled
+
+    def burn(self, user, amount):
+        amount_scaled = ray_div(amount, self.normalized_income())
+        if amount_scaled == 0:
+            raise ValueError('invalid burn amount')
+        if amount_scaled > self.scaled.get(user, 0):
+            raise ValueError('burn exceeds balance')
+        self.scaled[user] -= amount_scaled
+        self.scaled_total -= amount_scaled
+
+    def transfer(self, sender, recipient, amount):
+        amount_scaled = ray_div(amount, self.normalized_income())
+        if amount_scaled > self.scaled.get(sender, 0):
+            raise ValueError('transfer exceeds balance')
+        self.scaled[sender] -= amount_scaled
+        self.scaled[recipient] = self.scaled.get(recipient, 0) + amount_scaled
+
+    # Apply an operation: ('deposit', user, amount), ('withdraw', user, amount),
+    # ('transfer', sender, recipient, amount) or ('accrue', seconds).
+    # Deposits and withdrawals leave the liquidity rate at `rate`.
+    def apply(self, op, rate=DRIFT_LIQUIDITY_RATE):
+        if op[0] in ('deposit', 'withdraw'):
+            # `ValidationLogic.validateWithdraw()` checks the amount against the rounded balance
+            if op[0] == 'withdraw' and (op[2] == 0 or op[2] > self.balance_of(op[1])):
+                raise ValueError('not enough available user balance')
+
+            # `ReserveLogic.updateState()`
+            state = (self.index, self.last_update)
+            self.index = self.normalized_income()
+            self.last_update = self.time
+            try:
+                if op[0] == 'deposit':
+                    self.mint(op[1], op[2])
+                else:
+                    self.burn(op[1], op[2])
+            except ValueError:
+                (self.index, self.last_update) = state
+                raise
+            self.rate = rate
+        elif op[0] == 'transfer':
+            self.transfer(op[1], op[2], op[3])
+        elif op[0] == 'accrue':
+            self.time += op[1]
+        else:
+            raise ValueError('unknown operation {}'.format(op[0]))
+
+
+# Amounts spread over every magnitude so both dust and large balances are rounded
+def _random_amount(rng, maximum=None):
+    amount = rng.randint(1, 9) * 10 ** rng.randint(0, 21)
+    if maximum is not None:
+        amount = min(amount, maximum)
+    return amount
+
+
+# Run one random sequence, returns (worst drift, operations up to the worst drift)
+def random_sequence(rng, length, users):
+    model = ScaledBalanceModel()
+    ops = []
+    worst = (0, 0)
+    for _ in range(length):
+        choice = rng.random()
+        user = rng.randrange(users)
+        balance = model.balance_of(user)
+        if choice < 0.15:
+            op = ('accrue', rng.randint(1, MAX_ACCRUE_SECONDS))
+        elif choice < 0.5 or balance == 0:
+            op = ('deposit', user, _random_amount(rng))
+        elif choice < 0.75:
+            amount = balance if rng.random() < 0.3 else _random_amount(rng, balance)
+            op = ('withdraw', user, amount)
+        else:
+            amount = balance if rng.random() < 0.3 else _random_amount(rng, balance)
+            op = ('transfer', user, rng.randrange(users), amount)
+
+        try:
+            model.apply(op)
+        except ValueError:
+            continue
+        ops.append(op)
+
+        drift = model.drift()
+        if abs(drift) > abs(worst[0]):
+            worst = (drift, len(ops))
+
+    return (worst[0], ops[:worst[1]])
+
+
+# Run `runs` random sequences of `length` operations over `users` users.
+# Returns the `keep` worst as (drift, seed, operations) sorted by absolute drift.
+def analyse_drift(runs, length, users=4, seed=0, keep=5):
+    worst = []
+    for run in range(runs):
+        run_seed = seed + run
+        (drift, ops) = random_sequence(random.Random(run_seed), length, users)
+        entry = (abs(drift), run_seed, drift, ops)
+        if len(worst) < keep:
+            heapq.heappush(worst, entry)
+        elif entry[:2] > worst[0][:2]:
+            heapq.heapreplace(worst, entry)
+    return [(drift, run_seed, ops) for (_, run_seed, drift, ops) in sorted(worst, reverse=True)]
+
+
+# Result of replaying a sequence on chain
+class ReplayResult:
+    def __init__(self):
+        self.mismatches = []
+        self.chain_drift = None
+        self.model_drift = None
+
+
+# Send `method(*args)` of `contract` from `sender` and mine it alone in a block at `timestamp`.
+# Returns whether it succeeded.
+def _transact_at(timestamp, sender, contract, method, *args):
+    web3.manager.request_blocking('miner_stop', [])
+    try:
+        txid = web3.eth.sendTransaction({
+            'from': sender.address,
+            'to': contract.address,
+            'data': getattr(contract, method).encode_input(*args),
+            'gas': web3.eth.getBlock('latest').gasLimit,
+            'gasPrice': 0,
+        })
+        try:
+            web3.manager.request_blocking('evm_mine', [timestamp])
+        except ValueError:
+            pass # Ganache reports the revert of a transaction it mines
+        return web3.eth.getTransactionReceipt(txid).status == 1
+    finally:
+        web3.manager.request_blocking('miner_start', [])
+
+
+# Replay `ops` on chain for the `asset` reserve, `accounts` maps model users to accounts which
+# hold and have approved enough of the asset. The reserve must be unused and earn
+# `DRIFT_LIQUIDITY_RATE` from its first deposit, its aToken must hold enough extra asset to pay
+# the interest. Each operation is mined at the time of the model so the index matches exactly.
+#
+# Every operation must succeed or revert on both, then the on chain drift of `atoken` must
+# equal the model's, which is the drift found by `random_sequence()` for the same operations.
+def replay_on_chain(ops, lending_pool, asset, atoken, accounts):
+    model = ScaledBalanceModel()
+    start = web3.eth.getBlock('latest').timestamp + 1
+
+    result = ReplayResult()
+    for op in ops:
+        if op[0] == 'accrue':
+            model.apply(op)
+            continue
+
+        if op[0] == 'transfer':
+            chain_op = ('transfer', accounts[op[1]], accounts[op[2]], op[3])
+        else:
+            chain_op = (op[0], accounts[op[1]], op[2])
+
+        (sender, timestamp) = (chain_op[1], start + model.time)
+        if op[0] == 'deposit':
+            succeeded = _transact_at(timestamp, sender, lending_pool, 'deposit', asset, op[2], sender, 0)
+        elif op[0] == 'withdraw':
+            succeeded = _transact_at(timestamp, sender, lending_pool, 'withdraw', asset, op[2], sender)
+        else:
+            succeeded = _transact_at(timestamp, sender, atoken, 'transfer', chain_op[2], op[3])
+        chain_reverted = not succeeded
+
+        try:
+            model.apply(chain_op)
+            model_reverted = False
+        except ValueError:
+            model_reverted = True
+        if chain_reverted != model_reverted:
+            result.mismatches.append((op, chain_reverted, model_reverted))
+
+    # Drift at the model's final time from the scaled balances and reserve data of one block,
+    # see `AToken.balanceOf()` and `ReserveLogic.getNormalizedIncome()`
+    with batch_reads() as r:
+        scaled_total = r.call(atoken.scaledTotalSupply)
+        scaled = [r.call(atoken.scaledBalanceOf, user) for user in model.scaled]
+        reserve = r.call(lending_pool.getReserveData, asset)
+    (index, rate, last_update) = (reserve.value[1], reserve.value[3], reserve.value[6])
+    end = start + model.time
+    if end != last_update:
+        index = ray_mul(calculate_linear_interest(rate, end - last_update), index)
+    result.chain_drift = ray_mul(scaled_total.value, index) - sum(ray_mul(balance.value, index) for balance in scaled)
+    result.model_drift = model.drift()
+    return result
@@ -0,0 +1,252 @@
+from brownie import accounts, reverts, web3
+
+from helpers import INTEREST_RATE_MODE_STABLE, INTEREST_RATE_MODE_VARIABLE
+from snapshots import ChainSnapshot
+
+import operator
+
+
+# Declarative scenarios executed as a prefix tree.
+#
+# A scenario is a dict with a `name`, a list of `actions` and a list of `expect` checks run after
+# the last action. Actions are tuples `(name, *args)` dispatched through `ACTIONS` and refer to
+# accounts, assets and tokens by their name in the context returned by the setup e.g.
+#
+#     {
+#         'name': 'repay variable after a day',
+#         'actions': [
+#             ('borrow', 'borrower', 'weth', WEI // 100, 'variable'),
+#             ('sleep', ONE_DAY),
+#             ('approve', 'borrower', 'weth', WEI // 100),
+#             ('repay', 'borrower', 'weth', WEI // 100, 'variable'),
+#         ],
+#         'expect': [('balance', 'weth_variable_debt', 'borrower', '==', 0)],
+#     }
+#
+# `('reverts', message, action)` expects `action` to revert with `message`.
+# Checks are tuples `(name, *args)` dispatched through `CHECKS` or callables taking the context.
+#
+# Scenarios sharing leading actions share the nodes of the tree, each node's action is executed
+# once and the chain is snapshotted where scenarios diverge so the cost is proportional to the
+# number of unique actions.
+
+
+INTEREST_RATE_MODES = {
+    'stable': INTEREST_RATE_MODE_STABLE,
+    'variable': INTEREST_RATE_MODE_VARIABLE,
+}
+
+COMPARISONS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+# Names for the contracts and accounts returned by `setup_borrow()`
+def borrow_context(market):
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, depositer, deposit_amount, borrower,
+    terc20, terc20_atoken, terc20_stable_debt, terc20_variable_debt, tecr20_ltv, tecr20_threshold, tecr20_bonus,
+    terc20_deposit_amount, price) = market
+
+    return {
+        'lending_pool': lending_pool,
+        'configurator': configurator,
+        'pool_admin': pool_admin,
+        'price_oracle': price_oracle,
+        'depositer': depositer,
+        'borrower': borrower,
+        'weth': weth,
+        'weth_atoken': weth_atoken,
+        'weth_stable_debt': weth_stable_debt,
+        'weth_variable_debt': weth_variable_debt,
+        'terc20': terc20,
+        'terc20_atoken': terc20_atoken,
+        'terc20_stable_debt': terc20_stable_debt,
+        'terc20_variable_debt': terc20_variable_debt,
+    }
+
+
+###########
+# Actions
+###########
+
+
+def action_deposit(context, user, asset, amount):
+    context['lending_pool'].deposit(context[asset], amount, context[user], 0, {'from': context[user]})
+
+
+def action_withdraw(context, user, asset, amount):
+    context['lending_pool'].withdraw(context[asset], amount, context[user], {'from': context[user]})
+
+
+def action_borrow(context, user, asset, amount, mode):
+    context['lending_pool'].borrow(
+        context[asset], amount, INTEREST_RATE_MODES[mode], 0, context[user], {'from': context[user]}
+    )
+
+
+def action_repay(context, user, asset, amount, mode):
+    context['lending_pool'].repay(
+        context[asset], amount, INTEREST_RATE_MODES[mode], context[user], {'from': context[user]}
+    )
+
+
+def action_approve(context, user, asset, amount):
+    context[asset].approve(context['lending_pool'], amount, {'from': context[user]})
+
+
+def action_wrap(context, user, amount):
+    context['weth'].deposit({'from': context[user], 'value': amount})
+
+
+def action_transfer(context, user, token, recipient, amount):
+    context[token].transfer(context[recipient], amount, {'from': context[user]})
+
+
+def action_set_price(context, asset, price):
+    context['price_oracle'].setAssetPrice(context[asset], price, {'from': accounts[0]})
+
+
+def action_sleep(context, seconds):
+    web3.manager.request_blocking("evm_increaseTime", seconds)
+    web3.manager.request_blocking("evm_mine", [])
+
+
+def action_reverts(context, message, action):
+    with reverts(message):
+        run_action(context, action)
+
+
+ACTIONS = {
+    'deposit': action_deposit,
+    'withdraw': action_withdraw,
+    'borrow': action_borrow,
+    'repay': action_repay,
+    'approve': action_approve,
+    'wrap': action_wrap,
+    'transfer': action_transfer,
+    'set_price': action_set_price,
+    'sleep': action_sleep,
+    'reverts': action_reverts,
+}
+
+
+def run_action(context, action):
+    (name, *args) = action
+    ACTIONS[name](context, *args)
+
+
+##########
+# Checks
+##########
+
+
+def check_balance(context, token, user, comparison, amount):
+    balance = context[token].balanceOf(context[user])
+    assert COMPARISONS[comparison](balance, amount), '{} balance of {} is {}, expected {} {}'.format(
+        token, user, balance, comparison, amount
+    )
+
+
+def check_health_factor(context, user, comparison, value):
+    health_factor = context['lending_pool'].getUserAccountData(context[user])[5]
+    assert COMPARISONS[comparison](health_factor, value), 'health factor of {} is {}, expected {} {}'.format(
+        user, health_factor, comparison, value
+    )
+
+
+CHECKS = {
+    'balance': check_balance,
+    'health_factor': check_health_factor,
+}
+
+
+def run_check(context, check):
+    if callable(check):
+        check(context)
+    else:
+        (name, *args) = check
+        CHECKS[name](context, *args)
+
+
+##########
+# Engine
+##########
+
+
+class ScenarioNode:
+    def __init__(self, action=None):
+        self.action = action
+        self.children = {}
+        self.scenarios = []
+
+
+# Arrange `scenarios` into a prefix tree keyed by action, returns the root
+def build_scenario_tree(scenarios):
+    root = ScenarioNode()
+    for scenario in scenarios:
+        node = root
+        for action in scenario['actions']:
+            node = node.children.setdefault(action, ScenarioNode(action))
+        node.scenarios.append(scenario)
+    return root
+
+
+# Run `scenarios` from the context returned by `setup()`.
+#
+# Returns (failures, executed) where `failures` maps the name of each failing scenario to its
+# exception and `executed` is the number of actions sent, compared to the sum of all scenario
+# lengths when actions are not shared.
+def run_scenarios(scenarios, setup):
+    root = build_scenario_tree(scenarios)
+    context = setup()
+    failures = {}
+    executed = _run_node(root, context, failures)
+    return (failures, executed)
+
+
+def _run_node(node, context, failures):
+    executed = 0
+    if node.action is not None:
+        try:
+            run_action(context, node.action)
+            executed += 1
+        except Exception as e:
+            # Every scenario below this node fails on the same action
+            for scenario in _scenarios_under(node):
+                failures[scenario['name']] = e
+            return executed
+
+    # Checks only read state so all scenarios ending here share the chain state
+    for scenario in node.scenarios:
+        try:
+            for check in scenario.get('expect', []):
+                run_check(context, check)
+        except Exception as e:
+            failures[scenario['name']] = e
+
+    # Only branch points need a snapshot, a single child continues on the current chain
+    children = list(node.children.values())
+    if len(children) == 1:
+        return executed + _run_node(children[0], context, failures)
+
+    if children:
+        snapshot = ChainSnapshot()
+        for (i, child) in enumerate(children):
+            if i > 0:
+                snapshot.revert()
+            executed += _run_node(child, context, failures)
+    return executed
+
+
+def _scenarios_under(node):
+    scenarios = list(node.scenarios)
+    for child in node.children.values():
+        scenarios.extend(_scenarios_under(child))
+    return scenarios
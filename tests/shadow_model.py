@@ -0,0 +1,208 @@
+from brownie import AToken, Contract, StableDebtToken, VariableDebtToken
+
+from snapshots import ChainSnapshot
+
+from array import array
+
+
+# Users per chunk, the unit of allocation and of copy-on-write
+CHUNK_SIZE = 1024
+
+# Unsigned 128 bit values are stored as two 64 bit words, larger values spill into a dict
+WORD = 1 << 64
+WIDE_LIMIT = (1 << 128) - 1
+
+# Per reserve user fields and their encoding
+WIDE_FIELDS = ('scaled_atoken', 'scaled_variable_debt', 'stable_principal', 'stable_rate')
+FIELDS = WIDE_FIELDS + ('timestamp', 'configuration')
+
+# Bits of a user's reserve in `UserConfiguration`, shifted by `2 * reserve`
+BORROWING_BIT = 1
+COLLATERAL_BIT = 2
+
+
+# Column of one field for one reserve, indexed by user.
+#
+# Values are held in fixed size `array` chunks allocated on first write, untouched chunks read
+# as zero. Forked columns share chunks until either side writes to them.
+class Column:
+    def __init__(self, typecode, width):
+        self.typecode = typecode
+        self.width = width
+        self.chunks = []
+        self.owned = []
+        self.overflow = {}
+        self.overflow_owned = True
+
+    def fork(self):
+        column = Column(self.typecode, self.width)
+        column.chunks = list(self.chunks)
+        column.owned = [False] * len(self.chunks)
+        column.overflow = self.overflow
+        column.overflow_owned = False
+        self.owned = [False] * len(self.chunks)
+        self.overflow_owned = False
+        return column
+
+    def _writable_chunk(self, chunk_index):
+        while len(self.chunks) <= chunk_index:
+            self.chunks.append(None)
+            self.owned.append(True)
+        chunk = self.chunks[chunk_index]
+        if chunk is None:
+            chunk = array(self.typecode, bytes(CHUNK_SIZE * self.width * array(self.typecode).itemsize))
+        elif not self.owned[chunk_index]:
+            chunk = array(self.typecode, chunk)
+        self.chunks[chunk_index] = chunk
+        self.owned[chunk_index] = True
+        return chunk
+
+    def get(self, user):
+        (chunk_index, offset) = divmod(user, CHUNK_SIZE)
+        if chunk_index >= len(self.chunks) or self.chunks[chunk_index] is None:
+            return 0
+        chunk = self.chunks[chunk_index]
+        if self.width == 1:
+            return chunk[offset]
+
+        low = chunk[2 * offset]
+        high = chunk[2 * offset + 1]
+        if low == high == WORD - 1:
+            return self.overflow[user]
+        return high * WORD + low
+
+    def set(self, user, value):
+        (chunk_index, offset) = divmod(user, CHUNK_SIZE)
+        if value == 0 and (chunk_index >= len(self.chunks) or self.chunks[chunk_index] is None):
+            return
+        chunk = self._writable_chunk(chunk_index)
+        if self.width == 1:
+            chunk[offset] = value
+            return
+
+        if user in self.overflow:
+            self._writable_overflow().pop(user)
+        if value >= WIDE_LIMIT:
+            self._writable_overflow()[user] = value
+            (high, low) = (WORD - 1, WORD - 1)
+        else:
+            (high, low) = divmod(value, WORD)
+        chunk[2 * offset] = low
+        chunk[2 * offset + 1] = high
+
+    def _writable_overflow(self):
+        if not self.overflow_owned:
+            self.overflow = dict(self.overflow)
+            self.overflow_owned = True
+        return self.overflow
+
+    def memory_bytes(self):
+        return sum(chunk.itemsize * len(chunk) for chunk in self.chunks if chunk is not None)
+
+
+# Python shadow of the protocol's per user, per reserve state stored as reserve indexed columns.
+#
+# Each reserve has a column per field: scaled aToken balance, scaled variable debt, stable
+# principal, stable rate (128 bit words), stable debt timestamp (32 bits) and the user's two
+# `UserConfiguration` bits for the reserve (8 bits). Users are numbered in order of appearance.
+#
+# `fork()` returns an independent model sharing all chunks, chunks are only copied when written
+# so forking alongside `chain.snapshot()` costs a list copy per column.
+class ShadowModel:
+    def __init__(self, reserves):
+        self.reserves = reserves
+        self.users = {}
+        self.users_owned = True
+        self.columns = {
+            field: [self._new_column(field) for _ in range(reserves)] for field in FIELDS
+        }
+
+    @staticmethod
+    def _new_column(field):
+        if field in WIDE_FIELDS:
+            return Column('Q', 2)
+        if field == 'timestamp':
+            return Column('I', 1)
+        return Column('B', 1)
+
+    # Index of `address`, allocated on first use
+    def user_index(self, address):
+        index = self.users.get(address)
+        if index is None:
+            if not self.users_owned:
+                self.users = dict(self.users)
+                self.users_owned = True
+            index = self.users[address] = len(self.users)
+        return index
+
+    def get(self, field, reserve, address):
+        index = self.users.get(address)
+        if index is None:
+            return 0
+        return self.columns[field][reserve].get(index)
+
+    def set(self, field, reserve, address, value):
+        self.columns[field][reserve].set(self.user_index(address), value)
+
+    # The user's `UserConfiguration` bitmap
+    def configuration(self, address):
+        user = self.users.get(address)
+        if user is None:
+            return 0
+        bitmap = 0
+        for (reserve, column) in enumerate(self.columns['configuration']):
+            bitmap |= column.get(user) << (2 * reserve)
+        return bitmap
+
+    def set_using_as_collateral(self, reserve, address, using):
+        self._set_configuration_bit(reserve, address, COLLATERAL_BIT, using)
+
+    def set_borrowing(self, reserve, address, borrowing):
+        self._set_configuration_bit(reserve, address, BORROWING_BIT, borrowing)
+
+    def _set_configuration_bit(self, reserve, address, bit, value):
+        bits = self.get('configuration', reserve, address)
+        self.set('configuration', reserve, address, bits | bit if value else bits & ~bit)
+
+    def fork(self):
+        model = ShadowModel.__new__(ShadowModel)
+        model.reserves = self.reserves
+        model.users = self.users
+        model.users_owned = False
+        self.users_owned = False
+        model.columns = {
+            field: [column.fork() for column in columns] for (field, columns) in self.columns.items()
+        }
+        return model
+
+    def memory_bytes(self):
+        return sum(column.memory_bytes() for columns in self.columns.values() for column in columns)
+
+
+# Copy the on chain state of `address` in every reserve of `lending_pool` into `model`
+def load_user(model, lending_pool, address):
+    configuration = lending_pool.getUserConfiguration(address)[0]
+    for (reserve, asset) in enumerate(lending_pool.getReservesList()):
+        data = lending_pool.getReserveData(asset)
+        atoken = Contract.from_abi(AToken, data[7], AToken.abi)
+        stable_debt = Contract.from_abi(StableDebtToken, data[8], StableDebtToken.abi)
+        variable_debt = Contract.from_abi(VariableDebtToken, data[9], VariableDebtToken.abi)
+
+        model.set('scaled_atoken', reserve, address, atoken.scaledBalanceOf(address))
+        model.set('scaled_variable_debt', reserve, address, variable_debt.scaledBalanceOf(address))
+        model.set('stable_principal', reserve, address, stable_debt.principalBalanceOf(address))
+        model.set('stable_rate', reserve, address, stable_debt.getUserStableRate(address))
+        model.set('timestamp', reserve, address, stable_debt.getUserLastUpdated(address))
+        model.set('configuration', reserve, address, (configuration >> (2 * reserve)) & 3)
+
+
+# A `ChainSnapshot` paired with a fork of a `ShadowModel`.
+# `revert()` reverts the chain and returns a fresh fork of the model as it was at the snapshot.
+class ShadowSnapshot:
+    def __init__(self, model):
+        self.chain = ChainSnapshot()
+        self.model = model.fork()
+
+    def revert(self):
+        self.chain.revert()
+        return self.model.fork()
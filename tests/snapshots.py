@@ -0,0 +1,15 @@
+from brownie import chain, web3
+
+
+# A chain snapshot which can be reverted to any number of times.
+#
+# Unlike `chain.snapshot()` several may be held at once. Ganache drops every snapshot taken after
+# the one being reverted to, so when nesting snapshots revert to the innermost first.
+# Reverting goes through brownie so its transaction history and contract registry are rolled back.
+class ChainSnapshot:
+    def __init__(self):
+        self._id = web3.manager.request_blocking('evm_snapshot', [])
+        self.height = chain.height
+
+    def revert(self):
+        self._id = chain._revert(self._id)
@@ -0,0 +1,116 @@
+from helpers import calculate_compound_interest, ray_div, ray_mul, wad_to_ray
+
+# `SDT_STABLE_DEBT_OVERFLOW` bound on a user's stable rate
+MAX_STABLE_RATE = 1 << 128
+
+
+# Python model of `StableDebtToken`.
+#
+# Tracks the same storage as the contract: each user's principal, stable rate and last update
+# timestamp, the principal total supply, the average stable rate and the total supply timestamp.
+# `mint()` and `burn()` accrue interest and update the average rate incrementally exactly as
+# the contract does (including its rounding) so long event histories can be replayed quickly
+# and compared against the chain or against `average_rate_from_users()`.
+class StableDebtModel:
+    def __init__(self):
+        self.principal = {}
+        self.user_rates = {}
+        self.timestamps = {}
+        self.principal_supply = 0
+        self.average_rate = 0
+        self.total_supply_timestamp = 0
+
+    # `balanceOf()` at time `now`
+    def balance_of(self, user, now):
+        balance = self.principal.get(user, 0)
+        if balance == 0:
+            return 0
+        interest = calculate_compound_interest(self.user_rates[user], now - self.timestamps[user])
+        return ray_mul(balance, interest)
+
+    # `totalSupply()` at time `now`
+    def total_supply(self, now):
+        if self.principal_supply == 0:
+            return 0
+        interest = calculate_compound_interest(self.average_rate, now - self.total_supply_timestamp)
+        return ray_mul(self.principal_supply, interest)
+
+    # `getSupplyData()` at time `now`
+    def supply_data(self, now):
+        return (self.principal_supply, self.total_supply(now), self.average_rate, self.total_supply_timestamp)
+
+    # Returns (previous principal, current balance, balance increase) as `_calculateBalanceIncrease()`
+    def _balance_increase(self, user, now):
+        previous = self.principal.get(user, 0)
+        if previous == 0:
+            return (0, 0, 0)
+        increase = self.balance_of(user, now) - previous
+        return (previous, previous + increase, increase)
+
+    # `mint()` of `amount` at `rate` to `user`, returns True if it is the user's first borrow
+    def mint(self, user, amount, rate, now):
+        (_, current_balance, balance_increase) = self._balance_increase(user, now)
+
+        previous_supply = self.total_supply(now)
+        next_supply = previous_supply + amount
+        self.principal_supply = next_supply
+
+        amount_in_ray = wad_to_ray(amount)
+        new_user_rate = ray_div(
+            ray_mul(self.user_rates.get(user, 0), wad_to_ray(current_balance)) + ray_mul(amount_in_ray, rate),
+            wad_to_ray(current_balance + amount)
+        )
+        if new_user_rate >= MAX_STABLE_RATE:
+            raise OverflowError('stable debt overflow')
+        self.user_rates[user] = new_user_rate
+
+        self.total_supply_timestamp = now
+        self.timestamps[user] = now
+
+        self.average_rate = ray_div(
+            ray_mul(self.average_rate, wad_to_ray(previous_supply)) + ray_mul(rate, amount_in_ray),
+            wad_to_ray(next_supply)
+        )
+
+        self.principal[user] = self.principal.get(user, 0) + amount + balance_increase
+        return current_balance == 0
+
+    # `burn()` of `amount` from `user`
+    def burn(self, user, amount, now):
+        (principal, current_balance, balance_increase) = self._balance_increase(user, now)
+        if amount > current_balance:
+            raise ValueError('burn exceeds balance')
+
+        previous_supply = self.total_supply(now)
+        user_rate = self.user_rates.get(user, 0)
+
+        # Interest accrues separately for users and the supply, the last repayment may exceed either
+        if previous_supply <= amount:
+            self.average_rate = 0
+            self.principal_supply = 0
+        else:
+            next_supply = previous_supply - amount
+            self.principal_supply = next_supply
+            first_term = ray_mul(self.average_rate, wad_to_ray(previous_supply))
+            second_term = ray_mul(user_rate, wad_to_ray(amount))
+            if second_term >= first_term:
+                self.average_rate = 0
+                self.principal_supply = 0
+            else:
+                self.average_rate = ray_div(first_term - second_term, wad_to_ray(next_supply))
+
+        if amount == current_balance:
+            self.user_rates[user] = 0
+            self.timestamps[user] = 0
+        else:
+            self.timestamps[user] = now
+        self.total_supply_timestamp = now
+
+        self.principal[user] = principal + balance_increase - amount
+
+    # Principal weighted average of the users' stable rates, what `average_rate` approximates
+    def average_rate_from_users(self):
+        total = sum(self.principal.values())
+        if total == 0:
+            return 0
+        return sum(self.user_rates[user] * balance for (user, balance) in self.principal.items()) // total
@@ -0,0 +1,228 @@
+from collections import defaultdict
+
+from gas_profiler import CALL_OPS
+
+
+# `ReserveLogic.ReserveData` fields by slot offset within the struct
+RESERVE_DATA_FIELDS = [
+    'configuration',
+    'liquidityIndex,variableBorrowIndex',
+    'currentLiquidityRate,currentVariableBorrowRate',
+    'currentStableBorrowRate,lastUpdateTimestamp',
+    'aTokenAddress',
+    'stableDebtTokenAddress',
+    'variableDebtTokenAddress',
+    'interestRateStrategyAddress,id',
+]
+
+# Storage slot -> (state variable, struct fields of mapped values)
+# Slots follow the C3-linearized inheritance order, e.g. `VersionedInitializable` then
+# `LendingPoolStorage` for `LendingPool`, and `IncentivizedERC20` then `VersionedInitializable`
+# for the debt tokens, as in solc's `storageLayout` output. Packed variables share a slot and are
+# listed together. `VersionedInitializable` reserves 50 slots (`______gap`) after `initializing`.
+LENDING_POOL_LAYOUT = {
+    0: ('lastInitializedRevision', None),
+    1: ('initializing', None),
+    52: ('_addressesProvider', None),
+    53: ('_reserves', RESERVE_DATA_FIELDS),
+    54: ('_usersConfig', None),
+    55: ('_reservesList', None),
+    56: ('_reservesCount', None),
+    57: ('_paused', None),
+}
+ATOKEN_LAYOUT = {
+    0: ('lastInitializedRevision', None),
+    1: ('initializing', None),
+    52: ('_balances', None),
+    53: ('_allowances', None),
+    54: ('_totalSupply', None),
+    55: ('_name', None),
+    56: ('_symbol', None),
+    57: ('_decimals', None),
+    58: ('_nonces', None),
+    59: ('DOMAIN_SEPARATOR', None),
+}
+DEBT_TOKEN_LAYOUT = {
+    0: ('_balances', None),
+    1: ('_allowances', None),
+    2: ('_totalSupply', None),
+    3: ('_name', None),
+    4: ('_symbol', None),
+    5: ('_decimals', None),
+    6: ('lastInitializedRevision', None),
+    7: ('initializing', None),
+    58: ('_borrowAllowances', None),
+}
+STABLE_DEBT_TOKEN_LAYOUT = dict(DEBT_TOKEN_LAYOUT, **{
+    59: ('_avgStableRate', None),
+    60: ('_timestamps', None),
+    61: ('_usersStableRate', None),
+    62: ('_totalSupplyTimestamp', None),
+})
+ERC20_LAYOUT = {
+    0: ('_balances', None),
+    1: ('_allowances', None),
+    2: ('_totalSupply', None),
+    3: ('_name', None),
+    4: ('_symbol', None),
+    5: ('_decimals,delegatee', None),
+}
+WETH9_LAYOUT = {
+    0: ('name', None),
+    1: ('symbol', None),
+    2: ('decimals', None),
+    3: ('balanceOf', None),
+    4: ('allowance', None),
+}
+
+STORAGE_LAYOUTS = {
+    'LendingPool': LENDING_POOL_LAYOUT,
+    'LendingPool2': LENDING_POOL_LAYOUT,
+    'AToken': ATOKEN_LAYOUT,
+    'AToken2': ATOKEN_LAYOUT,
+    'DelegationAwareAToken': ATOKEN_LAYOUT,
+    'StableDebtToken': STABLE_DEBT_TOKEN_LAYOUT,
+    'StableDebtToken2': STABLE_DEBT_TOKEN_LAYOUT,
+    'VariableDebtToken': DEBT_TOKEN_LAYOUT,
+    'VariableDebtToken2': DEBT_TOKEN_LAYOUT,
+    'MintableDelegationERC20': ERC20_LAYOUT,
+    'WETH9': WETH9_LAYOUT,
+}
+
+# `BaseUpgradeabilityProxy.IMPLEMENTATION_SLOT`
+IMPLEMENTATION_SLOT = 0x360894a13ba1a3210667c828492db98dca3e2076cc3735a920a3ca505d382bbc
+
+
+# Lists the SLOAD and SSTORE operations of a transaction with the storage field they access.
+#
+# Mapping slots are resolved from the keccak256 preimages computed by the transaction itself,
+# e.g. `_reserves[asset].liquidityIndex` or `_balances[user]`. `preimages` may be shared between
+# calls to reuse hashes seen in earlier transactions.
+# Returns a list of (op, storage address, contract, field pattern, concrete field) where the pattern
+# replaces mapping keys with `*` e.g. `_reserves[*].configuration`.
+def profile_storage(tx, preimages=None):
+    if preimages is None:
+        preimages = {}
+    trace = tx.trace
+    accesses = []
+    contexts = [(tx.receiver or tx.contract_address, _contract_name(trace[0]['contractName']) if trace else None)]
+
+    for (i, step) in enumerate(trace):
+        del contexts[step['depth'] + 1:]
+        (address, contract) = contexts[step['depth']]
+        op = step['op']
+
+        if op == 'SHA3':
+            _record_preimage(step, trace[i + 1], preimages)
+        elif op in ('SLOAD', 'SSTORE'):
+            slot = int(step['stack'][-1], 16)
+            (pattern, concrete) = describe_slot(contract, slot, preimages)
+            accesses.append((op, address, contract, pattern, concrete))
+        elif op in CALL_OPS and i + 1 < len(trace) and trace[i + 1]['depth'] > step['depth']:
+            callee = _contract_name(trace[i + 1]['contractName'])
+            if op in ('DELEGATECALL', 'CALLCODE'):
+                # A proxy delegates to an implementation with its own layout, libraries use the caller's
+                contexts.append((address, callee if callee in STORAGE_LAYOUTS else contract))
+            elif op in ('CREATE', 'CREATE2'):
+                contexts.append((None, callee))
+            else:
+                contexts.append(('0x{:040x}'.format(int(step['stack'][-2], 16)), callee))
+
+    return accesses
+
+
+# Name the field stored at `slot` of `contract` e.g. ('_usersConfig[*]', '_usersConfig[0xab..]')
+def describe_slot(contract, slot, preimages):
+    layout = STORAGE_LAYOUTS.get(contract, {})
+    if slot == IMPLEMENTATION_SLOT:
+        return ('IMPLEMENTATION_SLOT', 'IMPLEMENTATION_SLOT')
+    described = _describe(layout, slot, preimages)
+    if described is None:
+        return ('slot {:#x}'.format(slot), 'slot {:#x}'.format(slot))
+    return described[:2]
+
+
+# Aggregates `profile_storage()` per operation e.g. `LendingPool.borrow`
+class StorageProfiler:
+    def __init__(self):
+        self.preimages = {}
+        self.transactions = defaultdict(int)
+        self.counts = defaultdict(lambda: defaultdict(int)) # operation -> (op, contract, pattern) -> count
+
+    def add(self, tx):
+        operation = '{}.{}'.format(_contract_name(tx.contract_name), tx.fn_name)
+        self.transactions[operation] += 1
+        for (op, address, contract, pattern, concrete) in profile_storage(tx, self.preimages):
+            self.counts[operation][(op, contract, pattern)] += 1
+
+    # Processor of a `ReceiptCollector`
+    def add_receipt(self, tx, owner):
+        self.add(tx)
+
+    # Average SLOAD and SSTORE count per transaction of `operation`
+    def totals(self, operation):
+        count = self.transactions[operation]
+        sloads = sum(n for ((op, _, _), n) in self.counts[operation].items() if op == 'SLOAD')
+        sstores = sum(n for ((op, _, _), n) in self.counts[operation].items() if op == 'SSTORE')
+        return (sloads / count, sstores / count)
+
+    def report(self):
+        lines = []
+        for operation in sorted(self.counts):
+            (sloads, sstores) = self.totals(operation)
+            lines.append('{} ({} txs): {:.1f} SLOAD, {:.1f} SSTORE per tx'.format(
+                operation, self.transactions[operation], sloads, sstores
+            ))
+            rows = sorted(self.counts[operation].items(), key=lambda item: item[1], reverse=True)
+            for ((op, contract, pattern), count) in rows:
+                lines.append('    {:>6} {:>8.1f}  {}.{}'.format(
+                    op, count / self.transactions[operation], contract, pattern
+                ))
+        return '\n'.join(lines)
+
+
+# `contract_name` of a receipt is the `ContractContainer` for proxies created with
+# `Contract.from_abi(LendingPool, ...)`
+def _contract_name(name):
+    return getattr(name, '_name', name)
+
+
+# Store the 64 byte (key, slot) preimage of a mapping slot hashed by SHA3
+def _record_preimage(step, following, preimages):
+    offset = int(step['stack'][-1], 16)
+    length = int(step['stack'][-2], 16)
+    if length != 64:
+        return
+    memory = bytes.fromhex(''.join(step['memory']))
+    data = memory[offset:offset + length]
+    result = int(following['stack'][-1], 16)
+    preimages[result] = (int.from_bytes(data[:32], 'big'), int.from_bytes(data[32:], 'big'))
+
+
+def _describe(layout, slot, preimages):
+    if slot in layout:
+        (name, fields) = layout[slot]
+        return (name, name, fields)
+
+    for offset in range(len(RESERVE_DATA_FIELDS)):
+        if slot - offset not in preimages:
+            continue
+        (key, parent_slot) = preimages[slot - offset]
+        parent = _describe(layout, parent_slot, preimages)
+        if parent is None:
+            continue
+        (pattern, concrete, fields) = parent
+        pattern += '[*]'
+        concrete += '[{}]'.format(_format_key(key))
+        if fields is not None and offset < len(fields):
+            return (pattern + '.' + fields[offset], concrete + '.' + fields[offset], None)
+        if offset == 0:
+            return (pattern, concrete, fields)
+
+    return None
+
+
+def _format_key(key):
+    if key >= 1 << 32:
+        return '0x{:040x}'.format(key)
+    return str(key)
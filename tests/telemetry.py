@@ -0,0 +1,155 @@
+from brownie import web3
+
+from receipts import forget_receipt
+
+from pathlib import Path
+
+import json
+import time
+
+
+# Requests which submit a transaction, timed for the wall latency of each transaction
+SEND_METHODS = {'eth_sendTransaction', 'eth_sendRawTransaction'}
+
+# Lines held in memory before being written
+BUFFER_LINES = 1_000
+
+# Size at which the current file is closed and the next one started
+MAX_FILE_BYTES = 64 * 1024 * 1024
+
+
+# Provider wrapper timing transaction submission. Ganache mines on submission so the time from
+# sending to the node's reply covers execution and mining.
+class LatencyProvider:
+    def __init__(self, provider):
+        self.provider = provider
+        self.latencies = {}
+
+    def make_request(self, method, params):
+        if method not in SEND_METHODS:
+            return self.provider.make_request(method, params)
+
+        start = time.perf_counter()
+        response = self.provider.make_request(method, params)
+        if 'result' in response:
+            self.latencies[response['result']] = time.perf_counter() - start
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
+
+
+# Event values as plain JSON types
+def _compact(value):
+    if isinstance(value, bytes):
+        return '0x' + value.hex()
+    if isinstance(value, (list, tuple)):
+        return [_compact(v) for v in value]
+    if isinstance(value, (bool, type(None))):
+        return value
+    if isinstance(value, int):
+        return int(value)
+    return str(value)
+
+
+# `contract_name` of a receipt is the `ContractContainer` for contracts deployed by this project
+def _contract_name(name):
+    return getattr(name, '_name', name)
+
+
+# Streams one JSON line per transaction to `directory/telemetry-<n>.jsonl`.
+#
+# Lines are buffered and written every `buffer_lines` transactions and files are rotated once
+# they reach `max_bytes`. Receipts are taken from a `ReceiptCollector` as they are sent and dropped
+# from brownie's `history` once written, so memory stays bounded however long the run. New runs
+# continue after the highest numbered file in `directory`. Each line holds
+#
+#   test, fixture, method, sender, to, gas_used, block, timestamp, status, latency (seconds), events
+#
+# where `fixture` is set instead of `test` for transactions sent setting up a fixture and `events`
+# is a list of [name, {field: value}] of the transaction's events.
+#
+# Usage:
+#   sink = TelemetrySink('reports/telemetry')
+#   collector = ReceiptCollector()
+#   collector.processors.append(sink.add_receipt)
+#   ...
+#   collector.close()
+#   sink.close()
+#
+#   jq -c 'select(.method == "LendingPool.borrow") | .gas_used' reports/telemetry/*.jsonl
+class TelemetrySink:
+    def __init__(self, directory, buffer_lines=BUFFER_LINES, max_bytes=MAX_FILE_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.buffer_lines = buffer_lines
+        self.max_bytes = max_bytes
+        self.buffer = []
+        existing = [int(path.stem.split('-')[1]) for path in self.directory.glob('telemetry-*.jsonl')]
+        self.file_index = max(existing) + 1 if existing else 0
+        self.file = None
+        self.provider = _latency_provider()
+
+    def path(self):
+        return self.directory / 'telemetry-{:05d}.jsonl'.format(self.file_index)
+
+    # Buffer the line of receipt `tx`, `test` is the id of the test or simulation step sending it
+    # and `fixture` the fixture being set up
+    def record(self, tx, test=None, fixture=None):
+        events = []
+        if tx.status == 1:
+            for event in tx.events:
+                events.append([event.name, {key: _compact(value) for (key, value) in event.items()}])
+        line = {
+            'test': test,
+            'fixture': fixture,
+            'method': '{}.{}'.format(_contract_name(tx.contract_name), tx.fn_name) if tx.fn_name else None,
+            'sender': str(tx.sender),
+            'to': str(tx.receiver or tx.contract_address),
+            'gas_used': tx.gas_used,
+            'block': tx.block_number,
+            'timestamp': tx.timestamp,
+            'status': int(tx.status),
+            'latency': self.provider.latencies.pop(tx.txid, None),
+            'events': events,
+        }
+        if tx.status != 1:
+            line['revert_msg'] = tx.revert_msg
+        self.buffer.append(json.dumps(line, separators=(',', ':')))
+        if len(self.buffer) >= self.buffer_lines:
+            self.flush()
+
+    # Processor of a `ReceiptCollector`, records `tx` against the fixture sending it if any,
+    # otherwise the test
+    def add_receipt(self, tx, owner):
+        (test, fixture) = owner
+        self.record(tx, None if fixture else test, fixture)
+        forget_receipt(tx)
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.file is None:
+            self.file = self.path().open('a')
+        self.file.write('\n'.join(self.buffer) + '\n')
+        self.file.flush()
+        self.buffer = []
+        if self.file.tell() >= self.max_bytes:
+            self.file.close()
+            self.file = None
+            self.file_index += 1
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        # Latencies of transactions that were never recorded
+        self.provider.latencies.clear()
+
+
+# Time transaction submission on the current web3 provider, returns the `LatencyProvider`
+def _latency_provider():
+    if not isinstance(web3.provider, LatencyProvider):
+        web3.provider = LatencyProvider(web3.provider)
+    return web3.provider
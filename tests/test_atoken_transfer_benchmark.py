@@ -0,0 +1,111 @@
+from brownie import accounts
+
+from helpers import (
+    add_test_reserves, INTEREST_RATE_MODE_VARIABLE, MAX_RESERVES, setup_max_reserves, WEI,
+)
+from benchmarks import fit_multilinear, REPORTS_DIRECTORY, write_report
+from pipeline import Pipeline
+from snapshots import ChainSnapshot
+
+import json
+import pytest
+
+
+# Reserves in the market (WETH included), growing up to the max-reserves market
+ATOKEN_COST_RESERVE_COUNTS = [8, 32, 64, MAX_RESERVES + 1]
+
+# Reserves the sender uses as collateral, the first of which it also borrows from
+ATOKEN_COST_RESERVES_USED = [1, 2, 4, 8, 16, 32]
+
+ATOKEN_COST_OPERATIONS = ['transfer', 'transferFrom', 'withdraw']
+
+# Coefficients of the previous run, compared against to show regressions
+ATOKEN_COST_MODEL_PATH = REPORTS_DIRECTORY / 'atoken_cost_model.json'
+
+
+# Open the sender's position: 1 token of collateral in each of the first `used` reserves and a
+# variable borrow from the first so `balanceDecreaseAllowed()` recomputes the health factor
+def setup_footprint(lending_pool, assets, used, sender):
+    pipeline = Pipeline()
+    for asset in assets[:used]:
+        pipeline.transact(asset.mint, WEI, {'from': sender})
+        pipeline.transact(asset.approve, lending_pool, WEI, {'from': sender})
+        pipeline.transact(lending_pool.deposit, asset, WEI, sender, 0, {'from': sender})
+    pipeline.transact(lending_pool.borrow, assets[0], WEI // 1_000, INTEREST_RATE_MODE_VARIABLE, 0, sender, {'from': sender})
+    pipeline.join()
+
+
+# Gas of each operation on a fresh copy of the position, moving 1/1,000 of the first collateral
+def measure_operations(lending_pool, asset, atoken, sender, receiver, spender):
+    amount = WEI // 1_000
+    snapshot = ChainSnapshot()
+    gas = {}
+
+    gas['transfer'] = atoken.transfer(receiver, amount, {'from': sender}).gas_used
+    snapshot.revert()
+
+    atoken.approve(spender, amount, {'from': sender})
+    gas['transferFrom'] = atoken.transferFrom(sender, receiver, amount, {'from': spender}).gas_used
+    snapshot.revert()
+
+    gas['withdraw'] = lending_pool.withdraw(asset, amount, sender, {'from': sender}).gas_used
+    snapshot.revert()
+    return gas
+
+
+# Fits `gas = a + b * reservesCount + c * reservesUsedByUser` for aToken `transfer()`,
+# `transferFrom()` and `withdraw()`, which all run `GenericLogic.balanceDecreaseAllowed()`.
+# The market grows to the max-reserves market, reverting the positions between sizes.
+@pytest.mark.benchmark
+def test_atoken_transfer_cost_model():
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, assets, atokens, stable_tokens,
+    variable_tokens) = setup_max_reserves(Pipeline(), max_reserves=ATOKEN_COST_RESERVE_COUNTS[0] - 1)
+    (sender, receiver, spender) = (accounts[6], accounts[7], accounts[8])
+
+    samples = []
+    for reserves_count in ATOKEN_COST_RESERVE_COUNTS:
+        (new_assets, new_atokens, _, _) = add_test_reserves(
+            configurator, lending_pool, price_oracle, pool_admin, len(assets), reserves_count - 1 - len(assets), Pipeline()
+        )
+        assets += new_assets
+        atokens += new_atokens
+        assert len(lending_pool.getReservesList()) == reserves_count
+
+        market = ChainSnapshot()
+        for used in ATOKEN_COST_RESERVES_USED:
+            if used > len(assets):
+                continue
+            setup_footprint(lending_pool, assets, used, sender)
+            gas = measure_operations(lending_pool, assets[0], atokens[0], sender, receiver, spender)
+            samples.append((reserves_count, used, gas))
+            market.revert()
+
+    lines = ['{:>8} {:>5} '.format('Reserves', 'Used') + ' '.join('{:>12}'.format(op) for op in ATOKEN_COST_OPERATIONS)]
+    for (reserves_count, used, gas) in samples:
+        lines.append('{:>8} {:>5} '.format(reserves_count, used) + ' '.join(
+            '{:>12,}'.format(gas[op]) for op in ATOKEN_COST_OPERATIONS
+        ))
+
+    previous = json.loads(ATOKEN_COST_MODEL_PATH.read_text()) if ATOKEN_COST_MODEL_PATH.exists() else {}
+    model = {}
+    lines += ['', 'gas = a + b * reservesCount + c * reservesUsedByUser']
+    for op in ATOKEN_COST_OPERATIONS:
+        rows = [(reserves_count, used) for (reserves_count, used, _) in samples]
+        ys = [gas[op] for (_, _, gas) in samples]
+        (a, b, c) = fit_multilinear(rows, ys)
+        model[op] = {'a': a, 'b': b, 'c': c}
+        worst = max(abs(a + b * n + c * u - y) / y for ((n, u), y) in zip(rows, ys))
+        lines.append('{:<13} a = {:>9,.0f}  b = {:>7,.1f}  c = {:>8,.1f}  (max residual {:.2%})'.format(op, a, b, c, worst))
+        if op in previous:
+            lines.append('{:<13} change a {:+,.0f}  b {:+,.1f}  c {:+,.1f}'.format(
+                '', a - previous[op]['a'], b - previous[op]['b'], c - previous[op]['c']
+            ))
+
+        assert b >= 0
+        assert c > 0
+        assert worst < 0.05
+
+    write_report('atoken_cost_model', lines)
+    ATOKEN_COST_MODEL_PATH.write_text(json.dumps(model, indent=2) + '\n')
@@ -0,0 +1,84 @@
+from brownie import accounts, web3
+
+from helpers import MAX_UINT256, setup_borrow, WEI
+from checkpoint import resume, run_chunks
+from shadow_model import load_user, ShadowModel
+
+from pathlib import Path
+
+import os
+import pytest
+
+
+SIMULATION = 'test_checkpoint:DepositSimulation'
+
+# `<item>:<marker path>` makes the simulation fail once on `item`
+CRASH_ENV = 'CHECKPOINT_TEST_CRASH'
+
+
+# Random WETH deposits on behalf of a pool of local accounts, tracked in a `ShadowModel`.
+# The accounts' keys are fixed so separate runs can be compared.
+class DepositSimulation:
+    def setup(self):
+        (addresses_provider, lending_pool, configurator, collateral_manager,
+        pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+        weth_stable_debt, weth_variable_debt, strategy, depositer, deposit_amount, borrower,
+        terc20, terc20_atoken, terc20_stable_debt, terc20_variable_debt, tecr20_ltv, tecr20_threshold, tecr20_bonus,
+        terc20_deposit_amount, price) = setup_borrow()
+
+        funder = accounts[7]
+        weth.approve(lending_pool, MAX_UINT256, {'from': funder})
+        reserves = lending_pool.getReservesList()
+        return {
+            'lending_pool': lending_pool,
+            'weth': weth,
+            'weth_atoken': weth_atoken,
+            'weth_index': reserves.index(weth.address),
+            'funder': funder,
+            'users': [accounts.add(web3.keccak(text='depositor {}'.format(i)).hex()) for i in range(4)],
+            'model': ShadowModel(len(reserves)),
+        }
+
+    def step(self, state, i, rng):
+        crash = os.environ.get(CRASH_ENV)
+        if crash is not None:
+            (item, marker) = crash.split(':', 1)
+            if int(item) == i and not Path(marker).exists():
+                Path(marker).touch()
+                raise RuntimeError('Simulated crash on item {}'.format(i))
+
+        user = rng.choice(state['users'])
+        amount = rng.randint(1, 100) * WEI // 1_000
+        state['weth'].deposit({'from': state['funder'], 'value': amount})
+        state['lending_pool'].deposit(state['weth'], amount, user, 0, {'from': state['funder']})
+        load_user(state['model'], state['lending_pool'], user.address)
+
+    # Scaled aToken balance of each user in the model and on chain
+    def result(self, state):
+        return {
+            user.address: (
+                state['model'].get('scaled_atoken', state['weth_index'], user.address),
+                state['weth_atoken'].scaledBalanceOf(user),
+            )
+            for user in state['users']
+        }
+
+
+# A run killed part way resumes from its last checkpoint and ends where an uninterrupted run does
+def test_checkpoint_resume(tmp_path, monkeypatch):
+    expected = run_chunks(SIMULATION, tmp_path / 'uninterrupted', items=6, chunks=2, interval=0)
+    for result in expected:
+        assert any(model > 0 for (model, chain) in result.values())
+        for (model, chain) in result.values():
+            assert model == chain
+
+    monkeypatch.setenv(CRASH_ENV, '4:{}'.format(tmp_path / 'crashed'))
+    with pytest.raises(RuntimeError):
+        run_chunks(SIMULATION, tmp_path / 'interrupted', items=6, chunks=2, interval=0)
+    assert (tmp_path / 'crashed').exists()
+
+    assert resume(tmp_path / 'interrupted') == expected
+
+    # A different run cannot reuse the directory
+    with pytest.raises(ValueError):
+        run_chunks(SIMULATION, tmp_path / 'interrupted', items=8, chunks=2)
@@ -7,6 +7,8 @@ from brownie import (
     WETH9, WETHGateway, ZERO_ADDRESS,
 )
 import helpers
+from helpers import MARKET_BORROW_RATE
+from pipeline import Pipeline
 from Crypto.Hash import keccak
 import pytest
 
@@ -292,3 +294,25 @@ def test_deploy_weth_gateway():
 
     assert gateway.getWETHAddress() == weth9.address
     assert gateway.getLendingPoolAddress() == lending_pool.address
+
+
+# Pipelined `setup_borrow()` must produce the same market as the serial setup
+def test_setup_borrow_pipelined():
+    serial = helpers.setup_borrow()
+    pipelined = helpers.setup_borrow(Pipeline())
+
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, depositor, deposit_amount, borrower,
+    terc20, terc20_atoken, terc20_stable_debt, terc20_variable_debt, ltv, threshold, bonus,
+    terc20_deposit_amount, price) = pipelined
+
+    # Same reserves, configuration and balances
+    assert lending_pool.getReservesList() == [weth, terc20]
+    assert lending_pool.getConfiguration(weth) == serial[1].getConfiguration(serial[8])
+    assert lending_pool.getConfiguration(terc20) == serial[1].getConfiguration(serial[16])
+    assert weth_atoken.balanceOf(depositor) == deposit_amount
+    assert terc20_atoken.balanceOf(borrower) == terc20_deposit_amount
+    assert price_oracle.getAssetPrice(terc20) == price
+    assert lending_rate_oracle.getMarketBorrowRate(weth) == MARKET_BORROW_RATE
+    assert lending_pool.getUserAccountData(borrower) == serial[1].getUserAccountData(serial[15])
@@ -0,0 +1,49 @@
+from helpers import (
+    INTEREST_RATE_MODE_STABLE, INTEREST_RATE_MODE_VARIABLE, setup_borrow, upgrade_to_sigp_implementations, WEI,
+)
+from differential import run_differential
+from benchmarks import write_report
+
+
+# Borrow at both rates, repay, withdraw and transfer aTokens
+def borrow_repay_scenario(lending_pool, weth, weth_atoken, depositer, borrower):
+    return [
+        ('borrow stable', lambda market: lending_pool.borrow(
+            weth, WEI // 100, INTEREST_RATE_MODE_STABLE, 0, borrower, {'from': borrower})),
+        ('borrow variable', lambda market: lending_pool.borrow(
+            weth, WEI // 100, INTEREST_RATE_MODE_VARIABLE, 0, borrower, {'from': borrower})),
+        ('approve repay', lambda market: weth.approve(
+            lending_pool, WEI // 100, {'from': borrower})),
+        ('repay stable', lambda market: lending_pool.repay(
+            weth, WEI // 200, INTEREST_RATE_MODE_STABLE, borrower, {'from': borrower})),
+        ('repay variable', lambda market: lending_pool.repay(
+            weth, WEI // 200, INTEREST_RATE_MODE_VARIABLE, borrower, {'from': borrower})),
+        ('withdraw', lambda market: lending_pool.withdraw(
+            weth, WEI, depositer, {'from': depositer})),
+        ('transfer aToken', lambda market: weth_atoken.transfer(
+            borrower, WEI, {'from': depositer})),
+    ]
+
+
+# The sigp-contracts implementations must behave like the originals, gas differences are reported
+def test_differential_sigp_implementations():
+    market = setup_borrow()
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, depositer, deposit_amount, borrower,
+    terc20, terc20_atoken, terc20_stable_debt, terc20_variable_debt, tecr20_ltv, tecr20_threshold, tecr20_bonus,
+    terc20_deposit_amount, price) = market
+
+    scenario = borrow_repay_scenario(lending_pool, weth, weth_atoken, depositer, borrower)
+    result = run_differential(
+        market,
+        lending_pool,
+        scenario,
+        lambda market: upgrade_to_sigp_implementations(addresses_provider, lending_pool, configurator, pool_admin),
+        [depositer, borrower],
+    )
+    write_report('differential_sigp', result.report())
+
+    assert result.state_diffs == []
+    assert result.event_diffs == []
+    assert len(result.gas) == len(scenario)
@@ -0,0 +1,87 @@
+from brownie import accounts, web3
+
+from helpers import INTEREST_RATE_MODE_STABLE, INTEREST_RATE_MODE_VARIABLE, setup_borrow, WEI
+from event_index import EventIndex
+from snapshots import ChainSnapshot
+
+
+# Borrow at both rates and transfer some aTokens so every token has events to rebuild from
+def setup_event_index():
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, depositer, deposit_amount, borrower,
+    terc20, terc20_atoken, terc20_stable_debt, terc20_variable_debt, tecr20_ltv, tecr20_threshold, tecr20_bonus,
+    terc20_deposit_amount, price) = setup_borrow()
+
+    lending_pool.borrow(weth, WEI // 100, INTEREST_RATE_MODE_STABLE, 0, borrower, {'from': borrower})
+    lending_pool.borrow(weth, WEI // 100, INTEREST_RATE_MODE_VARIABLE, 0, borrower, {'from': borrower})
+    weth_atoken.transfer(accounts[6], WEI, {'from': depositer})
+
+    return (lending_pool, configurator, weth, weth_atoken, weth_stable_debt, weth_variable_debt, depositer, borrower)
+
+
+def test_event_index_queries():
+    (lending_pool, configurator, weth, weth_atoken, weth_stable_debt, weth_variable_debt,
+    depositer, borrower) = setup_event_index()
+
+    index = EventIndex(lending_pool, configurator)
+    assert index.sync() > 0
+
+    assert index.borrowers(weth) == [borrower.address]
+    borrows = index.events('Borrow')
+    assert [event['args']['borrowRateMode'] for event in borrows] == [INTEREST_RATE_MODE_STABLE, INTEREST_RATE_MODE_VARIABLE]
+    assert index.events('Borrow', from_block=borrows[1]['block_number']) == borrows[1:]
+    assert len(index.events('ReserveInitialized')) == 2
+
+    # Nothing new to ingest
+    assert index.sync() == 0
+
+
+# Batches of any size produce the same index
+def test_event_index_batches():
+    (lending_pool, configurator, weth, weth_atoken, weth_stable_debt, weth_variable_debt,
+    depositer, borrower) = setup_event_index()
+
+    index = EventIndex(lending_pool, configurator)
+    batched = EventIndex(lending_pool, configurator)
+    index.sync()
+    batched.sync(batch_size=3)
+
+    assert batched.events() == index.events()
+
+
+# Blocks rolled back by a snapshot revert are dropped on the next sync
+def test_event_index_revert():
+    (lending_pool, configurator, weth, weth_atoken, weth_stable_debt, weth_variable_debt,
+    depositer, borrower) = setup_event_index()
+
+    index = EventIndex(lending_pool, configurator)
+    snapshot = ChainSnapshot()
+    lending_pool.borrow(weth, WEI // 100, INTEREST_RATE_MODE_VARIABLE, 0, borrower, {'from': borrower})
+    index.sync()
+    assert len(index.events('Borrow')) == 3
+
+    snapshot.revert()
+    lending_pool.withdraw(weth, WEI, depositer, {'from': depositer})
+    index.sync()
+
+    assert len(index.events('Borrow')) == 2
+    assert len(index.events('Withdraw')) == 1
+    assert index.height() == web3.eth.blockNumber
+
+
+# Balances rebuilt from the token events match the chain
+def test_event_index_rebuild_balances():
+    (lending_pool, configurator, weth, weth_atoken, weth_stable_debt, weth_variable_debt,
+    depositer, borrower) = setup_event_index()
+
+    index = EventIndex(lending_pool, configurator)
+    index.sync()
+
+    for (user, scaled) in index.scaled_balances(weth_atoken).items():
+        assert scaled == weth_atoken.scaledBalanceOf(user)
+    for (user, scaled) in index.scaled_balances(weth_variable_debt).items():
+        assert scaled == weth_variable_debt.scaledBalanceOf(user)
+    for (user, principal) in index.stable_principal_balances(weth_stable_debt).items():
+        assert principal == weth_stable_debt.principalBalanceOf(user)
+    assert set(index.scaled_balances(weth_atoken)) >= {depositer.address, accounts[6].address}
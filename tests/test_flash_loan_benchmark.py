@@ -0,0 +1,126 @@
+from brownie import (
+    accounts, FlashLoanTests, MintableDelegationERC20, web3
+)
+
+from helpers import (
+    allow_reserve_collateral_and_borrowing, INTEREST_RATE_MODE_NONE, INTEREST_RATE_MODE_STABLE,
+    INTEREST_RATE_MODE_VARIABLE, MARKET_BORROW_RATE, MAX_RESERVES, setup_and_deploy_configuration_with_reserve,
+    setup_new_reserve, WEI,
+)
+from benchmarks import fit_linear, write_report
+from pipeline import Pipeline
+from snapshots import ChainSnapshot
+
+import pytest
+import time
+
+
+# Asset counts to flash loan in a single transaction
+FLASH_LOAN_ASSET_COUNTS = [1, 2, 4, 8, 16, 32, 64]
+FLASH_LOAN_MODES = [INTEREST_RATE_MODE_NONE, INTEREST_RATE_MODE_STABLE, INTEREST_RATE_MODE_VARIABLE]
+
+# Reserves created alongside WETH, up to `LendingPool.MAX_NUMBER_RESERVES`, searched for the
+# largest flash loan fitting in a block
+FLASH_LOAN_RESERVES = MAX_RESERVES
+
+
+# Gas and wall time of `flashLoan()` over 1..64 reserves with mixed modes, each from the same state.
+# Also finds the largest number of assets which fits in a block.
+@pytest.mark.benchmark
+def test_flash_loan_scaling():
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy) = setup_and_deploy_configuration_with_reserve()
+    allow_reserve_collateral_and_borrowing(configurator, weth, pool_admin)
+
+    # Flash loaner uses WETH as collateral for the debt opened by STABLE and VARIABLE modes
+    flash_loaner = accounts[6]
+    collateral_amount = 10_000 * WEI
+    weth.deposit({'from': flash_loaner, 'value': collateral_amount})
+    weth.approve(lending_pool, collateral_amount, {'from': flash_loaner})
+    lending_pool.deposit(weth, collateral_amount, flash_loaner, 0, {'from': flash_loaner})
+
+    # Contract which will `executeOperations()` in the flash loan
+    receiver = accounts[0].deploy(FlashLoanTests, lending_pool)
+
+    # Create the reserves, each with liquidity and a receiver balance to cover premiums
+    liquidity_provider = accounts[4]
+    liquidity_amount = 1_000 * WEI
+    pipeline = Pipeline()
+    assets = []
+    for i in range(FLASH_LOAN_RESERVES):
+        pipeline.deploy(MintableDelegationERC20, str(i) + " Test ERC20", str(i) + "ERC20", 18, {'from': accounts[0]})
+        asset = pipeline.join()[-1]
+        setup_new_reserve(configurator, asset, lending_pool, pool_admin, pipeline)
+        allow_reserve_collateral_and_borrowing(configurator, asset, pool_admin, pipeline=pipeline)
+        pipeline.transact(price_oracle.setAssetPrice, asset, WEI // 100, {'from': accounts[0]})
+        pipeline.transact(lending_rate_oracle.setMarketBorrowRate, asset, MARKET_BORROW_RATE, {'from': accounts[0]})
+        pipeline.transact(asset.mint, liquidity_amount, {'from': liquidity_provider})
+        pipeline.transact(asset.approve, lending_pool, liquidity_amount, {'from': liquidity_provider})
+        pipeline.transact(lending_pool.deposit, asset, liquidity_amount, liquidity_provider, 0, {'from': liquidity_provider})
+        pipeline.transact(asset.mint, WEI, {'from': accounts[0]})
+        pipeline.transact(asset.transfer, receiver, WEI, {'from': accounts[0]})
+        assets.append(asset)
+    pipeline.join()
+
+    # `flashLoan()` arguments for 1 token of each of the first `count` assets
+    def flash_loan_args(count):
+        modes = [FLASH_LOAN_MODES[i % len(FLASH_LOAN_MODES)] for i in range(count)]
+        return (receiver, assets[:count], [WEI] * count, modes, flash_loaner, b'', 0)
+
+    # Each count starts from the same state, without the debt opened by the previous ones
+    snapshot = ChainSnapshot()
+    results = []
+    for count in FLASH_LOAN_ASSET_COUNTS:
+        start = time.perf_counter()
+        tx = lending_pool.flashLoan(*flash_loan_args(count), {'from': flash_loaner})
+        wall_time = time.perf_counter() - start
+
+        assert tx.status == 1
+        assert len(tx.events['FlashLoan']) == count
+        results.append((count, tx.gas_used, wall_time))
+        snapshot.revert()
+
+    # Largest asset count whose `flashLoan()` fits in a block, binary searching the gas estimates
+    block_gas_limit = web3.eth.getBlock('latest').gasLimit
+
+    def fits(count):
+        try:
+            gas = web3.eth.estimateGas({
+                'from': flash_loaner.address,
+                'to': lending_pool.address,
+                'data': lending_pool.flashLoan.encode_input(*flash_loan_args(count)),
+            })
+        except ValueError:
+            return False
+        return gas <= block_gas_limit
+
+    if fits(len(assets)):
+        max_assets = len(assets)
+    else:
+        (low, high) = (max(FLASH_LOAN_ASSET_COUNTS), len(assets))
+        while high - low > 1:
+            middle = (low + high) // 2
+            if fits(middle):
+                low = middle
+            else:
+                high = middle
+        max_assets = low
+    (base_gas, gas_per_asset) = fit_linear([count for (count, _, _) in results], [gas for (_, gas, _) in results])
+
+    lines = ['{:>6} {:>12} {:>14} {:>10}'.format('Assets', 'Gas', 'Gas per asset', 'Wall time')]
+    for (count, gas, wall_time) in results:
+        lines.append('{:>6} {:>12,} {:>14,} {:>9.3f}s'.format(count, gas, gas // count, wall_time))
+    lines.append('')
+    lines.append('Fit: gas = {:,.0f} + {:,.0f} * assets'.format(base_gas, gas_per_asset))
+    if max_assets == len(assets):
+        lines.append('Block gas limit {:,} fits all {} reserves (modes cycling NONE, STABLE, VARIABLE)'.format(
+            block_gas_limit, max_assets
+        ))
+    else:
+        lines.append('Block gas limit {:,} fits at most {} assets (modes cycling NONE, STABLE, VARIABLE)'.format(
+            block_gas_limit, max_assets
+        ))
+    write_report('flash_loan_benchmark', lines)
+
+    assert max_assets >= max(FLASH_LOAN_ASSET_COUNTS)
@@ -0,0 +1,58 @@
+from helpers import INTEREST_RATE_MODE_STABLE, WEI, setup_borrow
+from gas_profiler import GasProfiler, INTRINSIC_FRAME, profile_transaction
+
+import pytest
+
+
+# Profile `borrow()` and check all gas is attributed, through the proxy into the libraries
+def test_profile_borrow():
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, depositor, deposit_amount, borrower,
+    terc20, terc20_atoken, terc20_stable_debt, terc20_variable_debt, ltv, threshold, bonus,
+    terc20_deposit_amount, price) = setup_borrow()
+
+    borrow_amount = terc20_deposit_amount * price // WEI // 10
+    tx = lending_pool.borrow(weth, borrow_amount, INTEREST_RATE_MODE_STABLE, 0, borrower, {'from': borrower})
+
+    stacks = profile_transaction(tx)
+    assert sum(stacks.values()) == tx.gas_used
+
+    profiler = GasProfiler()
+    profiler.add(tx)
+    functions = profiler.functions()
+    assert functions['LendingPool.borrow']['inclusive'] > functions['ValidationLogic.validateBorrow']['inclusive'] > 0
+    assert functions['GenericLogic.calculateUserAccountData']['inclusive'] > 0
+    assert functions['StableDebtToken.mint']['inclusive'] > 0
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in profiler.collapsed())
+
+
+class MockTx:
+    def __init__(self, trace, gas_used):
+        self.trace = trace
+        self.gas_used = gas_used
+
+
+def step(op, depth, jump_depth, fn, gas, gas_cost):
+    return {'op': op, 'depth': depth, 'jumpDepth': jump_depth, 'fn': fn, 'contractName': None,
+        'address': None, 'gas': gas, 'gasCost': gas_cost}
+
+
+# Call overhead is attributed to the caller and callee gas to the callee
+def test_profile_external_call():
+    trace = [
+        step('PUSH1', 0, 0, 'Proxy.fallback', 1000, 3),
+        step('DELEGATECALL', 0, 0, 'Proxy.fallback', 997, 900),
+        step('PUSH1', 1, 0, 'Pool.borrow', 800, 3),
+        step('JUMP', 1, 0, 'Pool.borrow', 797, 8),
+        step('SLOAD', 1, 1, 'Pool._validate', 789, 50),
+        step('RETURN', 1, 0, 'Pool.borrow', 739, 0),
+        step('RETURN', 0, 0, 'Proxy.fallback', 900, 0),
+    ]
+    stacks = profile_transaction(MockTx(trace, 21_200))
+
+    assert stacks[('Proxy.fallback',)] == 3 + (997 - 900) - (3 + 8 + 50)
+    assert stacks[('Proxy.fallback', 'Pool.borrow')] == 3 + 8
+    assert stacks[('Proxy.fallback', 'Pool.borrow', 'Pool._validate')] == 50
+    assert stacks[(INTRINSIC_FRAME,)] == 21_200 - 100
+    assert sum(stacks.values()) == 21_200
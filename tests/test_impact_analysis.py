@@ -0,0 +1,140 @@
+from impact_analysis import changed_files, ImpactRecorder, select_affected
+
+from pathlib import Path
+
+import json
+import subprocess
+
+
+# Stand-in for a collected pytest item
+class FakeItem:
+    def __init__(self, root, nodeid):
+        self.nodeid = nodeid
+        self.fspath = root / nodeid.split('::')[0]
+
+
+# Stand-in for a receipt, only its contract is used
+class FakeReceipt:
+    def __init__(self, contract_name):
+        self.contract_name = contract_name
+
+
+# Stand-in for `CallTargetProvider` returning no view call targets
+class FakeProvider:
+    def drain(self):
+        return set()
+
+
+def write_impact_map(path, tests):
+    path.write_text(json.dumps({
+        'tests': tests,
+        'sources': {
+            'AToken': ['contracts/protocol/tokenization/AToken.sol', 'contracts/protocol/libraries/math/WadRayMath.sol'],
+            'LendingPool': ['contracts/protocol/lendingpool/LendingPool.sol', 'contracts/protocol/libraries/math/WadRayMath.sol'],
+        },
+    }))
+
+
+def setup_items(tmp_path):
+    path = tmp_path / 'test_impact.json'
+    write_impact_map(path, {
+        'tests/test_atoken.py::test_transfer': ['AToken'],
+        'tests/test_lending_pool.py::test_deposit': ['LendingPool'],
+    })
+    items = [
+        FakeItem(tmp_path, 'tests/test_atoken.py::test_transfer'),
+        FakeItem(tmp_path, 'tests/test_lending_pool.py::test_deposit'),
+    ]
+    return (path, items)
+
+
+def nodeids(items):
+    return [item.nodeid for item in items]
+
+
+# A contract change selects the tests using it, a shared library those of every contract using it
+def test_select_affected_contract_change(tmp_path):
+    (path, items) = setup_items(tmp_path)
+
+    (selected, deselected) = select_affected(items, ['contracts/protocol/tokenization/AToken.sol'], path, tmp_path)
+    assert nodeids(selected) == ['tests/test_atoken.py::test_transfer']
+    assert nodeids(deselected) == ['tests/test_lending_pool.py::test_deposit']
+
+    (selected, deselected) = select_affected(items, ['contracts/protocol/libraries/math/WadRayMath.sol'], path, tmp_path)
+    assert nodeids(selected) == nodeids(items)
+    assert deselected == []
+
+
+# A changed test file selects only its own tests
+def test_select_affected_test_file(tmp_path):
+    (path, items) = setup_items(tmp_path)
+
+    (selected, deselected) = select_affected(items, ['tests/test_lending_pool.py'], path, tmp_path)
+    assert nodeids(selected) == ['tests/test_lending_pool.py::test_deposit']
+    assert nodeids(deselected) == ['tests/test_atoken.py::test_transfer']
+
+
+# Helpers, fixtures and configuration may change any test
+def test_select_affected_other_change(tmp_path):
+    (path, items) = setup_items(tmp_path)
+
+    for changed in (['tests/helpers.py'], ['tests/conftest.py', 'tests/test_atoken.py'], ['brownie-config.yaml']):
+        (selected, deselected) = select_affected(items, changed, path, tmp_path)
+        assert nodeids(selected) == nodeids(items)
+        assert deselected == []
+
+
+# Tests missing from the map, or a missing map, are always selected
+def test_select_affected_unknown(tmp_path):
+    (path, items) = setup_items(tmp_path)
+    items.append(FakeItem(tmp_path, 'tests/test_new.py::test_new'))
+
+    (selected, deselected) = select_affected(items, ['contracts/protocol/tokenization/AToken.sol'], path, tmp_path)
+    assert nodeids(selected) == ['tests/test_atoken.py::test_transfer', 'tests/test_new.py::test_new']
+
+    (selected, deselected) = select_affected(items, ['contracts/protocol/tokenization/AToken.sol'], tmp_path / 'missing.json', tmp_path)
+    assert nodeids(selected) == nodeids(items)
+    assert deselected == []
+
+
+# Files changed in a diff range of the repository in the working directory
+def test_changed_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    git = ['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com']
+    subprocess.check_call(git + ['init', '-q'])
+    for (name, text) in (('contracts/A.sol', 'a'), ('tests/helpers.py', 'b')):
+        Path(name).parent.mkdir(exist_ok=True)
+        Path(name).write_text(text)
+    subprocess.check_call(git + ['add', '.'])
+    subprocess.check_call(git + ['commit', '-q', '-m', 'first'])
+    Path('contracts/A.sol').write_text('changed')
+    subprocess.check_call(git + ['commit', '-q', '-am', 'second'])
+
+    assert changed_files('HEAD~1') == ['contracts/A.sol']
+    assert changed_files('HEAD~1..HEAD') == ['contracts/A.sol']
+
+
+# Contracts sent to by higher scoped fixtures go to every test requesting them, those sent by
+# function scoped fixtures and the test itself only to the test
+def test_impact_recorder():
+    recorder = ImpactRecorder(FakeProvider())
+
+    recorder.add_receipt(FakeReceipt('LendingPool'), (None, '_market'))
+    recorder.add_receipt(FakeReceipt('WETH9'), ('test_a', 'weth'))
+    recorder.start('test_a', ['_market'])
+    recorder.add_receipt(FakeReceipt('AToken'), ('test_a', None))
+    recorder.record('test_a')
+
+    recorder.start('test_b', ['_market'])
+    recorder.record('test_b')
+
+    recorder.start('test_c', [])
+    recorder.add_receipt(FakeReceipt(None), ('test_c', None))
+    recorder.record('test_c')
+
+    assert recorder.fixtures == {'_market': {'LendingPool'}}
+    assert recorder.tests == {
+        'test_a': {'LendingPool', 'WETH9', 'AToken'},
+        'test_b': {'LendingPool'},
+        'test_c': set(),
+    }
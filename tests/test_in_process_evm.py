@@ -0,0 +1,63 @@
+from brownie import accounts, chain, LendingPoolAddressesProvider, reverts, web3
+
+from snapshots import ChainSnapshot
+
+import pytest
+
+
+# These tests cover the Ganache RPC extensions of the in-process backend
+@pytest.fixture(autouse=True)
+def in_process_evm(evm_backend):
+    if evm_backend != 'eth-tester':
+        pytest.skip('requires --evm-backend eth-tester')
+
+
+# `evm_snapshot` and `evm_revert` roll back transactions and blocks, repeatedly
+def test_in_process_evm_snapshot_revert():
+    balance = accounts[1].balance()
+    snapshot = ChainSnapshot()
+    height = chain.height
+
+    for _ in range(2):
+        accounts[0].transfer(accounts[1], 10**18)
+        assert accounts[1].balance() == balance + 10**18
+        assert chain.height == height + 1
+
+        snapshot.revert()
+        assert accounts[1].balance() == balance
+        assert chain.height == height
+
+
+# `evm_increaseTime` moves the clock of the next blocks, `evm_mine` with a timestamp mines at it
+def test_in_process_evm_increase_time_mine():
+    start = web3.eth.getBlock('latest').timestamp
+
+    web3.manager.request_blocking('evm_increaseTime', [1000])
+    web3.manager.request_blocking('evm_mine', [])
+    assert web3.eth.getBlock('latest').timestamp >= start + 1000
+
+    # As sent by the tests, without a parameter list
+    start = web3.eth.getBlock('latest').timestamp
+    web3.manager.request_blocking('evm_increaseTime', 1000)
+    web3.manager.request_blocking('evm_mine', [])
+    assert web3.eth.getBlock('latest').timestamp >= start + 1000
+
+    timestamp = web3.eth.getBlock('latest').timestamp + 5000
+    web3.manager.request_blocking('evm_mine', [timestamp])
+    assert web3.eth.getBlock('latest').timestamp == timestamp
+
+    web3.manager.request_blocking('evm_mine', [])
+    assert web3.eth.getBlock('latest').timestamp >= timestamp
+
+
+# Reverting transactions are mined and report their reason as Ganache does, as do calls
+def test_in_process_evm_revert_reason():
+    addresses_provider = accounts[0].deploy(LendingPoolAddressesProvider)
+    nonce = accounts[5].nonce
+
+    with reverts("Ownable: caller is not the owner"):
+        addresses_provider.setLendingPoolImpl(accounts[1], {'from': accounts[5]})
+    assert accounts[5].nonce == nonce + 1
+
+    with reverts("Ownable: caller is not the owner"):
+        addresses_provider.setLendingPoolImpl.call(accounts[1], {'from': accounts[5]})
@@ -15,6 +15,7 @@ from helpers import (
     calculate_compound_interest, RAY_DIV_WAD, calculate_linear_interest, calculate_overall_borrow_rate,
     calculate_overall_stable_rate, percent_mul, setup_borrow, percent_div,
 )
+from batch_reads import batch_reads
 
 import pytest
 import time
@@ -111,15 +112,18 @@ def test_deposits_no_collateral_and_borrowings():
     assert tx.events['Transfer'][1]['dst'] == atoken
     assert tx.events['Transfer'][1]['wad'] == deposit_amount
 
-    # Check `AToken` state
-    assert atoken.balanceOf(depositor) == deposit_amount
-    assert atoken.scaledBalanceOf(depositor) == deposit_amount
-    assert atoken.totalSupply() == deposit_amount
+    # Check `AToken` and `LendingPool` state (reads are sent as a single batch)
+    with batch_reads() as r:
+        r.expect(atoken.balanceOf, depositor, equals=deposit_amount)
+        r.expect(atoken.scaledBalanceOf, depositor, equals=deposit_amount)
+        r.expect(atoken.totalSupply, equals=deposit_amount)
+        user_config = r.call(lending_pool.getUserConfiguration, depositor)
+        account_data = r.call(lending_pool.getUserAccountData, depositor)
 
     # Check `LendingPool` state
-    (userConfig,) = lending_pool.getUserConfiguration(depositor)
+    (userConfig,) = user_config.value
     assert userConfig == 2**(0 * 2 + 1) # Collateral for reserve index 0
-    (total_collateral, total_debt, available_borrow, current_threshold, current_ltv, health_factor) = lending_pool.getUserAccountData(depositor)
+    (total_collateral, total_debt, available_borrow, current_threshold, current_ltv, health_factor) = account_data.value
     assert total_debt == 0
     assert current_ltv == ltv
     assert total_collateral == deposit_amount
@@ -4924,87 +4928,14 @@ def test_only_lending_pool_configurator():
 
 # Tests when there is 128 reserves
 @pytest.mark.skip()
-def test_max_reserves():
-    # Deploy and initialize contracts (initializes a weth reserve)
+def test_max_reserves(max_reserves_market_with_positions):
+    # 128 reserves with alice deposits in all reserves and bob deposits in the first reserve then borrows
     (addresses_provider, lending_pool, configurator, collateral_manager,
     pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
-    weth_stable_debt, weth_variable_debt, strategy) = setup_and_deploy_configuration_with_reserve()
-
-    # Users
-    alice = accounts[6] # deposits in all reserves
-    bob = accounts[7] # deposits in first reserve then borrows, withdraws and repays
-
-    # Create reserves and have alice
-    max_reserves = 127
-    price = WEI # 1 tERC20 : 1 ETH
-    alice_deposit_amount = WEI
-    assets = []
-    atokens = []
-    stable_tokens = []
-    variable_tokens = []
-    for i in range(max_reserves):
-        # Add additional reserve
-        assets.append(
-            accounts[0].deploy(
-                MintableDelegationERC20,
-                str(i) + " Test ERC20",
-                str(i) + "ERC20",
-                18,
-            )
-        )
-
-        # Initialise reserve ERC20
-        (terc20_atoken, terc20_stable_debt, terc20_variable_debt) = setup_new_reserve(configurator, assets[i], lending_pool, pool_admin)
-
-        atokens.append(terc20_atoken)
-        stable_tokens.append(terc20_stable_debt)
-        variable_tokens.append(terc20_variable_debt)
-
-        # Turn on collateral and borrowing
-        allow_reserve_collateral_and_borrowing(configurator, assets[i], pool_admin)
-
-        # Setup price for tERC20
-        if (i == 0):
-            price_oracle.setAssetPrice(assets[i], price * 1_000, {'from': accounts[0]})
-        else:
-            price_oracle.setAssetPrice(assets[i], price, {'from': accounts[0]})
-
-        # Deposit in reserve for Alice
+    weth_stable_debt, weth_variable_debt, strategy, assets, atokens, stable_tokens, variable_tokens,
+    alice, alice_deposit_amount, bob, bob_deposit_amount, bob_borrow_amount) = max_reserves_market_with_positions
 
-        assets[i].mint(alice_deposit_amount, {'from': alice})
-        assets[i].approve(lending_pool, alice_deposit_amount, {'from': alice})
-        lending_pool.deposit(assets[i], alice_deposit_amount, alice, 0, {'from': alice})
-
-    # Deposit in first reserve for Bob
-    bob_deposit_amount = WEI
-    assets[0].mint(bob_deposit_amount, {'from': bob})
-    assets[0].approve(lending_pool, bob_deposit_amount, {'from': bob})
-    lending_pool.deposit(assets[0], bob_deposit_amount, bob, 0, {'from': bob})
-
-    # Bob borrows
-    bob_borrow_amount = bob_deposit_amount // 10_000
-    for i in range(1, max_reserves):
-        # Stable
-        lending_pool.borrow(
-            assets[i],
-            bob_borrow_amount,
-            INTEREST_RATE_MODE_STABLE,
-            0,
-            bob,
-            {'from': bob},
-        )
-
-        # Variable
-        lending_pool.borrow(
-            assets[i],
-            bob_borrow_amount,
-            INTEREST_RATE_MODE_VARIABLE,
-            0,
-            bob,
-            {'from': bob},
-        )
-
-    # Bob `borrow()`
+    # Bob `withdraw()`
     bob_withdraw_amount = bob_deposit_amount // 10_000
     lending_pool.withdraw(
         assets[0],
@@ -5036,3 +4967,58 @@ def test_max_reserves():
         bob,
         {'from': bob},
     )
+
+
+# Alice's deposit in every tERC20 reserve and Bob's deposit and borrows, as built by
+# `setup_max_reserves_positions()`, and nobody else's
+def check_max_reserves_positions(market):
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, assets, atokens, stable_tokens, variable_tokens,
+    alice, alice_deposit_amount, bob, bob_deposit_amount, bob_borrow_amount) = market
+
+    with batch_reads() as r:
+        r.expect(atokens[0].balanceOf, alice, equals=alice_deposit_amount)
+        r.expect(atokens[0].balanceOf, bob, equals=bob_deposit_amount)
+        r.expect(atokens[0].balanceOf, accounts[5], equals=0)
+        alice_balances = [r.call(atoken.balanceOf, alice) for atoken in atokens[1:]]
+        stable_debts = [r.call(stable_token.principalBalanceOf, bob) for stable_token in stable_tokens[1:]]
+        variable_debts = [r.call(variable_token.scaledBalanceOf, bob) for variable_token in variable_tokens[1:]]
+
+    # Borrowed reserves earn interest for Alice, the debt tokens hold what Bob borrowed
+    assert min(balance.value for balance in alice_balances) >= alice_deposit_amount
+    assert [debt.value for debt in stable_debts] == [bob_borrow_amount] * len(stable_debts)
+    assert min(debt.value for debt in variable_debts) > 0
+
+
+# Changes to the positions of the shared max reserves market are dropped for the next test
+def test_max_reserves_market_positions(max_reserves_market_with_positions):
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, assets, atokens, stable_tokens, variable_tokens,
+    alice, alice_deposit_amount, bob, bob_deposit_amount, bob_borrow_amount) = max_reserves_market_with_positions
+    check_max_reserves_positions(max_reserves_market_with_positions)
+
+    lending_pool.withdraw(assets[1], alice_deposit_amount // 2, alice, {'from': alice})
+
+
+# Reverting to the market without positions leaves every reserve empty
+def test_max_reserves_market_revert(max_reserves_market):
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, assets, atokens, stable_tokens, variable_tokens) = max_reserves_market
+
+    assert lending_pool.getReservesList() == [weth.address] + [asset.address for asset in assets]
+    with batch_reads() as r:
+        for token in atokens + stable_tokens + variable_tokens:
+            r.expect(token.totalSupply, equals=0)
+
+    # Dirty the market, the positions rebuilt for the next test must not include this
+    assets[0].mint(WEI, {'from': accounts[5]})
+    assets[0].approve(lending_pool, WEI, {'from': accounts[5]})
+    lending_pool.deposit(assets[0], WEI, accounts[5], 0, {'from': accounts[5]})
+
+
+# The positions are rebuilt after a test used the market without them
+def test_max_reserves_market_positions_rebuilt(max_reserves_market_with_positions):
+    check_max_reserves_positions(max_reserves_market_with_positions)
@@ -0,0 +1,101 @@
+from brownie import accounts
+
+from helpers import INTEREST_RATE_MODE_VARIABLE, MAX_UINT256, setup_borrow, WEI
+from liquidation_bot import LiquidationBot
+from benchmarks import write_report
+from pipeline import Pipeline
+
+import pytest
+
+
+# Borrower counts for the latency benchmark
+LIQUIDATION_BOT_BORROWERS = [100, 1_000, 10_000]
+
+
+# A market where each of `count` new accounts deposits 1 tERC20 (0.1 ETH) and borrows 0.025 ETH
+# of WETH, or `healthy_borrow` for the accounts in `healthy`.
+# Borrowers are local accounts, development gas is free so they need no ETH.
+def setup_liquidation_market(count, healthy=(), healthy_borrow=WEI // 1_000):
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, depositer, deposit_amount, borrower,
+    terc20, terc20_atoken, terc20_stable_debt, terc20_variable_debt, tecr20_ltv, tecr20_threshold, tecr20_bonus,
+    terc20_deposit_amount, price) = setup_borrow()
+
+    collateral = WEI
+    borrow_amount = collateral * price // WEI // 4
+    borrowers = [accounts.add() for _ in range(count)]
+
+    # WETH liquidity for the borrows and the liquidator's repayments
+    whale = accounts[8]
+    liquidator = accounts[9]
+    weth.deposit({'from': whale, 'value': count * borrow_amount})
+    weth.approve(lending_pool, MAX_UINT256, {'from': whale})
+    lending_pool.deposit(weth, count * borrow_amount, whale, 0, {'from': whale})
+    weth.deposit({'from': liquidator, 'value': count * borrow_amount})
+
+    funder = accounts[7]
+    terc20.mint(count * collateral, {'from': funder})
+    terc20.approve(lending_pool, count * collateral, {'from': funder})
+
+    pipeline = Pipeline()
+    for user in borrowers:
+        pipeline.transact(lending_pool.deposit, terc20, collateral, user, 0, {'from': funder})
+    pipeline.join()
+    for (i, user) in enumerate(borrowers):
+        amount = healthy_borrow if i in healthy else borrow_amount
+        pipeline.transact(lending_pool.borrow, weth, amount, INTEREST_RATE_MODE_VARIABLE, 0, user, {'from': user})
+    pipeline.join()
+
+    return (lending_pool, price_oracle, weth, terc20, price, borrowers, liquidator)
+
+
+# The bot's health factors match the chain and only underwater borrowers are liquidated
+def test_liquidation_bot():
+    (lending_pool, price_oracle, weth, terc20, price, borrowers, liquidator) = setup_liquidation_market(
+        3, healthy=[1]
+    )
+    bot = LiquidationBot(lending_pool, liquidator)
+    bot.approve()
+    bot.watch(borrowers)
+
+    # 0.04 ETH collateral at a 50% threshold against 0.025 ETH of debt
+    price_oracle.setAssetPrice(terc20, price * 4 // 10, {'from': accounts[0]})
+    receipts = bot.on_price_update([terc20.address])
+
+    liquidated = {tx.events['LiquidationCall']['user'] for tx in receipts}
+    assert liquidated == {borrowers[0].address, borrowers[2].address}
+    for tx in receipts:
+        assert tx.events['LiquidationCall']['debtAsset'] == weth.address
+        assert tx.events['LiquidationCall']['collateralAsset'] == terc20.address
+
+    # Positions are refreshed after liquidating, interest may have accrued for a second since
+    for user in borrowers:
+        (collateral, debt, ltv, threshold, health_factor) = bot.account_data(user.address)
+        data = lending_pool.getUserAccountData(user)
+        assert (collateral, ltv, threshold) == (data[0], data[4], data[3])
+        assert abs(debt - data[1]) <= data[1] // 1_000_000
+        assert abs(health_factor - data[5]) <= data[5] // 1_000_000
+
+
+# Time from a price change to every liquidation landing
+@pytest.mark.benchmark
+def test_liquidation_bot_latency():
+    lines = ['{:>9} {:>11} {:>8} {:>8} {:>8} {:>8}'.format(
+        'Borrowers', 'Liquidated', 'Detect', 'Submit', 'Land', 'Total'
+    )]
+    for count in LIQUIDATION_BOT_BORROWERS:
+        (lending_pool, price_oracle, weth, terc20, price, borrowers, liquidator) = setup_liquidation_market(count)
+        bot = LiquidationBot(lending_pool, liquidator)
+        bot.approve()
+        bot.watch(borrowers)
+
+        price_oracle.setAssetPrice(terc20, price * 4 // 10, {'from': accounts[0]})
+        receipts = bot.on_price_update([terc20.address])
+        assert len(receipts) == count
+
+        timings = bot.timings
+        lines.append('{:>9,} {:>11,} {:>7.2f}s {:>7.2f}s {:>7.2f}s {:>7.2f}s'.format(
+            count, len(receipts), timings['detect'], timings['submit'], timings['land'], timings['total']
+        ))
+    write_report('liquidation_bot', lines)
@@ -0,0 +1,101 @@
+from brownie import accounts
+
+from helpers import (
+    calculate_max_liquidatable_debt, HEALTH_FACTOR_LIQUIDATION_THRESHOLD, INTEREST_RATE_MODE_VARIABLE,
+    MAX_UINT256, setup_borrow, WEI,
+)
+from liquidation_bot import position_account_data
+from liquidation_prices import (
+    close_factor_price, liquidation_prices, read_positions, reserves_with_price, stop_interest,
+    verify_liquidation_price,
+)
+from snapshots import ChainSnapshot
+
+
+# The exact price of each asset at which each position becomes liquidatable, checked on chain
+# 1 wei either side
+def test_liquidation_prices():
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, depositor, deposit_amount, borrower,
+    terc20, terc20_atoken, terc20_stable_debt, terc20_variable_debt, ltv, threshold, bonus,
+    terc20_deposit_amount, price) = setup_borrow()
+    stop_interest(configurator, [weth, terc20], pool_admin)
+
+    # `borrower` has tERC20 collateral and WETH debt
+    borrow_amount = terc20_deposit_amount * price // WEI // 10 # 10% of collateral in ETH
+    lending_pool.borrow(weth, borrow_amount, INTEREST_RATE_MODE_VARIABLE, 0, borrower, {'from': borrower})
+
+    # `user` has WETH collateral and tERC20 debt
+    user = accounts[6]
+    weth.deposit({'from': user, 'value': WEI // 10})
+    weth.approve(lending_pool, WEI // 10, {'from': user})
+    lending_pool.deposit(weth, WEI // 10, user, 0, {'from': user})
+    lending_pool.borrow(terc20, terc20_deposit_amount // 5, INTEREST_RATE_MODE_VARIABLE, 0, user, {'from': user})
+
+    (positions, reserves) = read_positions(lending_pool, [borrower, user])
+    prices = liquidation_prices(positions, reserves)
+
+    assert set(prices[borrower.address]) == {terc20.address, weth.address}
+    assert set(prices[user.address]) == {terc20.address, weth.address}
+    # Collateral is liquidatable below its boundary, debt above it
+    assert prices[borrower.address][terc20.address][0] < prices[borrower.address][terc20.address][1]
+    assert prices[borrower.address][weth.address][0] > prices[borrower.address][weth.address][1]
+    assert prices[user.address][weth.address][0] < prices[user.address][weth.address][1]
+    assert prices[user.address][terc20.address][0] > prices[user.address][terc20.address][1]
+
+    snapshot = ChainSnapshot()
+    for (owner, boundaries) in prices.items():
+        for (asset, (liquidatable, safe)) in boundaries.items():
+            (safe_health, liquidatable_health) = verify_liquidation_price(
+                lending_pool, price_oracle, owner, asset, liquidatable, safe, accounts[0]
+            )
+            assert safe_health >= HEALTH_FACTOR_LIQUIDATION_THRESHOLD
+            assert liquidatable_health < HEALTH_FACTOR_LIQUIDATION_THRESHOLD
+            assert liquidatable_health == position_account_data(
+                positions[owner], reserves_with_price(reserves, asset, liquidatable)
+            )[4]
+            snapshot.revert()
+
+
+# The tERC20 price below which liquidating `borrower` seizes all of its collateral for less than
+# the close factor of its debt
+def test_close_factor_price():
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, depositor, deposit_amount, borrower,
+    terc20, terc20_atoken, terc20_stable_debt, terc20_variable_debt, ltv, threshold, bonus,
+    terc20_deposit_amount, price) = setup_borrow()
+    stop_interest(configurator, [weth, terc20], pool_admin)
+
+    borrow_amount = terc20_deposit_amount * price // WEI // 10 # 10% of collateral in ETH
+    lending_pool.borrow(weth, borrow_amount, INTEREST_RATE_MODE_VARIABLE, 0, borrower, {'from': borrower})
+
+    liquidator = accounts[7]
+    weth.deposit({'from': liquidator, 'value': WEI})
+    weth.approve(lending_pool, MAX_UINT256, {'from': liquidator})
+
+    (positions, reserves) = read_positions(lending_pool, [borrower])
+    position = positions[borrower.address]
+    collateral = position[terc20.address][0]
+    max_debt = calculate_max_liquidatable_debt(0, position[weth.address][2])
+    (capped, full) = close_factor_price(position, reserves, terc20.address, weth.address)
+    assert capped + 1 == full
+
+    # Both prices are far below the health factor boundary
+    (liquidatable, _) = liquidation_prices(positions, reserves)[borrower.address][terc20.address]
+    assert full < liquidatable
+
+    snapshot = ChainSnapshot()
+    events = {}
+    for terc20_price in (capped, full):
+        price_oracle.setAssetPrice(terc20, terc20_price, {'from': accounts[0]})
+        tx = lending_pool.liquidationCall(terc20, weth, borrower, MAX_UINT256, False, {'from': liquidator})
+        events[terc20_price] = tx.events['LiquidationCall']
+        snapshot.revert()
+
+    # Full close factor at `full`, every tERC20 of `borrower` for less at `capped`
+    assert events[full]['debtToCover'] == max_debt
+    assert events[full]['liquidatedCollateralAmount'] < collateral
+    assert events[capped]['debtToCover'] < max_debt
+    assert events[capped]['liquidatedCollateralAmount'] == collateral
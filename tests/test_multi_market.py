@@ -0,0 +1,100 @@
+from brownie import web3
+
+from multi_market import (
+    market_state, MARKET_OPERATIONS, provider_list_gas, PROVIDER_LIST_COUNTS, run_concurrent,
+    setup_markets, USER_DEPOSIT,
+)
+from benchmarks import fit_linear, write_report
+from pipeline import Pipeline
+from snapshots import ChainSnapshot
+from tiers import scaled
+
+import pytest
+import time
+
+
+# Market counts for the scaling benchmark
+MULTI_MARKET_COUNTS = [1, 2, 4, 8]
+
+
+# Markets registered in one registry and driven concurrently leave each other untouched
+def test_multi_market():
+    (registry, markets) = setup_markets(3, Pipeline())
+
+    assert registry.getAddressesProvidersList() == [market['addresses_provider'] for market in markets]
+    for market in markets:
+        assert registry.getAddressesProviderIdByAddress(market['addresses_provider']) == market['id']
+
+    # Drive the first and last markets, leave the middle one idle
+    (first, idle, last) = markets
+    idle_state = market_state(idle)
+    results = run_concurrent([first, last], rounds=2)
+
+    assert market_state(idle) == idle_state
+    for gas in results:
+        for operation in MARKET_OPERATIONS:
+            assert len(gas[operation]) == 2 * len(first['users'])
+            assert min(gas[operation]) > 0
+
+    # A deposit in one market is only collateral in that market
+    user = first['users'][0]
+    first['weth'].deposit({'from': user, 'value': USER_DEPOSIT})
+    first['weth'].approve(first['lending_pool'], USER_DEPOSIT, {'from': user})
+    first['lending_pool'].deposit(first['weth'], USER_DEPOSIT, user, 0, {'from': user})
+    assert first['lending_pool'].getUserAccountData(user)[0] == USER_DEPOSIT
+    for market in (idle, last):
+        assert market['lending_pool'].getUserAccountData(user)[0] == 0
+
+
+# Per-market gas and wall time of concurrent traffic as the number of markets grows, then the cost
+# of `getAddressesProvidersList()` as the registry grows until the list no longer fits in a block
+@pytest.mark.benchmark
+def test_multi_market_scaling():
+    (registry, markets) = setup_markets(max(MULTI_MARKET_COUNTS), Pipeline())
+    rounds = scaled(5)
+    snapshot = ChainSnapshot()
+
+    lines = ['{} rounds of {} per user, {} users per market'.format(
+        rounds, ', '.join(MARKET_OPERATIONS), len(markets[0]['users'])
+    ), '']
+    lines.append('{:>7} {:>7} {:>9} '.format('Markets', 'Threads', 'Time') + ' '.join(
+        '{:>10}'.format(operation) for operation in MARKET_OPERATIONS
+    ))
+    for count in MULTI_MARKET_COUNTS:
+        for threads in sorted({1, count}):
+            start = time.perf_counter()
+            results = run_concurrent(markets[:count], rounds, threads)
+            elapsed = time.perf_counter() - start
+            snapshot.revert()
+
+            # Mean gas of each operation over all markets, each market's own mean must match it
+            means = {}
+            for operation in MARKET_OPERATIONS:
+                market_means = [sum(gas[operation]) / len(gas[operation]) for gas in results]
+                means[operation] = sum(market_means) / count
+                assert max(abs(mean - means[operation]) for mean in market_means) < 0.05 * means[operation]
+            lines.append('{:>7} {:>7} {:>8.2f}s '.format(count, threads, elapsed) + ' '.join(
+                '{:>10,.0f}'.format(means[operation]) for operation in MARKET_OPERATIONS
+            ))
+
+    rows = provider_list_gas(registry, PROVIDER_LIST_COUNTS)
+    block_gas_limit = web3.eth.getBlock('latest').gasLimit
+    lines += ['', '{:>9} {:>12} {:>12}'.format('Providers', 'List gas', 'Register gas')]
+    for (size, list_gas, register_gas) in rows:
+        lines.append('{:>9,} {:>12,} {:>12,}'.format(size, list_gas, register_gas))
+
+    # `test_registry_register_max()` reaches a 1,000,000 gas call at 455 providers, well within a block,
+    # so the first sizes above the market count fit and give a line
+    sizes = [count for count in PROVIDER_LIST_COUNTS if count > len(markets)]
+    assert [size for (size, _, _) in rows][:3] == sizes[:3], 'registry sizes fitting in a block: {}'.format(
+        [size for (size, _, _) in rows]
+    )
+    (a, b) = fit_linear([size for (size, _, _) in rows], [list_gas for (_, list_gas, _) in rows])
+    lines += [
+        '',
+        'getAddressesProvidersList() gas = {:,.0f} + {:,.1f} * providers'.format(a, b),
+        'Largest list fitting in a {:,} gas block: {:,.0f} providers'.format(block_gas_limit, (block_gas_limit - a) / b),
+    ]
+    write_report('multi_market', lines)
+
+    assert b > 0
@@ -0,0 +1,91 @@
+from brownie import accounts, AaveOracle
+
+from helpers import INTEREST_RATE_MODE_VARIABLE, MAX_UINT256, setup_borrow, WEI
+from price_replay import AaveOracleFeed, liquidator_action, load_price_series, PriceOracleFeed, replay_prices
+
+
+# tERC20 falls from 0.1 ETH, the borrower becomes liquidatable below 0.02 ETH
+PRICE_SERIES = '\n'.join([
+    'block,tERC20,WETH',
+    '0,0.1,1',
+    '1,0.08,',
+    '2,0.06,',
+    '3,0.06,',
+    '4,0.03,',
+    '5,0.025,',
+    '6,0.015,',
+    '7,0.0125,',
+])
+FIRST_LIQUIDATABLE_BLOCK = 6
+
+
+# Borrow 10% of the tERC20 collateral's value in WETH and fund a liquidator
+def setup_price_replay():
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, depositer, deposit_amount, borrower,
+    terc20, terc20_atoken, terc20_stable_debt, terc20_variable_debt, tecr20_ltv, tecr20_threshold, tecr20_bonus,
+    terc20_deposit_amount, price) = setup_borrow()
+
+    borrow_amount = terc20_deposit_amount * price // WEI // 10
+    lending_pool.borrow(weth, borrow_amount, INTEREST_RATE_MODE_VARIABLE, 0, borrower, {'from': borrower})
+
+    liquidator = accounts[6]
+    weth.deposit({'from': liquidator, 'value': WEI})
+    weth.approve(lending_pool, MAX_UINT256, {'from': liquidator})
+
+    return (addresses_provider, lending_pool, price_oracle, weth, terc20, borrower, liquidator)
+
+
+def test_load_price_series(tmp_path):
+    path = tmp_path / 'prices.csv'
+    path.write_text(PRICE_SERIES)
+
+    series = load_price_series(path)
+
+    assert len(series) == 8
+    assert series[0] == (0, {'tERC20': WEI // 10, 'WETH': WEI})
+    assert series[1] == (1, {'tERC20': 8 * WEI // 100})
+    assert series[3] == (3, {}) # unchanged prices are not pushed again
+
+
+# Replaying into `PriceOracle` liquidates the borrower once the price crosses the threshold
+def test_replay_price_oracle(tmp_path):
+    path = tmp_path / 'prices.csv'
+    path.write_text(PRICE_SERIES)
+    (addresses_provider, lending_pool, price_oracle, weth, terc20, borrower, liquidator) = setup_price_replay()
+
+    feed = PriceOracleFeed(price_oracle, {'tERC20': terc20, 'WETH': weth}, accounts[0])
+    liquidate = liquidator_action(lending_pool, liquidator, terc20, weth, [borrower])
+    steps = replay_prices(load_price_series(path), feed, [liquidate], seconds_per_block=15)
+
+    liquidated_blocks = [block for (block, updates, [liquidations]) in steps if liquidations]
+    assert liquidated_blocks[0] == FIRST_LIQUIDATABLE_BLOCK
+    assert price_oracle.getAssetPrice(terc20) == 125 * WEI // 10_000
+    for (block, updates, [liquidations]) in steps:
+        for tx in liquidations:
+            assert tx.events['LiquidationCall']['user'] == borrower
+
+
+# Replaying into `AaveOracle` swaps in new aggregators, one `setAssetSources()` per block
+def test_replay_aave_oracle(tmp_path):
+    path = tmp_path / 'prices.csv'
+    path.write_text(PRICE_SERIES)
+    (addresses_provider, lending_pool, price_oracle, weth, terc20, borrower, liquidator) = setup_price_replay()
+
+    aave_oracle = accounts[0].deploy(AaveOracle, [], [], price_oracle, weth)
+    addresses_provider.setPriceOracle(aave_oracle, {'from': accounts[0]})
+
+    feed = AaveOracleFeed(aave_oracle, {'tERC20': terc20, 'WETH': weth}, accounts[0])
+    liquidate = liquidator_action(lending_pool, liquidator, terc20, weth, [borrower])
+    steps = replay_prices(load_price_series(path), feed, [liquidate])
+
+    (block, updates, results) = steps[1]
+    assert len(updates) == 2 # one aggregator and `setAssetSources()`
+    assert updates[-1].events['AssetSourceUpdated']['source'] == updates[0]
+    assert steps[3][1] == []
+
+    liquidated_blocks = [block for (block, updates, [liquidations]) in steps if liquidations]
+    assert liquidated_blocks[0] == FIRST_LIQUIDATABLE_BLOCK
+    assert aave_oracle.getAssetPrice(terc20) == 125 * WEI // 10_000
+    assert aave_oracle.getAssetPrice(weth) == WEI
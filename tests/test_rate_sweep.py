@@ -0,0 +1,51 @@
+from helpers import calculate_variable_borrow_rate, RAY
+from rate_sweep import run_sweep, strategy_grid, sweep_report, WORKLOAD_UTILIZATIONS
+from benchmarks import write_report
+
+import pytest
+import time
+
+
+# Each configuration's rates follow its own curve and a steeper second slope earns more
+def test_rate_sweep():
+    grid = strategy_grid(
+        optimal_utilization_rate=[2 * RAY // 10, 8 * RAY // 10],
+        variable_rate_slope_2=[5 * RAY // 100, 50 * RAY // 100],
+    )
+    results = run_sweep(grid, processes=2)
+
+    assert [result['params'] for result in results] == grid
+    for result in results:
+        params = result['params']
+        assert [step['target'] for step in result['steps']] == WORKLOAD_UTILIZATIONS
+        for step in result['steps']:
+            assert step['variable_rate'] == calculate_variable_borrow_rate(
+                params['base_variable_borrow_rate'],
+                params['variable_rate_slope_1'],
+                params['variable_rate_slope_2'],
+                step['utilization'],
+                params['optimal_utilization_rate'],
+            )
+        assert result['treasury_income'] > 0
+        assert result['depositor_income'] > 0
+
+    # Same optimal utilization, steeper slope 2
+    for (gentle, steep) in [(results[0], results[1]), (results[2], results[3])]:
+        assert max(step['variable_rate'] for step in steep['steps']) > max(step['variable_rate'] for step in gentle['steps'])
+        assert steep['treasury_income'] > gentle['treasury_income']
+
+
+# A 3 x 3 x 3 grid over the variable rate curve
+@pytest.mark.benchmark
+def test_rate_sweep_grid():
+    grid = strategy_grid(
+        optimal_utilization_rate=[RAY // 2, 8 * RAY // 10, 9 * RAY // 10],
+        variable_rate_slope_1=[RAY // 100, 4 * RAY // 100, 8 * RAY // 100],
+        variable_rate_slope_2=[RAY // 10, RAY // 2, RAY],
+    )
+    start = time.perf_counter()
+    results = run_sweep(grid)
+    elapsed = time.perf_counter() - start
+
+    lines = ['{} configurations in {:.1f}s'.format(len(grid), elapsed), '']
+    write_report('rate_sweep', lines + sweep_report(results))
@@ -0,0 +1,121 @@
+from brownie import accounts
+
+from helpers import INTEREST_RATE_MODE_VARIABLE, MAX_UINT256, setup_borrow, WEI
+from liquidation_bot import LiquidationBot
+from risk_engine import price_path, reserve_parameters, run_monte_carlo, simulate_path, synthetic_book
+from benchmarks import write_report
+from tiers import scaled
+from pipeline import Pipeline
+from snapshots import ChainSnapshot
+
+import pytest
+import random
+
+
+# Per step volatility of tERC20 against ETH
+VOLATILITY = 0.2
+
+
+# A market holding a `synthetic_book()` of `users` positions, each a new local account depositing
+# tERC20 as collateral and borrowing WETH at the variable rate
+def setup_risk_market(users):
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, depositer, deposit_amount, borrower,
+    terc20, terc20_atoken, terc20_stable_debt, terc20_variable_debt, tecr20_ltv, tecr20_threshold, tecr20_bonus,
+    terc20_deposit_amount, price) = setup_borrow()
+
+    reserves = {
+        weth.address: reserve_parameters(WEI),
+        terc20.address: reserve_parameters(price, tecr20_ltv, tecr20_threshold, tecr20_bonus),
+    }
+    book = synthetic_book(users, terc20.address, weth.address, reserves)
+    collateral = sum(position[terc20.address][0] for position in book)
+    debt = sum(position[weth.address][2] for position in book)
+    borrowers = [accounts.add() for _ in book]
+
+    # WETH liquidity for the borrows and the liquidator's repayments
+    whale = accounts[8]
+    liquidator = accounts[9]
+    weth.deposit({'from': whale, 'value': debt})
+    weth.approve(lending_pool, MAX_UINT256, {'from': whale})
+    lending_pool.deposit(weth, debt, whale, 0, {'from': whale})
+    weth.deposit({'from': liquidator, 'value': debt})
+
+    funder = accounts[7]
+    terc20.mint(collateral, {'from': funder})
+    terc20.approve(lending_pool, collateral, {'from': funder})
+
+    pipeline = Pipeline()
+    for (user, position) in zip(borrowers, book):
+        pipeline.transact(lending_pool.deposit, terc20, position[terc20.address][0], user, 0, {'from': funder})
+    pipeline.join()
+    for (user, position) in zip(borrowers, book):
+        pipeline.transact(
+            lending_pool.borrow, weth, position[weth.address][2], INTEREST_RATE_MODE_VARIABLE, 0, user, {'from': user}
+        )
+    pipeline.join()
+
+    return (lending_pool, price_oracle, weth, terc20, reserves, book, borrowers, liquidator)
+
+
+# Replay the price path of `seed` on chain with the reference liquidator and compare the final
+# positions and bad debt with the Python simulation
+def verify_path_on_chain(lending_pool, price_oracle, terc20, reserves, book, borrowers, liquidator, seed, steps):
+    path = price_path(reserves, {terc20.address: VOLATILITY}, steps, seed)
+    (bad_debt, liquidations, positions) = simulate_path(book, reserves, path)
+
+    bot = LiquidationBot(lending_pool, liquidator)
+    bot.approve()
+    bot.watch(borrowers)
+    receipts = []
+    for prices in path:
+        price_oracle.setAssetPrice(terc20, prices[terc20.address], {'from': accounts[0]})
+        receipts += bot.on_price_update([terc20.address])
+    assert len(receipts) == liquidations
+
+    # Interest accrues on chain for the few seconds of the replay
+    chain_bad_debt = 0
+    for (user, position) in zip(borrowers, positions):
+        for (asset, (collateral, stable, variable)) in position.items():
+            (chain_collateral, chain_stable, chain_variable) = bot.positions[user.address].get(asset, (0, 0, 0))
+            assert abs(chain_collateral - collateral) <= collateral // 1_000_000 + 1
+            assert abs(chain_stable + chain_variable - stable - variable) <= (stable + variable) // 1_000_000 + 1
+        data = lending_pool.getUserAccountData(user)
+        chain_bad_debt += max(0, data[1] - data[0])
+    assert abs(chain_bad_debt - bad_debt) <= bad_debt // 1_000_000 + len(borrowers)
+
+
+# Paths are reproducible and a sample of them liquidates identically on chain
+def test_risk_engine():
+    steps = 5
+    (lending_pool, price_oracle, weth, terc20, reserves, book, borrowers, liquidator) = setup_risk_market(scaled(10, minimum=3))
+
+    paths = scaled(200, minimum=10)
+    report = run_monte_carlo(book, reserves, {terc20.address: VOLATILITY}, paths=paths, steps=steps, processes=2)
+    assert report.results == run_monte_carlo(
+        book, reserves, {terc20.address: VOLATILITY}, paths=paths, steps=steps, processes=1
+    ).results
+    assert report.quantile(0.95) <= report.quantile(0.99) <= report.max()
+
+    # The paths with the largest losses and a path picked at random with a fixed seed
+    snapshot = ChainSnapshot()
+    for seed in report.worst(2) + [random.Random(0).choice(report.results)[0]]:
+        verify_path_on_chain(lending_pool, price_oracle, terc20, reserves, book, borrowers, liquidator, seed, steps)
+        snapshot.revert()
+
+
+# Loss distribution of a large book under many price paths, the worst path verified on chain
+@pytest.mark.benchmark
+def test_risk_engine_loss_distribution():
+    steps = 20
+    (lending_pool, price_oracle, weth, terc20, reserves, book, borrowers, liquidator) = setup_risk_market(scaled(100))
+
+    report = run_monte_carlo(book, reserves, {terc20.address: VOLATILITY}, paths=10_000, steps=steps)
+    [seed] = report.worst(1)
+    verify_path_on_chain(lending_pool, price_oracle, terc20, reserves, book, borrowers, liquidator, seed, steps)
+
+    lines = ['{} borrowers, {} steps at {:.0%} volatility per step'.format(len(book), steps, VOLATILITY), '']
+    lines += report.lines()
+    lines += ['', 'Worst path (seed {}) verified on chain'.format(seed)]
+    write_report('risk_engine', lines)
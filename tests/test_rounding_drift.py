@@ -0,0 +1,88 @@
+from brownie import accounts, MockReserveInterestRateStrategy
+
+from helpers import calculate_linear_interest, MAX_UINT256, RAY, ray_mul, setup_and_deploy_configuration_with_reserve
+from rounding_drift import analyse_drift, DRIFT_LIQUIDITY_RATE, replay_on_chain, ScaledBalanceModel
+from benchmarks import write_report
+from tiers import scaled
+
+import pytest
+
+
+# Set up an unused WETH reserve earning `DRIFT_LIQUIDITY_RATE` whatever its utilization, then fund
+# and approve `accounts[6:10]` for the deposits in `ops`
+def setup_drift_replay(ops):
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy) = setup_and_deploy_configuration_with_reserve()
+    drift_strategy = accounts[0].deploy(MockReserveInterestRateStrategy, DRIFT_LIQUIDITY_RATE, 0, 0)
+    configurator.setReserveInterestRateStrategyAddress(weth, drift_strategy, {'from': pool_admin})
+
+    users = accounts[6:10]
+    for (i, user) in enumerate(users):
+        deposits = sum(op[2] for op in ops if op[0] == 'deposit' and op[1] == i)
+        if deposits > 0:
+            weth.deposit({'from': user, 'value': deposits})
+        weth.approve(lending_pool, MAX_UINT256, {'from': user})
+
+    # Nobody borrows, give the aToken the interest on every deposit over the whole sequence. Twice
+    # the linear rate covers the index compounding at each deposit and withdrawal.
+    deposits = sum(op[2] for op in ops if op[0] == 'deposit')
+    seconds = sum(op[1] for op in ops if op[0] == 'accrue')
+    interest = ray_mul(deposits, calculate_linear_interest(2 * DRIFT_LIQUIDITY_RATE, seconds) - RAY) + 1
+    weth.deposit({'from': accounts[0], 'value': interest})
+    weth.transfer(weth_atoken, interest, {'from': accounts[0]})
+
+    return (lending_pool, weth, weth_atoken, users)
+
+
+# Scaled balances round individually so the total and the sum of balances differ by up to one
+# wei per holder
+def test_scaled_balance_model_drift():
+    model = ScaledBalanceModel(index=3 * RAY // 2)
+    for user in range(3):
+        model.mint(user, 1)
+
+    assert [model.balance_of(user) for user in range(3)] == [2, 2, 2]
+    assert model.total_supply() == 5
+    assert model.drift() == -1
+
+    with pytest.raises(ValueError):
+        model.burn(0, 3)
+
+
+# The worst sequence from a short search drifts identically on chain
+def test_rounding_drift_replay():
+    [(drift, seed, ops)] = analyse_drift(runs=scaled(100), length=40, keep=1)
+    (lending_pool, weth, weth_atoken, users) = setup_drift_replay(ops)
+
+    result = replay_on_chain(ops, lending_pool, weth, weth_atoken, users)
+
+    assert result.mismatches == []
+    assert result.chain_drift == result.model_drift
+    assert result.chain_drift == drift
+
+
+# Millions of random operations, the worst drifts found and their replay on chain
+@pytest.mark.benchmark
+def test_rounding_drift_search():
+    runs = 20_000
+    length = 100
+    worst = analyse_drift(runs=runs, length=length, keep=5)
+
+    lines = ['{:,} sequences of up to {} operations'.format(runs, length), '']
+    lines.append('{:>6} {:>8} {:>10}'.format('Drift', 'Seed', 'Operations'))
+    for (drift, seed, ops) in worst:
+        lines.append('{:>+6} {:>8} {:>10}'.format(drift, seed, len(ops)))
+
+    (drift, seed, ops) = worst[0]
+    (lending_pool, weth, weth_atoken, users) = setup_drift_replay(ops)
+    result = replay_on_chain(ops, lending_pool, weth, weth_atoken, users)
+    lines.append('')
+    lines.append('Seed {} on chain: drift {:+} (model {:+}), {} mismatched operations'.format(
+        seed, result.chain_drift, result.model_drift, len(result.mismatches)
+    ))
+    write_report('rounding_drift', lines)
+
+    assert result.mismatches == []
+    assert result.chain_drift == result.model_drift
+    assert result.chain_drift == drift
@@ -0,0 +1,86 @@
+from helpers import MAX_UINT256, setup_borrow, WEI
+from scenarios import borrow_context, build_scenario_tree, run_scenarios
+
+
+ONE_DAY = 24 * 60 * 60
+BORROW_AMOUNT = WEI // 100
+
+
+# Borrow and repay scenarios which share their setup and leading borrow
+SCENARIOS = [
+    {
+        'name': 'borrow variable',
+        'actions': [('borrow', 'borrower', 'weth', BORROW_AMOUNT, 'variable')],
+        'expect': [
+            ('balance', 'weth_variable_debt', 'borrower', '==', BORROW_AMOUNT),
+            ('balance', 'weth', 'borrower', '==', BORROW_AMOUNT),
+        ],
+    },
+    {
+        'name': 'variable interest accrues',
+        'actions': [
+            ('borrow', 'borrower', 'weth', BORROW_AMOUNT, 'variable'),
+            ('sleep', ONE_DAY),
+        ],
+        'expect': [('balance', 'weth_variable_debt', 'borrower', '>', BORROW_AMOUNT)],
+    },
+    {
+        'name': 'repay variable in full',
+        'actions': [
+            ('borrow', 'borrower', 'weth', BORROW_AMOUNT, 'variable'),
+            ('sleep', ONE_DAY),
+            ('wrap', 'borrower', BORROW_AMOUNT),
+            ('approve', 'borrower', 'weth', MAX_UINT256),
+            ('repay', 'borrower', 'weth', MAX_UINT256, 'variable'),
+        ],
+        'expect': [('balance', 'weth_variable_debt', 'borrower', '==', 0)],
+    },
+    {
+        'name': 'repay variable partially',
+        'actions': [
+            ('borrow', 'borrower', 'weth', BORROW_AMOUNT, 'variable'),
+            ('sleep', ONE_DAY),
+            ('wrap', 'borrower', BORROW_AMOUNT),
+            ('approve', 'borrower', 'weth', MAX_UINT256),
+            ('repay', 'borrower', 'weth', BORROW_AMOUNT // 2, 'variable'),
+        ],
+        'expect': [('balance', 'weth_variable_debt', 'borrower', '>', BORROW_AMOUNT // 2)],
+    },
+    {
+        'name': 'repay stable in full',
+        'actions': [
+            ('borrow', 'borrower', 'weth', BORROW_AMOUNT, 'stable'),
+            ('sleep', ONE_DAY),
+            ('wrap', 'borrower', BORROW_AMOUNT),
+            ('approve', 'borrower', 'weth', MAX_UINT256),
+            ('repay', 'borrower', 'weth', MAX_UINT256, 'stable'),
+        ],
+        'expect': [('balance', 'weth_stable_debt', 'borrower', '==', 0)],
+    },
+    {
+        'name': 'borrow beyond collateral',
+        'actions': [
+            ('borrow', 'borrower', 'weth', BORROW_AMOUNT, 'variable'),
+            ('reverts', '11', ('borrow', 'borrower', 'weth', WEI, 'variable')),
+        ],
+        'expect': [('balance', 'weth_variable_debt', 'borrower', '==', BORROW_AMOUNT)],
+    },
+]
+
+
+# Shared prefixes form a single path in the tree
+def test_build_scenario_tree():
+    root = build_scenario_tree(SCENARIOS)
+
+    assert len(root.children) == 2 # variable and stable borrow
+    variable_borrow = root.children[SCENARIOS[0]['actions'][0]]
+    assert variable_borrow.scenarios == [SCENARIOS[0]]
+    assert len(variable_borrow.children) == 2 # sleep or borrow again
+
+
+def test_run_scenarios():
+    (failures, executed) = run_scenarios(SCENARIOS, lambda: borrow_context(setup_borrow()))
+
+    assert failures == {}
+    assert executed == 12
+    assert executed < sum(len(scenario['actions']) for scenario in SCENARIOS)
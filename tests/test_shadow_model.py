@@ -0,0 +1,86 @@
+from helpers import INTEREST_RATE_MODE_VARIABLE, RAY, setup_borrow, WEI
+from shadow_model import CHUNK_SIZE, load_user, ShadowModel, ShadowSnapshot
+
+
+# Values round trip through the 128 bit columns, including ones which spill over
+def test_shadow_model_encoding():
+    model = ShadowModel(128)
+    model.set('scaled_atoken', 127, 'alice', 1 << 200)
+    model.set('stable_rate', 0, 'alice', 3 * RAY)
+    model.set('timestamp', 0, 'alice', 1_600_000_000)
+
+    assert model.get('scaled_atoken', 127, 'alice') == 1 << 200
+    assert model.get('stable_rate', 0, 'alice') == 3 * RAY
+    assert model.get('timestamp', 0, 'alice') == 1_600_000_000
+    assert model.get('scaled_atoken', 0, 'alice') == 0
+    assert model.get('scaled_atoken', 0, 'bob') == 0
+
+    model.set('scaled_atoken', 127, 'alice', 1)
+    assert model.get('scaled_atoken', 127, 'alice') == 1
+
+
+# `UserConfiguration` bits are stored per reserve and rebuilt into the bitmap
+def test_shadow_model_configuration():
+    model = ShadowModel(128)
+    model.set_using_as_collateral(0, 'alice', True)
+    model.set_borrowing(1, 'alice', True)
+    model.set_using_as_collateral(127, 'alice', True)
+
+    assert model.configuration('alice') == (1 << 1) | (1 << 2) | (1 << 255)
+
+    model.set_using_as_collateral(0, 'alice', False)
+    assert model.configuration('alice') == (1 << 2) | (1 << 255)
+
+
+# Forks share chunks until written and never see each other's writes
+def test_shadow_model_fork():
+    model = ShadowModel(2)
+    for user in range(2 * CHUNK_SIZE):
+        model.set('scaled_atoken', 0, user, WEI + user)
+
+    fork = model.fork()
+    assert fork.columns['scaled_atoken'][0].chunks[1] is model.columns['scaled_atoken'][0].chunks[1]
+
+    fork.set('scaled_atoken', 0, 0, 1)
+    fork.set('scaled_atoken', 1, 'new user', 2)
+    model.set('scaled_atoken', 0, 1, 3)
+
+    assert model.get('scaled_atoken', 0, 0) == WEI
+    assert fork.get('scaled_atoken', 0, 0) == 1
+    assert fork.get('scaled_atoken', 0, 1) == WEI + 1
+    assert model.get('scaled_atoken', 0, 1) == 3
+    assert 'new user' not in model.users
+    # Only the written chunk was copied
+    assert fork.columns['scaled_atoken'][0].chunks[0] is not model.columns['scaled_atoken'][0].chunks[0]
+    assert fork.columns['scaled_atoken'][0].chunks[1] is model.columns['scaled_atoken'][0].chunks[1]
+
+
+# Untouched chunks are not allocated
+def test_shadow_model_sparse_memory():
+    model = ShadowModel(128)
+    for user in range(CHUNK_SIZE):
+        model.set('scaled_atoken', 0, user, WEI)
+
+    assert model.memory_bytes() == CHUNK_SIZE * 16
+
+
+# The model forks and reverts alongside the chain
+def test_shadow_snapshot():
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, depositer, deposit_amount, borrower,
+    terc20, terc20_atoken, terc20_stable_debt, terc20_variable_debt, tecr20_ltv, tecr20_threshold, tecr20_bonus,
+    terc20_deposit_amount, price) = setup_borrow()
+
+    model = ShadowModel(len(lending_pool.getReservesList()))
+    load_user(model, lending_pool, borrower.address)
+    snapshot = ShadowSnapshot(model)
+
+    lending_pool.borrow(weth, WEI // 100, INTEREST_RATE_MODE_VARIABLE, 0, borrower, {'from': borrower})
+    load_user(model, lending_pool, borrower.address)
+    assert model.get('scaled_variable_debt', 0, borrower.address) > 0
+    assert model.configuration(borrower.address) == lending_pool.getUserConfiguration(borrower)[0]
+
+    model = snapshot.revert()
+    assert model.get('scaled_variable_debt', 0, borrower.address) == 0
+    assert model.configuration(borrower.address) == lending_pool.getUserConfiguration(borrower)[0]
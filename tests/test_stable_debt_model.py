@@ -0,0 +1,104 @@
+from brownie import accounts, web3
+
+from helpers import INTEREST_RATE_MODE_STABLE, RAY, setup_borrow, WEI
+from stable_debt_model import StableDebtModel
+from benchmarks import write_report
+from tiers import scaled
+
+import pytest
+import random
+import time
+
+
+# Random stable `borrow()`s and `repay()`s over `users`, returns the number of events applied
+def apply_random_events(model, count, seed, users=50, start=1_600_000_000):
+    rng = random.Random(seed)
+    now = start
+    for _ in range(count):
+        now += rng.randint(1, 60 * 60)
+        user = rng.randrange(users)
+        balance = model.balance_of(user, now)
+        if balance > 0 and rng.random() < 0.5:
+            amount = balance if rng.random() < 0.3 else rng.randint(1, balance)
+            model.burn(user, amount, now)
+        else:
+            model.mint(user, rng.randint(1, 100 * WEI), rng.randint(RAY // 100, RAY // 5), now)
+    return now
+
+
+# The model follows `StableDebtToken` exactly across borrows and a repay by two users
+def test_stable_debt_model_matches_chain():
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, depositer, deposit_amount, borrower,
+    terc20, terc20_atoken, terc20_stable_debt, terc20_variable_debt, tecr20_ltv, tecr20_threshold, tecr20_bonus,
+    terc20_deposit_amount, price) = setup_borrow()
+
+    borrower_b = accounts[6]
+    terc20.mint(terc20_deposit_amount, {'from': borrower_b})
+    terc20.approve(lending_pool, terc20_deposit_amount, {'from': borrower_b})
+    lending_pool.deposit(terc20, terc20_deposit_amount, borrower_b, 0, {'from': borrower_b})
+
+    model = StableDebtModel()
+
+    def borrow(user, amount):
+        rate = lending_pool.getReserveData(weth)[5] # rate at which `StableDebtToken.mint()` is called
+        tx = lending_pool.borrow(weth, amount, INTEREST_RATE_MODE_STABLE, 0, user, {'from': user})
+        model.mint(user.address, amount, rate, tx.timestamp)
+
+    def repay(user, amount):
+        weth.approve(lending_pool, amount, {'from': user})
+        tx = lending_pool.repay(weth, amount, INTEREST_RATE_MODE_STABLE, user, {'from': user})
+        model.burn(user.address, amount, tx.timestamp)
+
+    borrow(borrower, WEI // 100)
+    web3.manager.request_blocking("evm_increaseTime", 1000)
+    borrow(borrower_b, WEI // 50)
+    web3.manager.request_blocking("evm_increaseTime", 1000)
+    borrow(borrower, WEI // 200)
+    web3.manager.request_blocking("evm_increaseTime", 1000)
+    repay(borrower_b, WEI // 100)
+
+    now = web3.eth.getBlock('latest').timestamp
+    assert model.supply_data(now) == tuple(weth_stable_debt.getSupplyData())
+    assert model.average_rate == weth_stable_debt.getAverageStableRate()
+    for user in [borrower, borrower_b]:
+        assert model.balance_of(user.address, now) == weth_stable_debt.balanceOf(user)
+        assert model.principal[user.address] == weth_stable_debt.principalBalanceOf(user)
+        assert model.user_rates[user.address] == weth_stable_debt.getUserStableRate(user)
+        assert model.timestamps[user.address] == weth_stable_debt.getUserLastUpdated(user)
+
+
+# Over a long history the incrementally tracked supply and average rate stay close to the users'
+def test_stable_debt_model_long_history():
+    model = StableDebtModel()
+    now = apply_random_events(model, scaled(5_000), seed=0)
+
+    total_supply = model.total_supply(now)
+    balances = sum(model.balance_of(user, now) for user in model.principal)
+    assert abs(total_supply - balances) <= balances // 100
+
+    average_rate = model.average_rate_from_users()
+    assert abs(model.average_rate - average_rate) <= average_rate // 20
+
+
+# Events per second the model replays and the precision drift at the end of the history
+@pytest.mark.benchmark
+def test_stable_debt_model_throughput():
+    count = 100_000
+    model = StableDebtModel()
+    start = time.perf_counter()
+    now = apply_random_events(model, count, seed=1)
+    elapsed = time.perf_counter() - start
+
+    total_supply = model.total_supply(now)
+    balances = sum(model.balance_of(user, now) for user in model.principal)
+    write_report('stable_debt_model', [
+        'Events: {:,} in {:.2f}s ({:,.0f} per second)'.format(count, elapsed, count / elapsed),
+        'Total supply {:,} vs sum of balances {:,} (drift {:+,})'.format(
+            total_supply, balances, total_supply - balances
+        ),
+        'Average rate {:,} vs users\' {:,}'.format(model.average_rate, model.average_rate_from_users()),
+    ])
+
+    assert count / elapsed > 10_000
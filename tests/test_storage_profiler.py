@@ -0,0 +1,51 @@
+from brownie import web3
+
+from helpers import INTEREST_RATE_MODE_VARIABLE, WEI, setup_borrow
+from storage_profiler import StorageProfiler, profile_storage
+
+import pytest
+
+
+# Check the hard coded `LendingPool` layout against the chain and profile `borrow()`
+def test_profile_borrow_storage():
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+    weth_stable_debt, weth_variable_debt, strategy, depositor, deposit_amount, borrower,
+    terc20, terc20_atoken, terc20_stable_debt, terc20_variable_debt, ltv, threshold, bonus,
+    terc20_deposit_amount, price) = setup_borrow()
+
+    # `_reservesCount` and `_paused` after the `VersionedInitializable` gap
+    assert int(web3.eth.getStorageAt(lending_pool.address, 56).hex(), 16) == 2
+    assert int(web3.eth.getStorageAt(lending_pool.address, 57).hex(), 16) == 0
+    # aToken `_totalSupply` after the gap and `lastInitializedRevision` before it
+    assert int(web3.eth.getStorageAt(weth_atoken.address, 54).hex(), 16) == weth_atoken.scaledTotalSupply()
+    assert int(web3.eth.getStorageAt(weth_atoken.address, 0).hex(), 16) == 1
+
+    borrow_amount = terc20_deposit_amount * price // WEI // 10
+    tx = lending_pool.borrow(weth, borrow_amount, INTEREST_RATE_MODE_VARIABLE, 0, borrower, {'from': borrower})
+
+    # Debt token `_totalSupply` and `lastInitializedRevision`, both before the gap
+    assert int(web3.eth.getStorageAt(weth_variable_debt.address, 2).hex(), 16) == weth_variable_debt.scaledTotalSupply()
+    assert int(web3.eth.getStorageAt(weth_variable_debt.address, 6).hex(), 16) == 1
+
+    accesses = profile_storage(tx)
+    loads = [(contract, pattern) for (op, address, contract, pattern, concrete) in accesses if op == 'SLOAD']
+    stores = [(contract, pattern) for (op, address, contract, pattern, concrete) in accesses if op == 'SSTORE']
+
+    # `calculateUserAccountData()` reads the configuration of both reserves
+    concrete_loads = [concrete for (op, address, contract, pattern, concrete) in accesses if op == 'SLOAD']
+    assert '_reserves[{}].configuration'.format(weth.address.lower()) in concrete_loads
+    assert '_reserves[{}].configuration'.format(terc20.address.lower()) in concrete_loads
+    assert ('LendingPool', '_reservesCount') in loads
+    assert ('LendingPool', '_reservesList[*]') in loads
+    assert ('LendingPool', '_usersConfig[*]') in stores
+    assert ('LendingPool', '_reserves[*].liquidityIndex,variableBorrowIndex') in stores
+    assert ('VariableDebtToken', '_balances[*]') in stores
+    assert 'IMPLEMENTATION_SLOT' in [pattern for (contract, pattern) in loads]
+    assert not [pattern for (contract, pattern) in loads if pattern.startswith('slot')]
+
+    profiler = StorageProfiler()
+    profiler.add(tx)
+    (sloads, sstores) = profiler.totals('LendingPool.borrow')
+    assert sloads == len(loads)
+    assert sstores == len(stores)
@@ -0,0 +1,66 @@
+from brownie import accounts, history
+
+from helpers import setup_borrow, WEI
+from receipts import receipt_stream, ReceiptCollector
+from snapshots import ChainSnapshot
+from telemetry import TelemetrySink
+
+import json
+
+
+def read_lines(directory):
+    lines = []
+    for path in sorted(directory.glob('telemetry-*.jsonl')):
+        lines += [json.loads(line) for line in path.read_text().splitlines()]
+    return lines
+
+
+# Every transaction is written once across rotated files, including around a revert, against the
+# fixture or test sending it
+def test_telemetry(tmp_path, request):
+    sink = TelemetrySink(tmp_path, buffer_lines=2, max_bytes=1_000)
+    collector = ReceiptCollector()
+    collector.processors.append(sink.add_receipt)
+    stream = receipt_stream()
+
+    with stream.fixture('setup'):
+        (addresses_provider, lending_pool, configurator, collateral_manager,
+        pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, weth_atoken,
+        weth_stable_debt, weth_variable_debt, strategy, depositer, deposit_amount, borrower,
+        terc20, terc20_atoken, terc20_stable_debt, terc20_variable_debt, tecr20_ltv, tecr20_threshold, tecr20_bonus,
+        terc20_deposit_amount, price) = setup_borrow()
+
+    snapshot = ChainSnapshot()
+    with stream.fixture('reverted'):
+        weth.deposit({'from': accounts[6], 'value': WEI})
+    snapshot.revert()
+
+    weth.deposit({'from': accounts[6], 'value': WEI})
+    weth.approve(lending_pool, WEI, {'from': accounts[6]})
+    tx = lending_pool.deposit(weth, WEI, accounts[6], 0, {'from': accounts[6]})
+    collector.close()
+    sink.close()
+
+    # Written receipts are no longer held by brownie
+    assert tx not in list(history)
+
+    assert len(list(tmp_path.glob('telemetry-*.jsonl'))) > 1
+    lines = read_lines(tmp_path)
+    assert [line['fixture'] for line in lines].count('reverted') == 1
+    assert all(line['test'] is None for line in lines if line['fixture'] is not None)
+    deposits = [line for line in lines if line['test'] == request.node.nodeid]
+    assert all(line['fixture'] is None for line in deposits)
+    assert [line['method'].split('.')[-1] for line in deposits] == ['deposit', 'approve', 'deposit']
+
+    line = deposits[-1]
+    assert line['sender'] == accounts[6].address
+    assert line['to'] == lending_pool.address
+    assert line['status'] == 1
+    assert line['gas_used'] > 0
+    assert line['latency'] > 0
+    assert 'Deposit' in [name for (name, fields) in line['events']]
+    deposit_event = dict(line['events'])['Deposit']
+    assert deposit_event['amount'] == WEI
+
+    # A new sink continues after the existing files
+    assert TelemetrySink(tmp_path).file_index == len(list(tmp_path.glob('telemetry-*.jsonl')))
@@ -2,6 +2,8 @@ from brownie import (
     accounts, reverts, UserConfigurationTest
 )
 
+from tiers import scaled, scaled_sample
+
 import pytest
 import time
 import random
@@ -23,9 +25,8 @@ def test_borrow_basic():
 
         assert config.isBorrowing(bitmap, index)
 
-        # Select a random set and check the other flags are as expected
-        for x in range(0,10):
-            rand_index = random.randint(0,127)
+        # Select a random set (scaled by the test tier) and check the other flags are as expected
+        for rand_index in scaled_sample(range(0,128), 10):
             assert config.isBorrowing(bitmap,rand_index) == (rand_index <= index)
             assert config.isUsingAsCollateralOrBorrowing(bitmap,rand_index) == (rand_index <= index)
 
@@ -45,9 +46,8 @@ def test_collateral_basic():
 
         assert config.isUsingAsCollateral(bitmap, index)
 
-        # Select a random set and check the other flags are as expected
-        for x in range(0,10):
-            rand_index = random.randint(0,127)
+        # Select a random set (scaled by the test tier) and check the other flags are as expected
+        for rand_index in scaled_sample(range(0,128), 10):
             assert config.isUsingAsCollateral(bitmap,rand_index) == (rand_index <= index)
             assert config.isUsingAsCollateralOrBorrowing(bitmap,rand_index) == (rand_index <= index)
 
@@ -61,7 +61,8 @@ def test_config_fuzz():
     bitmap = 0
 
     # Test intensity the higher the number the longer the test runs but more permutations
-    intensity_runs = 1000
+    # (scaled by the test tier e.g. `--tier smoke`)
+    intensity_runs = scaled(1000, minimum=10)
 
     borrow_indicies = {}
     collateral_indicies = {}
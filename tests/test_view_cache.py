@@ -0,0 +1,40 @@
+from brownie import accounts, chain, web3
+
+from helpers import setup_and_deploy_configuration_with_reserve
+from view_cache import cached_views
+
+import pytest
+
+
+# Repeated view calls are served from the cache until the chain changes
+def test_view_cache_invalidation():
+    (addresses_provider, lending_pool, configurator, collateral_manager,
+    pool_admin, emergency_admin, price_oracle, lending_rate_oracle, weth, atoken,
+    stable_debt, variable_debt, strategy) = setup_and_deploy_configuration_with_reserve()
+
+    with cached_views() as cache:
+        # Same call in the same block
+        rate = strategy.baseVariableBorrowRate()
+        hits = cache.hits
+        assert strategy.baseVariableBorrowRate() == rate
+        assert cache.hits == hits + 1
+
+        # New transaction
+        depositor = accounts[4]
+        assert weth.balanceOf(depositor) == 0
+        weth.deposit({'from': depositor, 'value': 1})
+        assert weth.balanceOf(depositor) == 1
+
+        # Time travel, mining and snapshots
+        price = price_oracle.getAssetPrice(weth)
+        web3.manager.request_blocking("evm_increaseTime", 1)
+        assert len(cache.cache) == 0
+        price_oracle.getAssetPrice(weth)
+        chain.mine()
+        assert len(cache.cache) == 0
+
+        chain.snapshot()
+        price_oracle.setAssetPrice(weth, price * 2, {'from': accounts[0]})
+        assert price_oracle.getAssetPrice(weth) == price * 2
+        chain.revert()
+        assert price_oracle.getAssetPrice(weth) == price
@@ -0,0 +1,45 @@
+import os
+import random
+
+
+# Test intensity tiers and the factor each scales iteration, example, reserve and user counts by.
+# `smoke` runs in seconds on every commit, `soak` is for nightly runs.
+TIER_SCALES = {
+    'smoke': 0.02,
+    'full': 1,
+    'soak': 100,
+}
+
+# Environment variable selecting the tier when `--tier` is not given
+TIER_ENV = 'TEST_TIER'
+
+DEFAULT_TIER = 'full'
+
+_tier = os.environ.get(TIER_ENV, DEFAULT_TIER)
+
+
+def tier():
+    return _tier
+
+
+def set_tier(name):
+    global _tier
+    if name not in TIER_SCALES:
+        raise ValueError('Unknown test tier {}, expected one of {}'.format(name, ', '.join(TIER_SCALES)))
+    _tier = name
+
+
+# `count` scaled by the current tier, at least `minimum` and at most `maximum`
+def scaled(count, minimum=1, maximum=None):
+    value = max(minimum, int(count * TIER_SCALES[_tier]))
+    return value if maximum is None else min(value, maximum)
+
+
+# `count` scaled by the current tier as a sorted random sample of `population`, all of it once the
+# scaled count reaches its size
+def scaled_sample(population, count, minimum=1):
+    population = list(population)
+    size = scaled(count, minimum)
+    if size >= len(population):
+        return population
+    return sorted(random.sample(population, size))
@@ -0,0 +1,90 @@
+from brownie import web3
+
+from contextlib import contextmanager
+
+
+# Requests which do not change chain state, any other request (transactions, `evm_revert`,
+# `evm_increaseTime`, `evm_mine`, ...) drops all cached `eth_call` results
+READ_ONLY_METHODS = {
+    'eth_accounts', 'eth_blockNumber', 'eth_call', 'eth_chainId', 'eth_estimateGas', 'eth_gasPrice',
+    'eth_getBalance', 'eth_getBlockByHash', 'eth_getBlockByNumber', 'eth_getCode', 'eth_getLogs',
+    'eth_getStorageAt', 'eth_getTransactionByHash', 'eth_getTransactionCount', 'eth_getTransactionReceipt',
+    'debug_traceTransaction', 'net_version', 'web3_clientVersion',
+}
+
+
+# Provider wrapper caching `eth_call` results for the current block.
+#
+# Results are keyed by (to, calldata, from, block) and are only valid until the chain changes,
+# so the cache is dropped on every state changing request. As brownie's `chain.sleep()`,
+# `chain.mine()` and `chain.revert()` and the tests' `evm_increaseTime` requests all go through
+# `web3.provider.make_request()` they invalidate the cache as well.
+class ViewCacheProvider:
+    def __init__(self, provider):
+        self.provider = provider
+        self.cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def make_request(self, method, params):
+        if method != 'eth_call':
+            if method not in READ_ONLY_METHODS:
+                self.cache.clear()
+            return self.provider.make_request(method, params)
+
+        tx = params[0]
+        key = (tx.get('to'), tx.get('data'), tx.get('from'), params[1] if len(params) > 1 else 'latest')
+        if key in self.cache:
+            self.hits += 1
+            return dict(self.cache[key])
+
+        self.misses += 1
+        response = self.provider.make_request(method, params)
+        if 'result' in response:
+            self.cache[key] = response
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
+
+
+# Cache view calls on the current web3 provider, returns the `ViewCacheProvider`.
+# The cache already installed is returned as is, even under other provider wrappers.
+def enable_view_cache():
+    (_, cache) = _find_view_cache()
+    if cache is None:
+        cache = web3.provider = ViewCacheProvider(web3.provider)
+    return cache
+
+
+def disable_view_cache():
+    (wrapper, cache) = _find_view_cache()
+    if cache is None:
+        return
+    if wrapper is None:
+        web3.provider = cache.provider
+    else:
+        wrapper.provider = cache.provider
+
+
+# Cache view calls inside the block. Only a cache installed on entering is removed on exit, the
+# session cache of `--view-cache` is left in place.
+@contextmanager
+def cached_views():
+    installed = _find_view_cache()[1] is None
+    cache = enable_view_cache()
+    try:
+        yield cache
+    finally:
+        if installed:
+            disable_view_cache()
+
+
+# The `ViewCacheProvider` in the chain of provider wrappers and the wrapper holding it, if any
+def _find_view_cache():
+    (wrapper, provider) = (None, web3.provider)
+    while provider is not None:
+        if isinstance(provider, ViewCacheProvider):
+            return (wrapper, provider)
+        (wrapper, provider) = (provider, provider.__dict__.get('provider'))
+    return (None, None)